@@ -0,0 +1,81 @@
+"""
+Asset register export: /reports/assets (JSON) vs /exports/assets.parquet and .arrow.
+
+Fills a fresh SQLite database with synthetic assets (1M by default), then
+downloads the full register through each endpoint and reports the time and
+response size. Needs pyarrow for the columnar endpoints.
+
+    python benchmarks/bench_asset_export.py [rows]
+"""
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from common import prepare_sqlite_workdir, auth_headers, report
+
+CATEGORIES = ["IT Equipment", "Furniture", "Vehicles", "Office Equipment", "Machinery", None]
+STATUSES = ["active", "active", "active", "maintenance", "disposed", "auctioned"]
+LOCATIONS = ["Gusau", "Tsafe", "Bungudu", "Maru", "Kaura Namoda"]
+
+def synthetic_assets(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    for i in range(count):
+        cost = round(rng.uniform(5_000, 5_000_000), 2)
+        yield {
+            "name": f"Asset {i}",
+            "category": rng.choice(CATEGORIES),
+            "purchase_date": start + timedelta(days=rng.randrange(3650)),
+            "purchase_cost": cost,
+            "location": rng.choice(LOCATIONS),
+            "status": rng.choice(STATUSES),
+            "barcode": f"BC{i:08d}",
+            "qrcode": f"QR{i:08d}",
+            "quantity": 1,
+            "serial_number": f"SN-{rng.randrange(10**9):09d}",
+            "vat_amount": round(cost * 0.075, 2),
+            "total_cost_with_vat": round(cost * 1.075, 2),
+            "currency": "NGN",
+        }
+
+def main(rows: int = 1_000_000):
+    prepare_sqlite_workdir(copy_db=False)
+    from sqlalchemy import insert
+    from fastapi.testclient import TestClient
+    from fastapi_app.database import engine, init_db
+    from fastapi_app.models import Asset, User
+    from fastapi_app.main import app
+
+    init_db()
+    with engine.begin() as connection:
+        connection.execute(insert(User), [{"username": "admin", "password": "x", "email": "admin@example.com",
+                                           "first_name": "Bench", "last_name": "Admin", "role": "admin"}])
+    print(f"inserting {rows} synthetic assets...")
+    batch = []
+    with engine.begin() as connection:
+        for row in synthetic_assets(rows):
+            batch.append(row)
+            if len(batch) == 10000:
+                connection.execute(insert(Asset), batch)
+                batch = []
+        if batch:
+            connection.execute(insert(Asset), batch)
+
+    headers = auth_headers()
+    with TestClient(app) as client:
+        for label, url in (
+            ("/reports/assets (JSON)", "/reports/assets"),
+            ("/exports/assets.parquet", "/exports/assets.parquet"),
+            ("/exports/assets.arrow", "/exports/assets.arrow"),
+            ("/exports/assets.parquet 3 columns", "/exports/assets.parquet?columns=id,category,purchase_cost"),
+        ):
+            start = time.perf_counter()
+            response = client.get(url, headers=headers)
+            elapsed = time.perf_counter() - start
+            response.raise_for_status()
+            report(label, elapsed, rows / elapsed, "rows/s")
+            print(f"{'':<40} {len(response.content) / 1e6:8.1f} MB")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
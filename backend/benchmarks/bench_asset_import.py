@@ -0,0 +1,140 @@
+"""
+Asset onboarding: POST /assets/ per row vs POST /assets/import.
+
+Fills a fresh SQLite database with a few existing assets, then creates
+assets one request at a time and imports a generated CSV / NDJSON register
+through /assets/import, reporting rows per second and SQL statements per
+row. The register contains rows that must be rejected (missing name, bad
+date, unknown status, barcode already in the database or repeated in the
+file, location the importing manager can't access); the job's error report
+is checked against them.
+
+    python benchmarks/bench_asset_import.py [rows]
+"""
+import csv
+import io
+import json
+import sys
+import time
+
+from common import prepare_sqlite_workdir, auth_headers, report, QueryCounter
+
+SINGLE_ROWS = 300
+LOCATIONS = ["Gusau", "Tsafe"]
+
+def register(rows: int):
+    """(asset dicts, {row index: expected error field}) with a bad row every 50 rows"""
+    assets, bad = [], {}
+    for i in range(rows):
+        asset = {
+            "name": f"Imported asset {i}", "category": "Furniture", "location": LOCATIONS[0],
+            "purchase_date": "2024-03-01", "purchase_cost": "1500.50", "status": "active",
+            "barcode": f"IMP-{i:07d}", "qrcode": f"QR-IMP-{i:07d}", "quantity": "2",
+            "serial_number": f"SN{i}", "manufacturer": "Acme", "notes": "",
+        }
+        kind = i % 50
+        if kind == 7:
+            asset["name"] = ""
+            bad[i] = "name"
+        elif kind == 13:
+            asset["purchase_date"] = "not a date"
+            bad[i] = "purchase_date"
+        elif kind == 21:
+            asset["status"] = "lost"
+            bad[i] = "status"
+        elif kind == 29:
+            asset["barcode"] = "EXISTING-1"
+            bad[i] = "barcode"
+        elif kind == 37:
+            asset["barcode"] = f"IMP-{i - 1:07d}"
+            bad[i] = "barcode"
+        elif kind == 43:
+            asset["location"] = LOCATIONS[1]
+            bad[i] = "location"
+        assets.append(asset)
+    return assets, bad
+
+def as_csv(assets) -> bytes:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=list(assets[0]))
+    writer.writeheader()
+    writer.writerows(assets)
+    return out.getvalue().encode()
+
+def as_ndjson(assets) -> bytes:
+    return "".join(json.dumps(asset) + "\n" for asset in assets).encode()
+
+def main(rows: int = 20_000):
+    prepare_sqlite_workdir(copy_db=False)
+    from sqlalchemy import insert, func
+    from fastapi.testclient import TestClient
+    from fastapi_app.database import engine, init_db
+    from fastapi_app.models import Asset, User
+    from fastapi_app.asset_import import import_worker, ASSET_IMPORT_MAX_ERRORS
+    from fastapi_app.main import app
+
+    init_db()
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"username": "admin", "password": "x", "email": "admin@example.com", "first_name": "Admin",
+             "last_name": "User", "role": "admin", "permissions": None, "asset_access": None},
+            {"username": "manager", "password": "x", "email": "manager@example.com", "first_name": "Asset",
+             "last_name": "Manager", "role": "manager", "permissions": "assets", "asset_access": LOCATIONS[0]},
+        ])
+        connection.execute(insert(Asset), [{"name": "Existing", "location": LOCATIONS[0], "status": "active",
+                                            "barcode": "EXISTING-1", "qrcode": "QR-EXISTING-1"}])
+
+    counter = QueryCounter(engine)
+    headers = auth_headers("manager")
+    with TestClient(app) as client:
+        assets, _ = register(SINGLE_ROWS)
+        before = counter.count
+        start = time.perf_counter()
+        for i, asset in enumerate(assets):
+            body = {key: value for key, value in asset.items() if value != ""}
+            body["barcode"], body["qrcode"], body["status"] = f"ONE-{i}", f"QR-ONE-{i}", "active"
+            body["location"], body["name"] = LOCATIONS[0], body.get("name") or "One"
+            body["purchase_date"] = "2024-03-01"
+            response = client.post("/assets/", json=body, headers=headers)
+            assert response.status_code == 201, response.text
+        elapsed = time.perf_counter() - start
+        report(f"POST /assets/ x {SINGLE_ROWS}", elapsed, SINGLE_ROWS / elapsed, "rows/s")
+        print(f"{'':<40} {(counter.count - before) / SINGLE_ROWS:.1f} statements per row")
+
+        assets, bad = register(rows)
+        for label, content, filename in (("CSV", as_csv(assets), "register.csv"),
+                                         ("NDJSON", as_ndjson(assets), "register.ndjson")):
+            with engine.begin() as connection:
+                connection.execute(Asset.__table__.delete().where(Asset.barcode.like("IMP-%")))
+            before = counter.count
+            start = time.perf_counter()
+            response = client.post("/assets/import", files={"file": (filename, content)}, headers=headers)
+            assert response.status_code == 202, response.text
+            job_id = response.json()["id"]
+            import_worker.flush()
+            elapsed = time.perf_counter() - start
+            job = client.get(f"/assets/import/{job_id}", headers=headers).json()
+            assert job["status"] == "completed", job
+            report(f"/assets/import {label} ({rows} rows)", elapsed, rows / elapsed, "rows/s")
+            print(f"{'':<40} {(counter.count - before) / rows:.3f} statements per row, "
+                  f"{job['rows_inserted']} inserted, {job['rows_failed']} rejected")
+
+            # Data rows start on line 2 (CSV header) or line 1 (NDJSON)
+            offset = 2 if label == "CSV" else 1
+            reported = {error["row"] - offset: error["field"] for error in job["errors"]}
+            expected = dict(sorted(bad.items())[:ASSET_IMPORT_MAX_ERRORS])
+            assert reported == expected, sorted(set(reported.items()) ^ set(expected.items()))[:10]
+            assert job["errors_truncated"] == (len(bad) >= ASSET_IMPORT_MAX_ERRORS)
+            assert job["rows_inserted"] == rows - len(bad) and job["rows_failed"] == len(bad)
+        print(f"error report matches the {len(bad)} bad rows (first {len(reported)} listed)")
+
+        response = client.post("/assets/import", files={"file": ("register.pdf", b"")}, headers=headers)
+        assert response.status_code == 400, response.text
+        response = client.post("/assets/import", files={"file": ("register.xlsx", b"")}, headers=headers)
+        assert response.status_code in (202, 501), response.text
+        print(f"unknown format: 400, XLSX: {response.status_code}")
+        with engine.connect() as connection:
+            print("assets:", connection.execute(func.count(Asset.id).select()).scalar())
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
@@ -0,0 +1,87 @@
+"""
+Paging through /audit/?include_archived=true with and without the archive cache.
+
+Fills a temporary SQLite database with a year of synthetic audit rows,
+archives everything but the current month (audit_archive.apply_retention),
+then walks the first pages of the merged results, newest first and with a
+search filter, once with the archive cache disabled and once enabled. The
+first page decodes the archives either way; later pages show the cache.
+Asserts both runs return the same pages and totals (filtered on assets rows,
+as the benchmark's own /audit/ requests are audited too).
+
+    python benchmarks/bench_audit_archive.py [rows]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import prepare_sqlite_workdir, auth_headers, report
+
+PAGES = 10
+LIMIT = 50
+USERS = 50
+
+def main(rows: int = 200_000):
+    prepare_sqlite_workdir(copy_db=False)
+    from sqlalchemy import insert
+    from fastapi.testclient import TestClient
+    from fastapi_app.database import engine, init_db, SessionLocal
+    from fastapi_app.models import AuditTrail, User
+    from fastapi_app.audit_archive import apply_retention, archive_cache
+    from fastapi_app.main import app
+
+    init_db()
+    now = datetime.now()
+    with engine.begin() as connection:
+        connection.execute(insert(User), [{"username": "admin", "password": "x", "email": "admin@example.com",
+                                           "first_name": "Admin", "last_name": "User", "role": "admin"}])
+        step = 365 * 86400 / rows
+        connection.execute(insert(AuditTrail), [
+            {"user_id": i % USERS + 1, "username": f"user{i % USERS + 1}", "action": ("LIST", "VIEW", "UPDATE")[i % 3],
+             "table_name": "assets", "record_id": i % 5000, "request_method": "GET", "response_status": 200,
+             "timestamp": now - timedelta(days=365) + timedelta(seconds=i * step)}
+            for i in range(rows)
+        ])
+    db = SessionLocal()
+    start = time.perf_counter()
+    archived = apply_retention(db, retention_months=0)
+    db.close()
+    print(f"archived {sum(archived.values())} rows in {len(archived)} months "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    headers = auth_headers()
+    queries = {
+        "newest first": {"include_archived": "true", "limit": LIMIT, "table_name": "assets"},
+        "user7, oldest first": {"include_archived": "true", "limit": LIMIT, "table_name": "assets",
+                                "search": "user7", "sort_order": "asc"},
+    }
+    with TestClient(app) as client:
+        client.get("/audit/", params={"limit": 1}, headers=headers).raise_for_status()
+        for label, params in queries.items():
+            pages = {}
+            for cached in (False, True):
+                archive_cache.clear()
+                archive_cache.max_rows = rows if cached else 0
+                archive_cache.max_counts = 4096 if cached else 0
+                results = []
+                for page in range(PAGES):
+                    if page <= 1:
+                        start = time.perf_counter()
+                    response = client.get("/audit/", params={**params, "skip": page * LIMIT}, headers=headers)
+                    response.raise_for_status()
+                    body = response.json()
+                    results.append((body["total"], [(record["id"], record.get("archived", False))
+                                                    for record in body["records"]]))
+                    if page == 0:
+                        elapsed = time.perf_counter() - start
+                        report(f"{label}, first page ({'cache' if cached else 'no cache'})", elapsed, 1 / elapsed, "pages/s")
+                elapsed = time.perf_counter() - start
+                report(f"{label}, next {PAGES - 1} pages ({'cache' if cached else 'no cache'})", elapsed,
+                       (PAGES - 1) / elapsed, "pages/s")
+                pages[cached] = results
+            assert pages[False] == pages[True], label
+        print("cache stats:", archive_cache.stats())
+    print("cached and uncached pages match")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
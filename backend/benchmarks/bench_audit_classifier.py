@@ -0,0 +1,70 @@
+"""
+Per-request classification overhead in AuditMiddleware.
+
+Compares the original per-request approach (a dozen re.search calls with
+string patterns across should_audit / determine_action / extract_table_name /
+extract_record_id) with the precompiled route-template table.
+
+    python benchmarks/bench_audit_classifier.py [iterations]
+"""
+import re
+import sys
+
+from common import prepare_sqlite_workdir, timed, report
+
+SAMPLE_REQUESTS = [
+    ("GET", "/assets/"),
+    ("GET", "/assets/42"),
+    ("PUT", "/assets/42"),
+    ("POST", "/assets/42/complaints"),
+    ("GET", "/users/me"),
+    ("GET", "/notifications/"),
+    ("PUT", "/maintenance/7/status"),
+    ("GET", "/audit/stats/summary"),
+    ("GET", "/dashboard/stats"),
+    ("GET", "/health"),
+]
+
+def legacy_classify(middleware, method, path):
+    """The string-pattern classification AuditMiddleware used to run per request"""
+    for pattern in middleware.exclude_patterns:
+        if re.search(pattern, path, re.IGNORECASE):
+            return None
+    if not any(re.search(pattern, path, re.IGNORECASE) for pattern in middleware.audit_worthy_patterns):
+        return None
+    if method == "GET":
+        action = "VIEW" if ("/{id}" in path or re.search(r'/\d+$', path)) else "LIST"
+    else:
+        action = method
+    table_name = middleware.table_mapping.get(path.replace("/api", "").strip("/").split("/")[0])
+    id_match = re.search(r'/(\d+)(?:/|$)', path)
+    return action, table_name, int(id_match.group(1)) if id_match else None
+
+def main(iterations: int = 20000):
+    prepare_sqlite_workdir()
+    from fastapi_app.main import app
+    from fastapi_app.audit_middleware import AuditMiddleware
+
+    middleware = AuditMiddleware(app)
+    middleware.classify("GET", "/")  # build the route table outside the timed loop
+    re.purge()
+
+    def run_legacy():
+        for method, path in SAMPLE_REQUESTS:
+            legacy_classify(middleware, method, path)
+
+    def run_compiled():
+        for method, path in SAMPLE_REQUESTS:
+            middleware.classify(method, path)
+
+    calls = iterations * len(SAMPLE_REQUESTS)
+    elapsed, _ = timed(run_legacy, iterations)
+    report("string patterns (per request)", elapsed, calls / elapsed, "req/s")
+    print(f"{'':<40} {elapsed / calls * 1e6:8.2f} us/request")
+    elapsed, _ = timed(run_compiled, iterations)
+    report("route table (per request)", elapsed, calls / elapsed, "req/s")
+    print(f"{'':<40} {elapsed / calls * 1e6:8.2f} us/request")
+    print(f"route templates compiled: {middleware.route_table.route_count}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,96 @@
+"""
+/audit/stats/summary: raw audit_trail aggregates vs. the hourly rollups.
+
+Loads the synthetic audit log from bench_audit_search.py (500k rows by
+default), builds the rollups, then times the summary statistics computed both
+ways and checks that they agree. Distinct user / IP counts are timed apart:
+they scale with distinct (hour, user, IP) combinations, and the synthetic log
+gives almost every row its own IP address, which is their worst case.
+
+    python benchmarks/bench_audit_stats.py [rows]
+"""
+import sys
+import time
+
+from common import prepare_sqlite_workdir, report
+from bench_audit_search import synthetic_rows
+
+def raw_counts(db, AuditTrail):
+    from sqlalchemy import func
+    query = db.query(AuditTrail)
+    return {
+        "total_records": query.count(),
+        "unique_tables": query.with_entities(func.count(func.distinct(AuditTrail.table_name))).scalar(),
+        "error_count": query.filter(AuditTrail.error_message.isnot(None)).count(),
+        "actions": len(db.query(AuditTrail.action, func.count(AuditTrail.id)).group_by(AuditTrail.action).all()),
+        "tables": len(db.query(AuditTrail.table_name, func.count(AuditTrail.id)).group_by(AuditTrail.table_name).all()),
+    }
+
+def raw_actors(db, AuditTrail):
+    from sqlalchemy import func
+    query = db.query(AuditTrail)
+    return (
+        query.with_entities(func.count(func.distinct(AuditTrail.user_id))).scalar(),
+        query.with_entities(func.count(func.distinct(AuditTrail.ip_address))).scalar(),
+    )
+
+def rollup_counts(db):
+    from fastapi_app import audit_rollups
+    total_records, error_count = audit_rollups.count_records(db)
+    return {
+        "total_records": total_records,
+        "unique_tables": audit_rollups.count_unique_tables(db),
+        "error_count": error_count,
+        "actions": len(audit_rollups.action_breakdown(db)),
+        "tables": len(audit_rollups.table_breakdown(db)),
+    }
+
+def rollup_actors(db):
+    from fastapi_app import audit_rollups
+    return audit_rollups.count_unique_actors(db)
+
+def main(rows: int = 500_000):
+    prepare_sqlite_workdir()
+    from sqlalchemy import insert
+    from fastapi_app.database import engine, SessionLocal, init_db
+    from fastapi_app.models import AuditTrail
+    from fastapi_app.audit_rollups import rebuild_rollups
+
+    init_db()
+    print(f"inserting {rows} synthetic audit rows...")
+    batch = []
+    with engine.begin() as connection:
+        for row in synthetic_rows(rows):
+            batch.append(row)
+            if len(batch) == 10000:
+                connection.execute(insert(AuditTrail), batch)
+                batch = []
+        if batch:
+            connection.execute(insert(AuditTrail), batch)
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        rebuild_rollups(db)
+        print(f"built rollups in {time.perf_counter() - start:.1f}s")
+
+        for label, raw_fn, rollup_fn in (
+            ("counts and breakdowns", lambda: raw_counts(db, AuditTrail), lambda: rollup_counts(db)),
+            ("distinct users / IPs", lambda: raw_actors(db, AuditTrail), lambda: rollup_actors(db)),
+        ):
+            start = time.perf_counter()
+            raw = raw_fn()
+            raw_elapsed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            rolled = rollup_fn()
+            rollup_elapsed = time.perf_counter() - start
+
+            print(f"{label}: raw {raw}, rollups {rolled}")
+            report("  raw audit_trail", raw_elapsed, 1 / raw_elapsed, "q/s")
+            report("  hourly rollups", rollup_elapsed, 1 / rollup_elapsed, "q/s")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
@@ -0,0 +1,49 @@
+"""
+Depreciation engine over synthetic asset columns (1M assets by default).
+
+Times depreciation.compute (book value, accumulated, monthly and yearly
+charges for every asset) plus the per-category and total reductions, and a
+12-month portfolio schedule. Loading the columns from the database is not
+included; it is one column select regardless of the methods in use.
+
+    python benchmarks/bench_depreciation.py [assets]
+"""
+import sys
+from datetime import date
+
+from common import timed, report
+
+def synthetic_columns(count: int, seed: int = 42):
+    import numpy as np
+    from fastapi_app.depreciation import AssetColumns, CATEGORY_POLICIES, month_index
+    rng = np.random.default_rng(seed)
+    names = list(CATEGORY_POLICIES) + [None]
+    purchase_month = rng.integers(month_index(date(2000, 1, 1)), month_index(date.today()) + 1, count)
+    # A few assets without a purchase date
+    purchase_month[rng.random(count) < 0.01] = -1
+    return AssetColumns(
+        ids=np.arange(1, count + 1, dtype=np.int64),
+        cost=rng.uniform(5_000, 5_000_000, count).round(2),
+        purchase_month=purchase_month.astype(np.int64),
+        category=rng.integers(0, len(names), count).astype(np.int64),
+        category_names=names
+    )
+
+def main(count: int = 1_000_000):
+    from fastapi_app import depreciation
+    columns = synthetic_columns(count)
+    as_of = date.today()
+
+    def full_run():
+        figures = depreciation.compute(columns, as_of)
+        depreciation.by_category(columns, figures)
+        return depreciation.totals(columns, figures)
+
+    print(f"{count} assets, totals: {full_run()}")
+    elapsed, rate = timed(full_run, 5)
+    report("compute + breakdown (per run)", elapsed / 5, rate, "runs/s")
+    elapsed, rate = timed(lambda: depreciation.schedule(columns, as_of, 12), 5)
+    report("12-month schedule (per run)", elapsed / 5, rate, "runs/s")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,134 @@
+"""
+Notification compaction: hot table size and listing latency before and after.
+
+Fills a fresh SQLite database with a year of synthetic notifications (mixed
+types, mostly read, some reply threads and fanned-out payloads), runs
+notification_compaction.compact and reports rows left in the hot table,
+archive size against the JSON it holds, and GET /notifications/ latency
+for a user's first and last page. Checks that unread counts and reply
+threads are untouched, that every archived notification can be read back,
+and that a later run folds the first run's digests into new ones.
+
+    python benchmarks/bench_notification_compaction.py [notifications]
+"""
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import prepare_sqlite_workdir, auth_headers, report
+
+USERS = 50
+TYPES = ["maintenance_complaint", "complaint_submitted", "complaint_reply", "info", "transfer"]
+
+def synthetic_notifications(count: int, now: datetime, seed: int = 3):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            "user_id": rng.randrange(1, USERS + 1),
+            "sender_id": rng.randrange(1, USERS + 1),
+            "title": f"Notification {i}",
+            "message": "Synthetic notification " + "x" * rng.randrange(50, 300),
+            "type": rng.choice(TYPES),
+            "priority": "normal",
+            "direction": "received",
+            "is_read": rng.random() < 0.8,
+            "notification_metadata": {"asset_id": rng.randrange(1, 500)},
+            "created_at": now - timedelta(days=365) + timedelta(seconds=i * 365 * 86400 // count),
+        }
+
+def main(total: int = 100_000):
+    prepare_sqlite_workdir(copy_db=False)
+    from sqlalchemy import insert, func, select
+    from fastapi.testclient import TestClient
+    from fastapi_app.database import engine, init_db, SessionLocal
+    from fastapi_app.models import Notification, NotificationArchive, NotificationPayload, User
+    from fastapi_app.notification_compaction import compact, load_archive
+    from fastapi_app.notification_counts import unread_count
+    from fastapi_app.notification_fanout import fan_out
+    from fastapi_app.main import app
+
+    init_db()
+    now = datetime.now()
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"username": "admin" if i == 1 else f"user{i}", "password": "x", "email": f"user{i}@example.com",
+             "first_name": "User", "last_name": str(i), "role": "admin" if i == 1 else "user"}
+            for i in range(1, USERS + 1)
+        ])
+        connection.execute(insert(Notification), list(synthetic_notifications(total, now)))
+    init_db()  # counters for the rows above
+
+    db = SessionLocal()
+    fan_out(db, range(1, USERS + 1), title="Old fan-out", message="Shared", type="maintenance_complaint",
+            created_at=now - timedelta(days=300))
+    db.commit()
+    db.query(Notification).filter(Notification.payload_id.isnot(None)).update({"is_read": 1})
+    db.commit()
+    old_root = db.query(Notification.id).filter(Notification.user_id == 1, Notification.is_read == 1) \
+        .order_by(Notification.id).first()[0]
+    headers = auth_headers()
+
+    def hot_rows():
+        return db.query(func.count(Notification.id)).scalar()
+
+    def unread_counts():
+        return {user_id: unread_count(db, user_id) for user_id in range(1, USERS + 1)}
+
+    def last_page(client):
+        params, pages = {"user_id": 1, "limit": 500}, 0
+        start = time.perf_counter()
+        while True:
+            response = client.get("/notifications/", params=params, headers=headers)
+            response.raise_for_status()
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                return time.perf_counter() - start, pages
+            params["cursor"] = cursor
+
+    with TestClient(app) as client:
+        reply = client.post("/notifications/", json={"user_id": 2, "message": "Re", "parent_id": old_root},
+                            headers=headers).json()
+        unread_before = unread_counts()
+        rows_before = hot_rows()
+        elapsed, pages = last_page(client)
+        report(f"user 1, all {pages} pages before ({rows_before} rows)", elapsed, 1 / elapsed)
+
+        start = time.perf_counter()
+        stats = compact(db, now=now)
+        elapsed = time.perf_counter() - start
+        report(f"compact ({stats['archived']} notifications)", elapsed, stats["archived"] / elapsed, "rows/s")
+
+        archived_json = 0
+        archived_ids = set()
+        for archive in db.query(NotificationArchive):
+            records = load_archive(archive)
+            assert len(records) == archive.notification_count
+            archived_json += len(json.dumps(records).encode())
+            archived_ids.update(record["id"] for record in records)
+        assert len(archived_ids) == stats["archived"]
+        rows_after = hot_rows()
+        print(f"hot table {rows_before} -> {rows_after} rows ({stats['users']} digests); archive "
+              f"{stats['archive_bytes'] / 1e6:.2f} MB for {archived_json / 1e6:.2f} MB of JSON")
+        elapsed, pages = last_page(client)
+        report(f"user 1, all {pages} pages after ({rows_after} rows)", elapsed, 1 / elapsed)
+
+        assert unread_counts() == unread_before, "unread counts changed"
+        assert db.get(Notification, old_root) is not None, "thread root was compacted"
+        assert client.get(f"/notifications/threads/{reply['id']}", headers=headers).json()["root_id"] == old_root
+        assert db.query(NotificationPayload).count() == 0, "orphaned fan-out payload left behind"
+        print("unread counts, reply threads and payload cleanup check out")
+
+        later = compact(db, now=now + timedelta(days=200))
+        digests = db.query(Notification).filter(Notification.type == "notification_digest").all()
+        assert len(digests) == USERS, len(digests)
+        folded = sum(digest.notification_metadata["archived"] for digest in digests)
+        print(f"second run 200 days later: {later['archived']} more archived, "
+              f"{len(digests)} digests covering {folded} notifications")
+        assert folded == db.scalar(select(func.sum(NotificationArchive.notification_count))) - stats["users"]
+    db.close()
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,104 @@
+"""
+Complaint notification fan-out: one ORM object per recipient vs notification_fanout.
+
+Fills a fresh SQLite database with admins (500 by default) and compares,
+for one complaint-sized notification:
+  - the previous approach (full title, message and metadata per recipient,
+    db.add one object at a time)
+  - fan_out (one shared payload, thin rows via multi-row INSERT)
+  - POST /maintenance-complaints/ inline and with the fan-out deferred
+reporting time, SQL statements and notification content bytes stored.
+
+    python benchmarks/bench_notification_fanout.py [recipients]
+"""
+import json
+import sys
+import time
+from datetime import datetime
+
+from common import prepare_sqlite_workdir, auth_headers, report, QueryCounter
+
+def complaint_content(sender_id: int):
+    asset_details = "\nAsset Details:\n" + "".join(f"• Field {i}: value {i}\n" for i in range(9))
+    return {
+        "sender_id": sender_id,
+        "title": "Maintenance Complaint: Generator",
+        "message": "Complaint Type: electrical\nDescription: Does not start\nLocation: Gusau\n"
+                   "Department: Works\nPriority: high" + asset_details,
+        "type": "maintenance_complaint",
+        "priority": "high",
+        "action_url": "/assets/1",
+        "action_text": "View Asset Details",
+        "notification_metadata": {
+            "asset_id": 1, "asset_name": "Generator", "complaint_id": 1, "complaint_type": "electrical",
+            "user_location": "Gusau", "user_department": "Works",
+            "asset_details": {key: f"{key} value" for key in
+                              ("name", "category", "model", "manufacturer", "serial_number", "location", "status", "condition")},
+        },
+    }
+
+def content_bytes(content) -> int:
+    return sum(len(str(content.get(key) or "")) for key in ("title", "message", "action_url", "action_text")) \
+        + len(json.dumps(content["notification_metadata"]))
+
+def main(recipients: int = 500):
+    prepare_sqlite_workdir(copy_db=False)
+    from sqlalchemy import insert, func
+    from fastapi.testclient import TestClient
+    from fastapi_app.database import engine, init_db, SessionLocal
+    from fastapi_app.models import Notification, User
+    from fastapi_app import notification_fanout
+    from fastapi_app.notification_fanout import fan_out, fanout_worker
+    from fastapi_app.main import app
+
+    init_db()
+    with engine.begin() as connection:
+        connection.execute(insert(User), [{"username": "complainant", "password": "x", "email": "c@example.com",
+                                           "first_name": "C", "last_name": "User", "role": "user", "location": "Gusau"}])
+        connection.execute(insert(User), [
+            {"username": f"admin{i}", "password": "x", "email": f"admin{i}@example.com",
+             "first_name": "Admin", "last_name": str(i), "role": "admin", "location": "Gusau"}
+            for i in range(recipients)
+        ])
+    counter = QueryCounter(engine)
+    db = SessionLocal()
+    recipient_ids = [user_id for (user_id,) in db.query(User.id).filter(User.role == "admin")]
+    content = complaint_content(sender_id=1)
+
+    before = counter.count
+    start = time.perf_counter()
+    for user_id in recipient_ids:
+        db.add(Notification(user_id=user_id, is_read=0, created_at=datetime.now(), **content))
+    db.commit()
+    elapsed = time.perf_counter() - start
+    report(f"ORM object per recipient ({recipients})", elapsed, recipients / elapsed, "rows/s")
+    print(f"{'':<40} {counter.count - before} statements, {content_bytes(content) * recipients / 1e3:.1f} kB content")
+
+    before = counter.count
+    start = time.perf_counter()
+    fan_out(db, recipient_ids, **content)
+    db.commit()
+    elapsed = time.perf_counter() - start
+    report(f"fan_out ({recipients})", elapsed, recipients / elapsed, "rows/s")
+    print(f"{'':<40} {counter.count - before} statements, {content_bytes(content) / 1e3:.1f} kB content")
+    db.close()
+
+    body = {"asset_name": "Generator", "complaint_type": "electrical", "description": "Does not start",
+            "user_location": "Gusau", "user_department": "Works", "priority": "high"}
+    headers = auth_headers("complainant")
+    with TestClient(app) as client:
+        for label, threshold in (("inline", 0), ("deferred", 1)):
+            notification_fanout.NOTIFICATION_FANOUT_DEFER_THRESHOLD = threshold
+            before = counter.count
+            start = time.perf_counter()
+            response = client.post("/maintenance-complaints/", json=body, headers=headers)
+            elapsed = time.perf_counter() - start
+            response.raise_for_status()
+            report(f"POST /maintenance-complaints/ {label}", elapsed, 1 / elapsed)
+            print(f"{'':<40} {counter.count - before} statements in the request, {response.json()}")
+        fanout_worker.flush()
+    with engine.connect() as connection:
+        print("notifications written:", connection.execute(func.count(Notification.id).select()).scalar())
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,96 @@
+"""
+Query count and latency of GET /notifications/ as the number of notifications grows.
+
+Fills a fresh SQLite database with users and synthetic notifications in
+steps, counts the SQL statements one request issues and asserts the count
+doesn't change with the table size (the listing used to run two user
+lookups per notification). Also walks every page with the keyset cursor.
+
+    python benchmarks/bench_notification_queries.py [max_notifications]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import prepare_sqlite_workdir, auth_headers, report, QueryCounter
+
+USERS = 50
+
+def synthetic_notifications(start: int, count: int, seed: int = 7):
+    rng = random.Random(seed + start)
+    base = datetime(2025, 1, 1)
+    for i in range(start, start + count):
+        yield {
+            "user_id": rng.randrange(1, USERS + 1),
+            "sender_id": rng.choice([None, rng.randrange(1, USERS + 1)]),
+            "title": f"Notification {i}",
+            "message": "Synthetic notification",
+            "type": "info",
+            "priority": "normal",
+            "direction": "received",
+            "is_read": 0,
+            "created_at": base + timedelta(minutes=i),
+        }
+
+def main(max_notifications: int = 20_000):
+    prepare_sqlite_workdir(copy_db=False)
+    from sqlalchemy import insert
+    from fastapi.testclient import TestClient
+    from fastapi_app.database import engine, init_db
+    from fastapi_app.models import Notification, User
+    from fastapi_app.main import app
+
+    init_db()
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"username": "admin" if i == 1 else f"user{i}", "password": "x", "email": f"user{i}@example.com",
+             "first_name": "User", "last_name": str(i), "role": "admin" if i == 1 else "user"}
+            for i in range(1, USERS + 1)
+        ])
+
+    headers = auth_headers()
+    counter = QueryCounter(engine)
+    counts = {}
+    inserted = 0
+    sizes = [size for size in (100, 1_000, 5_000, max_notifications) if size <= max_notifications]
+    with TestClient(app) as client:
+        client.get("/notifications/", headers=headers).raise_for_status()  # warm up the principal cache
+        for size in sorted(set(sizes)):
+            with engine.begin() as connection:
+                connection.execute(insert(Notification), list(synthetic_notifications(inserted, size - inserted)))
+            inserted = size
+
+            before = counter.count
+            start = time.perf_counter()
+            response = client.get("/notifications/", params={"user_id": 1}, headers=headers)
+            elapsed = time.perf_counter() - start
+            response.raise_for_status()
+            counts[size] = counter.count - before
+            report(f"{size} notifications, first page", elapsed, 1 / elapsed)
+            print(f"{'':<40} {counts[size]} queries, {len(response.json())} rows")
+
+            pages = 0
+            rows = 0
+            before = counter.count
+            start = time.perf_counter()
+            params = {"limit": 500}
+            while True:
+                response = client.get("/notifications/", params=params, headers=headers)
+                response.raise_for_status()
+                pages += 1
+                rows += len(response.json())
+                cursor = response.headers.get("X-Next-Cursor")
+                if not cursor:
+                    break
+                params["cursor"] = cursor
+            elapsed = time.perf_counter() - start
+            assert rows == size, (rows, size)
+            report(f"{size} notifications, all {pages} pages", elapsed, rows / elapsed, "rows/s")
+            print(f"{'':<40} {(counter.count - before) / pages:.1f} queries per page")
+
+    assert len(set(counts.values())) == 1, f"query count grows with the table: {counts}"
+    print(f"query count is constant: {next(iter(counts.values()))} per request")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
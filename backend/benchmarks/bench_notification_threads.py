@@ -0,0 +1,115 @@
+"""
+Loading a reply chain: one GET /notifications/?parent_id= per level vs /notifications/threads/{root_id}.
+
+Fills a fresh SQLite database with background notifications and threads of
+growing depth whose replies were written without thread_root_id (as before
+the column existed), lets init_db backfill it, then for each thread compares
+walking the chain level by level with the thread endpoint (walking its pages
+with the cursor). Asserts both return the same notifications and that the
+thread endpoint's query count doesn't grow with the depth.
+
+    python benchmarks/bench_notification_threads.py [background_notifications]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import prepare_sqlite_workdir, auth_headers, report, QueryCounter
+
+USERS = 10
+DEPTHS = (5, 50, 500)
+
+def main(background: int = 50_000):
+    prepare_sqlite_workdir(copy_db=False)
+    from sqlalchemy import insert, select, text
+    from fastapi.testclient import TestClient
+    from fastapi_app.database import engine, init_db
+    from fastapi_app.models import Notification, User
+    from fastapi_app.main import app
+
+    init_db()
+    base = datetime(2025, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"username": "admin" if i == 1 else f"user{i}", "password": "x", "email": f"user{i}@example.com",
+             "first_name": "User", "last_name": str(i), "role": "admin" if i == 1 else "user"}
+            for i in range(1, USERS + 1)
+        ])
+        connection.execute(insert(Notification), [
+            {"user_id": i % USERS + 1, "sender_id": (i + 1) % USERS + 1, "title": f"Notification {i}",
+             "message": "Background", "direction": "received", "is_read": 0,
+             "created_at": base + timedelta(seconds=i)}
+            for i in range(background)
+        ])
+        roots = {}
+        for depth in DEPTHS:
+            parent_id = None
+            for level in range(depth + 1):
+                parent_id = connection.execute(insert(Notification).values(
+                    user_id=level % 2 + 1, sender_id=(level + 1) % 2 + 1, parent_id=parent_id,
+                    title=f"Thread {depth} message {level}", message="Reply", direction="received",
+                    is_read=0, created_at=base + timedelta(days=1, minutes=level)
+                )).inserted_primary_key[0]
+                roots.setdefault(depth, parent_id)
+    init_db()  # backfills thread_root_id of the replies above
+    with engine.connect() as connection:
+        plan = connection.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM notifications WHERE id = :root OR thread_root_id = :root "
+            "ORDER BY created_at, id"), {"root": roots[DEPTHS[-1]]}).all()
+        print("thread query plan:", "; ".join(row[-1] for row in plan))
+
+    headers = auth_headers()
+    counter = QueryCounter(engine)
+    thread_queries = {}
+    with TestClient(app) as client:
+        client.get("/notifications/unread-count", headers=headers).raise_for_status()  # warm up the principal cache
+        for depth, root_id in roots.items():
+            before = counter.count
+            start = time.perf_counter()
+            response = client.get("/notifications/", params={"user_id": 1, "limit": 1}, headers=headers)
+            walked = []
+            level = [root_id]
+            while level:
+                walked.extend(level)
+                next_level = []
+                for parent_id in level:
+                    response = client.get("/notifications/", params={"parent_id": parent_id, "limit": 500}, headers=headers)
+                    response.raise_for_status()
+                    next_level.extend(row["id"] for row in response.json())
+                level = next_level
+            elapsed = time.perf_counter() - start
+            report(f"depth {depth}, per-level requests", elapsed, len(walked) / elapsed, "rows/s")
+            print(f"{'':<40} {counter.count - before} queries")
+
+            before = counter.count
+            start = time.perf_counter()
+            thread = []
+            params = {"limit": 100}
+            while True:
+                response = client.get(f"/notifications/threads/{walked[-1]}", params=params, headers=headers)
+                response.raise_for_status()
+                body = response.json()
+                thread.extend(row["id"] for row in body["notifications"])
+                cursor = response.headers.get("X-Next-Cursor")
+                if not cursor:
+                    break
+                params["cursor"] = cursor
+            elapsed = time.perf_counter() - start
+            assert body["root_id"] == root_id
+            assert thread == sorted(walked), (depth, len(thread), len(walked))
+            thread_queries[depth] = counter.count - before
+            report(f"depth {depth}, /notifications/threads", elapsed, len(thread) / elapsed, "rows/s")
+            print(f"{'':<40} {thread_queries[depth]} queries, senders {[s['messages'] for s in body['senders']]}")
+
+        # A new reply lands in the thread of the notification it answers
+        reply = client.post("/notifications/", json={"user_id": 2, "message": "New", "parent_id": walked[-1]},
+                            headers=headers).json()
+        assert reply["thread_root_id"] == roots[DEPTHS[-1]], reply
+
+    pages = {depth: -(-(depth + 1) // 100) for depth in DEPTHS}
+    per_page = {depth: thread_queries[depth] / pages[depth] for depth in DEPTHS}
+    assert len(set(per_page.values())) == 1, f"queries per page grow with the depth: {per_page}"
+    print(f"thread endpoint: {next(iter(per_page.values())):.0f} queries per page at every depth")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
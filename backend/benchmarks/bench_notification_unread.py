@@ -0,0 +1,124 @@
+"""
+Unread notification count: COUNT over notifications vs the per-user counter.
+
+Fills a fresh SQLite database with users and synthetic notifications, then
+compares the nav badge's old approach (list the user's notifications and
+count the unread ones), a COUNT(*) ... WHERE is_read = 0 and
+GET /notifications/unread-count, and times POST /notifications/read-all.
+Along the way the counters are checked against a COUNT after notifications
+are created, fanned out, marked read one by one and all marked read.
+
+    python benchmarks/bench_notification_unread.py [notifications]
+"""
+import random
+import sys
+import time
+
+from common import prepare_sqlite_workdir, auth_headers, report, QueryCounter
+
+USERS = 50
+REPEAT = 20
+
+def main(total: int = 100_000):
+    prepare_sqlite_workdir(copy_db=False)
+    from sqlalchemy import insert, func
+    from fastapi.testclient import TestClient
+    from fastapi_app.database import engine, init_db, SessionLocal
+    from fastapi_app.models import Notification, User
+    from fastapi_app.notification_counts import effective_is_read, get_counter
+    from fastapi_app.notification_fanout import fan_out
+    from fastapi_app.main import app
+
+    init_db()
+    rng = random.Random(5)
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"username": "admin" if i == 1 else f"user{i}", "password": "x", "email": f"user{i}@example.com",
+             "first_name": "User", "last_name": str(i), "role": "admin" if i == 1 else "user"}
+            for i in range(1, USERS + 1)
+        ])
+        connection.execute(insert(Notification), [
+            {"user_id": rng.randrange(1, USERS + 1), "title": f"Notification {i}", "message": "Synthetic",
+             "direction": "received", "is_read": rng.random() < 0.7}
+            for i in range(total)
+        ])
+    # The rows above bypassed the session; backfill their counters like a migrated database
+    init_db()
+
+    def check(label):
+        db = SessionLocal()
+        try:
+            for user_id in range(1, USERS + 1):
+                counter = get_counter(db, user_id)
+                expected = sum(
+                    1 for notification in db.query(Notification).filter(Notification.user_id == user_id)
+                    if not effective_is_read(notification, counter.read_through_id)
+                )
+                assert counter.unread == expected, (label, user_id, counter.unread, expected)
+        finally:
+            db.close()
+        print(f"counters match after {label}")
+
+    check("backfill")
+    headers = auth_headers()
+    counter = QueryCounter(engine)
+    with TestClient(app) as client:
+        client.get("/notifications/unread-count", headers=headers).raise_for_status()  # warm up the principal cache
+
+        db = SessionLocal()
+        for i in range(200):
+            db.add(Notification(user_id=rng.randrange(1, USERS + 1), title="New", message="ORM", is_read=0))
+        db.commit()
+        fan_out(db, range(1, USERS + 1), title="Fanned out", message="Thin rows")
+        db.commit()
+        db.close()
+        check("ORM inserts and a fan-out")
+
+        ids = [notification["id"] for notification in client.get(
+            "/notifications/", params={"user_id": 1, "limit": 20}, headers=headers).json()]
+        for notification_id in ids:
+            client.put(f"/notifications/{notification_id}/read", headers=headers).raise_for_status()
+        check("marking read one by one")
+
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            client.get("/notifications/", params={"user_id": 1, "limit": 500}, headers=headers).raise_for_status()
+        elapsed = (time.perf_counter() - start) / REPEAT
+        report("list and count (500 rows, old badge)", elapsed, 1 / elapsed)
+
+        with engine.connect() as connection:
+            start = time.perf_counter()
+            for _ in range(REPEAT):
+                connection.execute(func.count(Notification.id).select().where(Notification.is_read == 0)).scalar()
+            elapsed = (time.perf_counter() - start) / REPEAT
+        report(f"COUNT(*) WHERE is_read = 0 ({total})", elapsed, 1 / elapsed)
+
+        before = counter.count
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            response = client.get("/notifications/unread-count", headers=headers)
+            response.raise_for_status()
+        elapsed = (time.perf_counter() - start) / REPEAT
+        report("GET /notifications/unread-count", elapsed, 1 / elapsed)
+        print(f"{'':<40} {(counter.count - before) / REPEAT:.0f} queries, {response.json()}")
+
+        before = counter.count
+        start = time.perf_counter()
+        response = client.post("/notifications/read-all", headers=headers)
+        elapsed = time.perf_counter() - start
+        response.raise_for_status()
+        report("POST /notifications/read-all", elapsed, 1 / elapsed)
+        print(f"{'':<40} {counter.count - before} queries, {response.json()}")
+        assert response.json()["unread"] == 0
+        check("mark all read")
+
+        client.put(f"/notifications/{ids[0]}/read", headers=headers).raise_for_status()
+        db = SessionLocal()
+        fan_out(db, [1], title="After read-all", message="Counts again")
+        db.commit()
+        db.close()
+        assert client.get("/notifications/unread-count", headers=headers).json()["unread"] == 1
+        check("new notifications after mark all read")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
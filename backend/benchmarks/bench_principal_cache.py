@@ -0,0 +1,36 @@
+"""
+Requests/sec for an authenticated endpoint with and without the principal cache.
+
+    python benchmarks/bench_principal_cache.py [iterations]
+"""
+import sys
+
+from common import prepare_sqlite_workdir, auth_headers, timed, report
+
+def main(iterations: int = 500):
+    prepare_sqlite_workdir()
+    from fastapi.testclient import TestClient
+    from fastapi_app.main import app
+    from fastapi_app.principal_cache import principal_cache
+
+    headers = auth_headers()
+    # Startup hooks create the rollup and side tables the audit writer needs
+    with TestClient(app) as client:
+        def call():
+            response = client.get("/users/me", headers=headers)
+            assert response.status_code == 200, response.text
+
+        call()  # warm up imports, connection pool and route table
+
+        principal_cache.enabled = False
+        elapsed, rate = timed(call, iterations)
+        report("GET /users/me (cache disabled)", elapsed, rate)
+
+        principal_cache.enabled = True
+        principal_cache.clear()
+        elapsed, rate = timed(call, iterations)
+        report("GET /users/me (cache enabled)", elapsed, rate)
+        print("cache stats:", principal_cache.stats())
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
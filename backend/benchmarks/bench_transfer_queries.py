@@ -0,0 +1,91 @@
+"""
+Query count and latency of GET /transfer_requests/ as the table grows.
+
+Fills a fresh SQLite database with assets, users and synthetic transfer
+requests in steps, counts the SQL statements of one listing request (a full
+page, a status filter and a location filter) and asserts the count doesn't
+change with the table size (the listing used to run an asset and a user
+lookup per transfer request).
+
+    python benchmarks/bench_transfer_queries.py [max_transfer_requests]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import prepare_sqlite_workdir, auth_headers, report, QueryCounter
+
+USERS = 20
+ASSETS = 500
+LOCATIONS = ["Gusau", "Tsafe", "Bungudu", "Maru", "Kaura Namoda"]
+STATUSES = ["pending", "approved", "rejected", "completed", "cancelled"]
+
+def synthetic_transfers(start: int, count: int, seed: int = 11):
+    rng = random.Random(seed + start)
+    base = datetime(2025, 1, 1)
+    for i in range(start, start + count):
+        from_location, to_location = rng.sample(LOCATIONS, 2)
+        yield {
+            "asset_id": rng.choice([None, rng.randrange(1, ASSETS + 50)]),  # some point at missing assets
+            "from_location": from_location,
+            "to_location": to_location,
+            "requested_by": rng.randrange(1, USERS + 1),
+            "status": rng.choice(STATUSES),
+            "reason": "Synthetic transfer",
+            "created_at": base + timedelta(minutes=i),
+        }
+
+def main(max_transfers: int = 20_000):
+    prepare_sqlite_workdir(copy_db=False)
+    from sqlalchemy import insert
+    from fastapi.testclient import TestClient
+    from fastapi_app.database import engine, init_db
+    from fastapi_app.models import Asset, TransferRequest, User
+    from fastapi_app.main import app
+
+    init_db()
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"username": "admin" if i == 1 else f"user{i}", "password": "x", "email": f"user{i}@example.com",
+             "first_name": "User", "last_name": str(i), "role": "admin" if i == 1 else "user"}
+            for i in range(1, USERS + 1)
+        ])
+        connection.execute(insert(Asset), [
+            {"name": f"Asset {i}", "category": "Furniture", "location": LOCATIONS[i % len(LOCATIONS)], "status": "active"}
+            for i in range(ASSETS)
+        ])
+
+    headers = auth_headers()
+    counter = QueryCounter(engine)
+    requests = {
+        "page": {},
+        "status": {"status": "pending"},
+        "location": {"location": "Gusau"},
+    }
+    counts = {label: {} for label in requests}
+    inserted = 0
+    sizes = sorted({size for size in (100, 1_000, 5_000, max_transfers) if size <= max_transfers})
+    with TestClient(app) as client:
+        client.get("/transfer_requests/", headers=headers).raise_for_status()  # warm up the principal cache
+        for size in sizes:
+            with engine.begin() as connection:
+                connection.execute(insert(TransferRequest), list(synthetic_transfers(inserted, size - inserted)))
+            inserted = size
+
+            for label, params in requests.items():
+                before = counter.count
+                start = time.perf_counter()
+                response = client.get("/transfer_requests/", params=params, headers=headers)
+                elapsed = time.perf_counter() - start
+                response.raise_for_status()
+                counts[label][size] = counter.count - before
+                report(f"{size} transfers, {label}", elapsed, 1 / elapsed)
+                print(f"{'':<40} {counts[label][size]} queries, {len(response.json())} rows")
+
+    for label, by_size in counts.items():
+        assert len(set(by_size.values())) == 1, f"{label}: query count grows with the table: {by_size}"
+    print("query count is constant:", {label: next(iter(by_size.values())) for label, by_size in counts.items()})
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
@@ -0,0 +1,54 @@
+"""
+Shared helpers for the benchmark scripts in this folder.
+
+Each benchmark runs against a throw-away copy of the development SQLite
+database (backend/famisdb.db) so the checked-in file is never modified.
+Run the scripts from the backend folder, e.g.:
+
+    python benchmarks/bench_principal_cache.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+def prepare_sqlite_workdir(copy_db: bool = True) -> str:
+    """Switch to a temporary working directory holding a copy of famisdb.db"""
+    workdir = tempfile.mkdtemp(prefix="famis-bench-")
+    if copy_db:
+        shutil.copy(os.path.join(BACKEND_DIR, "famisdb.db"), os.path.join(workdir, "famisdb.db"))
+    os.environ["USE_SQLITE"] = "true"
+    os.environ.setdefault("ASSET_UPLOAD_DIR", os.path.join(workdir, "uploads"))
+    os.chdir(workdir)
+    return workdir
+
+def auth_headers(username: str = "admin") -> dict:
+    from fastapi_app.auth import create_access_token
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+class QueryCounter:
+    """Counts the SQL statements an engine executes (read .count before and after a request)"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+def timed(fn, iterations: int):
+    """Run fn iterations times and return (elapsed_seconds, ops_per_second)"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    return elapsed, iterations / elapsed if elapsed else float("inf")
+
+def report(label: str, elapsed: float, rate: float, unit: str = "req/s"):
+    print(f"{label:<40} {elapsed:8.3f}s  {rate:10.1f} {unit}")
@@ -0,0 +1,121 @@
+"""
+Per-user access policy compiled once from the users row.
+
+AccessPolicy holds a user's role, permissions and asset locations as
+frozensets. It is built when the principal is loaded and stored on the cached
+UserSnapshot (see principal_cache.py), so route handlers answer "may this
+user do X at location Y" with set lookups instead of re-parsing the JSON
+columns and querying user_location_access on every request.
+
+The SQL side (visible_assets, visible_asset_ids) filters on the compiled
+locations directly, so it doesn't join the normalized tables either.
+"""
+from dataclasses import dataclass
+from typing import FrozenSet, Iterable, List, Optional
+from sqlalchemy import true
+from sqlalchemy.orm import Session
+from fastapi_app import models
+from fastapi_app.user_access import parse_list
+
+# Roles that may only view the asset register
+VIEW_ONLY_ASSET_ROLES = frozenset({"auction_manager", "disposal_manager"})
+
+# Asset ids per IN (...) when filtering id lists in SQL
+VISIBLE_ID_CHUNK = 1000
+
+def _role_name(role) -> Optional[str]:
+    return role.value if hasattr(role, "value") else role
+
+@dataclass(frozen=True)
+class AccessPolicy:
+    user_id: int
+    role: Optional[str]
+    permissions: FrozenSet[str] = frozenset()
+    locations: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def compile(cls, user) -> "AccessPolicy":
+        return cls(
+            user_id=user.id,
+            role=_role_name(user.role),
+            permissions=frozenset(value.strip() for value in parse_list(user.permissions) if value.strip()),
+            locations=frozenset(value.strip() for value in parse_list(user.asset_access) if value.strip()),
+        )
+
+    # Roles and permissions
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == "admin"
+
+    def has_permission(self, permission: str) -> bool:
+        return permission in self.permissions
+
+    @property
+    def maintains_assets(self) -> bool:
+        """Maintenance managers and holders of the maintenance permission"""
+        return self.role == "maintenance_manager" or "maintenance" in self.permissions
+
+    @property
+    def assets_view_only(self) -> bool:
+        return self.role in VIEW_ONLY_ASSET_ROLES
+
+    @property
+    def can_manage_assets(self) -> bool:
+        """Create, edit and delete assets (still subject to location checks)"""
+        if self.is_admin:
+            return True
+        if self.assets_view_only:
+            return False
+        return "assets" in self.permissions or self.maintains_assets
+
+    @property
+    def can_manage_maintenance(self) -> bool:
+        """Create, edit, delete and change the status of maintenance records"""
+        return self.is_admin or (self.role == "manager" and "maintenance" in self.permissions)
+
+    # Locations
+
+    @property
+    def has_locations(self) -> bool:
+        return bool(self.locations)
+
+    def can_access_location(self, location) -> bool:
+        if self.is_admin:
+            return True
+        return location is not None and location in self.locations
+
+    def filter_assets(self, assets: Iterable) -> List:
+        """The already loaded assets (anything with .location) the user may see"""
+        if self.is_admin:
+            return list(assets)
+        return [asset for asset in assets if asset.location in self.locations]
+
+    def visible_assets(self):
+        """SQL predicate on models.Asset for the assets the user may see"""
+        if self.is_admin:
+            return true()
+        return models.Asset.location.in_(sorted(self.locations))
+
+    def visible_asset_ids(self, db: Session, asset_ids: Iterable[int]) -> List[int]:
+        """The ids in asset_ids that exist and are visible to the user, in the given order"""
+        ids = list(dict.fromkeys(asset_ids))
+        if not ids or (not self.is_admin and not self.locations):
+            return []
+        visible = set()
+        predicate = self.visible_assets()
+        for start in range(0, len(ids), VISIBLE_ID_CHUNK):
+            chunk = ids[start:start + VISIBLE_ID_CHUNK]
+            visible.update(asset_id for (asset_id,) in db.query(models.Asset.id).filter(
+                models.Asset.id.in_(chunk), predicate
+            ))
+        return [asset_id for asset_id in ids if asset_id in visible]
+
+    def can_access_asset(self, db: Session, asset_id: int) -> bool:
+        """Whether the asset exists and is visible to the user, for callers that haven't loaded it"""
+        return bool(self.visible_asset_ids(db, [asset_id]))
+
+def policy_of(user) -> AccessPolicy:
+    """The compiled policy of a principal, compiling it for plain models.User rows"""
+    policy = getattr(user, "policy", None)
+    return policy if policy is not None else AccessPolicy.compile(user)
@@ -0,0 +1,472 @@
+"""
+Bulk import of assets from CSV, XLSX or NDJSON files.
+
+POST /assets/import stores the upload in a temporary file, records an
+asset_import_jobs row and queues the job on a background worker; clients
+poll GET /assets/import/{job_id} for progress and the per-row error report.
+
+The worker reads the file a row at a time (csv / line by line / openpyxl in
+read-only mode) and handles it in chunks of the job's batch size. Each chunk:
+  - is validated against schemas.AssetCreate in one TypeAdapter call, rows
+    with errors being set aside with their messages
+  - is checked for status values, column lengths and the importing user's
+    location access
+  - has its barcodes and qrcodes checked against the assets table with one
+    query, and against the rest of the file
+  - is bulk-inserted, with the job's progress, in one transaction.
+
+On shutdown the running job stops after its current chunk and queued jobs
+are cancelled, both ending as failed with a message saying so.
+
+XLSX files require the optional openpyxl package.
+"""
+import atexit
+import csv
+import json
+import os
+import queue
+import tempfile
+import threading
+import uuid
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import String, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from fastapi_app import models, schemas
+from fastapi_app.access_policy import AccessPolicy
+from fastapi_app.database import SessionLocal
+
+try:
+    import openpyxl
+except ImportError:  # optional dependency, XLSX imports answer 501 without it
+    openpyxl = None
+
+ASSET_IMPORT_BATCH_SIZE = int(os.getenv('ASSET_IMPORT_BATCH_SIZE', '1000'))
+ASSET_IMPORT_BATCH_SIZE_MAX = 10000
+ASSET_IMPORT_MAX_ERRORS = int(os.getenv('ASSET_IMPORT_MAX_ERRORS', '1000'))
+ASSET_IMPORT_QUEUE_SIZE = int(os.getenv('ASSET_IMPORT_QUEUE_SIZE', '100'))
+# Where uploads wait for the worker (default: the system temp directory)
+ASSET_IMPORT_DIR = os.getenv('ASSET_IMPORT_DIR') or None
+
+IMPORT_FORMATS = ("csv", "xlsx", "ndjson")
+
+_EXTENSIONS = {".csv": "csv", ".xlsx": "xlsx", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+_MEDIA_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+_ROWS = TypeAdapter(List[schemas.AssetCreate])
+ASSET_FIELDS = set(schemas.AssetCreate.model_fields)
+_STRING_FIELDS = {name for name, field in schemas.AssetCreate.model_fields.items() if field.annotation == Optional[str]} | {"name"}
+_DATE_FIELDS = {name for name, field in schemas.AssetCreate.model_fields.items() if field.annotation == Optional[date]}
+# Longest value each string column takes
+_MAX_LENGTHS = {
+    column.name: column.type.length for column in models.Asset.__table__.columns
+    if isinstance(column.type, String) and column.type.length and column.name in ASSET_FIELDS
+}
+_STATUSES = {status.value for status in models.AssetStatus}
+
+_STOP = object()
+
+def detect_format(filename: Optional[str], content_type: Optional[str], requested: Optional[str] = None) -> Optional[str]:
+    """Import format from the format parameter, the file extension or the content type"""
+    if requested:
+        return requested.lower() if requested.lower() in IMPORT_FORMATS else None
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in _EXTENSIONS:
+        return _EXTENSIONS[extension]
+    return _MEDIA_TYPES.get((content_type or "").split(";")[0].strip().lower())
+
+# Reading
+
+def _header(names) -> List[str]:
+    return [str(name or "").strip().lower().replace(" ", "_") for name in names]
+
+def _read_csv(path: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = _header(next(reader, []))
+        for values in reader:
+            if any(value.strip() for value in values):
+                yield reader.line_num, dict(zip(header, values)), None
+
+def _read_ndjson(path: str):
+    with open(path, encoding="utf-8-sig") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                values = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(values, dict):
+                yield line_number, None, "Expected a JSON object"
+                continue
+            yield line_number, {str(key).strip().lower(): value for key, value in values.items()}, None
+
+def _read_xlsx(path: str):
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = _header(next(rows, ()))
+        for row_number, values in enumerate(rows, start=2):
+            if any(value not in (None, "") for value in values):
+                yield row_number, dict(zip(header, values)), None
+    finally:
+        workbook.close()
+
+_READERS = {"csv": _read_csv, "ndjson": _read_ndjson, "xlsx": _read_xlsx}
+
+def read_rows(path: str, file_format: str):
+    """(row number, values or None, parse error or None) for every non-empty data row"""
+    return _READERS[file_format](path)
+
+def _clean(values: Dict[str, Any]) -> Dict[str, Any]:
+    # Blank cells are missing values; spreadsheet numbers and datetimes become the schema's types
+    row = {}
+    for key, value in values.items():
+        if key not in ASSET_FIELDS:
+            continue
+        if isinstance(value, str):
+            value = value.strip() or None
+        elif key in _STRING_FIELDS and isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(int(value)) if float(value).is_integer() else str(value)
+        elif key in _DATE_FIELDS and isinstance(value, datetime):
+            value = value.date()
+        row[key] = value
+    return row
+
+# Validation
+
+def validate_chunk(rows: List[Dict[str, Any]]) -> Tuple[List[Tuple[int, schemas.AssetCreate]], Dict[int, List[Tuple[Optional[str], str]]]]:
+    """
+    Validate a chunk of rows against AssetCreate in one pass.
+
+    Returns ([(index, asset)], {index: [(field, message)]}); the rows without
+    errors are validated once more on their own to get their models.
+    """
+    try:
+        return list(enumerate(_ROWS.validate_python(rows))), {}
+    except ValidationError as e:
+        errors = defaultdict(list)
+        for error in e.errors():
+            index, *field = error["loc"]
+            errors[index].append((".".join(str(part) for part in field) or None, error["msg"]))
+    valid = [index for index in range(len(rows)) if index not in errors]
+    return list(zip(valid, _ROWS.validate_python([rows[index] for index in valid]))), errors
+
+def _check_asset(asset: schemas.AssetCreate, policy: AccessPolicy) -> List[Tuple[Optional[str], str]]:
+    errors = []
+    if asset.status is not None and asset.status not in _STATUSES:
+        errors.append(("status", f"Must be one of {', '.join(sorted(_STATUSES))}"))
+    for name, length in _MAX_LENGTHS.items():
+        value = getattr(asset, name)
+        if isinstance(value, str) and len(value) > length:
+            errors.append((name, f"At most {length} characters"))
+    if not policy.can_access_location(asset.location):
+        errors.append(("location", "Access denied to create assets in this location"))
+    return errors
+
+class ImportRun:
+    """State of one import while the worker runs it"""
+
+    def __init__(self, job: models.AssetImportJob, policy: AccessPolicy):
+        self.job = job
+        self.policy = policy
+        self.errors: List[Dict[str, Any]] = list(job.errors or [])
+        # Errors of the current chunk, reported in row order once it's done
+        self.chunk_errors: List[Dict[str, Any]] = []
+        # Codes taken by earlier rows of the file
+        self.barcodes: Set[str] = set()
+        self.qrcodes: Set[str] = set()
+
+    def fail_row(self, row_number: int, field: Optional[str], message: str):
+        self.chunk_errors.append({"row": row_number, "field": field, "message": message})
+
+    def _unique(self, db: Session, assets: List[Tuple[int, schemas.AssetCreate]]):
+        """Drop rows whose barcode or qrcode is taken in the database or earlier in the file"""
+        barcodes = {asset.barcode for _, asset in assets if asset.barcode}
+        qrcodes = {asset.qrcode for _, asset in assets if asset.qrcode}
+        taken_barcodes, taken_qrcodes = set(), set()
+        if barcodes or qrcodes:
+            for barcode, qrcode in db.execute(select(models.Asset.barcode, models.Asset.qrcode).where(
+                or_(models.Asset.barcode.in_(sorted(barcodes)), models.Asset.qrcode.in_(sorted(qrcodes)))
+            )):
+                taken_barcodes.add(barcode)
+                taken_qrcodes.add(qrcode)
+
+        unique = []
+        for row_number, asset in assets:
+            if asset.barcode and (asset.barcode in taken_barcodes or asset.barcode in self.barcodes):
+                self.fail_row(row_number, "barcode", f"Barcode {asset.barcode} is already in use")
+            elif asset.qrcode and (asset.qrcode in taken_qrcodes or asset.qrcode in self.qrcodes):
+                self.fail_row(row_number, "qrcode", f"QR code {asset.qrcode} is already in use")
+            else:
+                if asset.barcode:
+                    self.barcodes.add(asset.barcode)
+                if asset.qrcode:
+                    self.qrcodes.add(asset.qrcode)
+                unique.append((row_number, asset))
+        return unique
+
+    def _values(self, asset: schemas.AssetCreate, now: datetime) -> Dict[str, Any]:
+        values = asset.model_dump()
+        values["status"] = values["status"] or models.AssetStatus.active.value
+        values["created_by"] = values["created_by"] or self.job.user_id
+        values["created_at"] = values["updated_at"] = now
+        return values
+
+    def _insert(self, db: Session, assets: List[Tuple[int, schemas.AssetCreate]]) -> int:
+        now = datetime.now()
+        try:
+            if assets:
+                db.execute(insert(models.Asset), [self._values(asset, now) for _, asset in assets])
+            return len(assets)
+        except IntegrityError:
+            # Lost a race with another writer: find the offending rows one by one
+            db.rollback()
+        inserted = 0
+        for row_number, asset in assets:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(models.Asset), [self._values(asset, now)])
+                inserted += 1
+            except IntegrityError as e:
+                self.fail_row(row_number, None, f"Rejected by the database: {e.orig}")
+        return inserted
+
+    def process_chunk(self, db: Session, chunk: List[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]):
+        """Validate and insert one chunk, recording progress in the same transaction"""
+        failed_before = len(chunk)
+        parsed = []
+        for row_number, values, error in chunk:
+            if error:
+                self.fail_row(row_number, None, error)
+            else:
+                parsed.append((row_number, _clean(values)))
+
+        valid, errors = validate_chunk([values for _, values in parsed])
+        for index, row_errors in errors.items():
+            for field, message in row_errors:
+                self.fail_row(parsed[index][0], field, message)
+        checked = []
+        for index, asset in valid:
+            row_number = parsed[index][0]
+            row_errors = _check_asset(asset, self.policy)
+            for field, message in row_errors:
+                self.fail_row(row_number, field, message)
+            if not row_errors:
+                checked.append((row_number, asset))
+
+        inserted = self._insert(db, self._unique(db, checked))
+        job = self.job
+        job.rows_read += len(chunk)
+        job.rows_inserted += inserted
+        job.rows_failed += failed_before - inserted
+        self.chunk_errors.sort(key=lambda error: error["row"])
+        self.errors.extend(self.chunk_errors[:max(ASSET_IMPORT_MAX_ERRORS - len(self.errors), 0)])
+        self.chunk_errors = []
+        job.errors = list(self.errors)
+        db.commit()
+
+def new_job(db: Session, user_id: int, filename: Optional[str], file_format: str, batch_size: int) -> models.AssetImportJob:
+    job = models.AssetImportJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        filename=filename,
+        format=file_format,
+        status=models.AssetImportStatus.queued,
+        batch_size=batch_size,
+        rows_read=0,
+        rows_inserted=0,
+        rows_failed=0,
+        errors=[],
+        created_at=datetime.now(),
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+def save_upload(source) -> str:
+    """Copy an uploaded file object to a temporary file for the worker; returns its path"""
+    with tempfile.NamedTemporaryFile(prefix="asset_import_", dir=ASSET_IMPORT_DIR, delete=False) as f:
+        while True:
+            block = source.read(1024 * 1024)
+            if not block:
+                break
+            f.write(block)
+        return f.name
+
+def run_import(job_id: str, path: str, policy: AccessPolicy, should_stop: Optional[Callable[[], bool]] = None):
+    """
+    Run a queued job in its own session.
+
+    should_stop is checked after each committed chunk; when it returns True
+    the job ends as failed, keeping the rows imported so far.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(models.AssetImportJob, job_id)
+        if job is None:
+            return
+        job.status = models.AssetImportStatus.running
+        job.started_at = datetime.now()
+        db.commit()
+        run = ImportRun(job, policy)
+        try:
+            chunk = []
+            stopped = False
+            for row in read_rows(path, job.format):
+                chunk.append(row)
+                if len(chunk) >= job.batch_size:
+                    run.process_chunk(db, chunk)
+                    chunk = []
+                    if should_stop is not None and should_stop():
+                        stopped = True
+                        break
+            if stopped:
+                job.status = models.AssetImportStatus.failed
+                job.error_message = (f"Stopped by a server shutdown after the first {job.rows_read} rows "
+                                     f"({job.rows_inserted} imported); upload the remaining rows again")
+            else:
+                if chunk:
+                    run.process_chunk(db, chunk)
+                job.status = models.AssetImportStatus.completed
+        except Exception as e:
+            db.rollback()
+            job.status = models.AssetImportStatus.failed
+            job.error_message = f"{type(e).__name__}: {e}"
+            print(f"Error importing assets (job {job_id}): {str(e)}")
+        job.finished_at = datetime.now()
+        db.commit()
+    finally:
+        db.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def cancel_import(job_id: str, path: str):
+    """Mark a queued job that never started as failed and remove its upload"""
+    db = SessionLocal()
+    try:
+        db.query(models.AssetImportJob).filter(
+            models.AssetImportJob.id == job_id,
+            models.AssetImportJob.status == models.AssetImportStatus.queued
+        ).update({
+            "status": models.AssetImportStatus.failed,
+            "error_message": "Cancelled by a server shutdown; upload the file again",
+            "finished_at": datetime.now(),
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def fail_interrupted(db: Session) -> int:
+    """Mark jobs left queued or running by a previous process as failed; their uploads are gone"""
+    count = db.query(models.AssetImportJob).filter(models.AssetImportJob.status.in_(
+        [models.AssetImportStatus.queued, models.AssetImportStatus.running]
+    )).update({
+        "status": models.AssetImportStatus.failed,
+        "error_message": "Interrupted by a server restart; upload the file again",
+        "finished_at": datetime.now(),
+    }, synchronize_session=False)
+    db.commit()
+    return count
+
+def job_report(job: models.AssetImportJob) -> Dict[str, Any]:
+    """AssetImportJobRead payload of job"""
+    errors = job.errors or []
+    return {
+        "id": job.id,
+        "status": job.status.value if isinstance(job.status, models.AssetImportStatus) else job.status,
+        "filename": job.filename,
+        "format": job.format,
+        "batch_size": job.batch_size,
+        "rows_read": job.rows_read or 0,
+        "rows_inserted": job.rows_inserted or 0,
+        "rows_failed": job.rows_failed or 0,
+        "errors": errors,
+        "errors_truncated": len(errors) >= ASSET_IMPORT_MAX_ERRORS,
+        "error_message": job.error_message,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+class ImportWorker:
+    """Background thread running queued imports one after another"""
+
+    def __init__(self, max_queue_size: int = ASSET_IMPORT_QUEUE_SIZE):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="asset-import", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def submit(self, job_id: str, path: str, policy: AccessPolicy) -> bool:
+        """Queue an import; returns False when the queue is full"""
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        try:
+            self._queue.put_nowait((job_id, path, policy))
+        except queue.Full:
+            return False
+        return True
+
+    def flush(self):
+        """Wait until every queued import has run"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def stop(self, timeout: float = 10.0):
+        """
+        Stop the running import after its current chunk and cancel the queued ones.
+
+        Waits up to timeout seconds; a job still running after that is left
+        'running' and failed by fail_interrupted on the next start.
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._stopping.set()
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                if self._stopping.is_set():
+                    cancel_import(item[0], item[1])
+                else:
+                    run_import(*item, should_stop=self._stopping.is_set)
+            except Exception as e:
+                print(f"Error in asset import worker: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+# Process-wide worker for /assets/import
+import_worker = ImportWorker()
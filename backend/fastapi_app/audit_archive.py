@@ -0,0 +1,422 @@
+"""
+Monthly partitioning, retention and archival for audit_trail.
+
+The hot audit_trail table keeps the last AUDIT_RETENTION_MONTHS months. Older
+months are exported to compressed JSON Lines files under AUDIT_ARCHIVE_DIR
+(zstd when the zstandard package is installed, gzip otherwise) and removed from
+the table. /audit/?include_archived=true reads them back; decoded files and
+per-filter match counts are kept in a bounded in-process cache (ArchiveCache)
+so paging through archived results doesn't decompress every month again.
+
+On MySQL, audit_trail can be range-partitioned by month (see moreschema.sql);
+ensure_monthly_partitions keeps partitions ahead of the clock, and archiving a
+month drops its partition instead of deleting row by row. On SQLite months are
+ranges over ix_audit_trail_timestamp_id and are removed with a range DELETE.
+
+Run retention from cron or a scheduler:
+
+    python -m fastapi_app.audit_archive --retention-months 6
+"""
+import argparse
+import glob
+import gzip
+import heapq
+import io
+import itertools
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from fastapi_app.models import AuditTrail
+from fastapi_app.audit_search import SEARCH_COLUMNS
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, fall back to gzip
+    zstandard = None
+
+AUDIT_RETENTION_MONTHS = int(os.getenv('AUDIT_RETENTION_MONTHS', '6'))
+AUDIT_ARCHIVE_DIR = os.getenv('AUDIT_ARCHIVE_DIR', 'audit_archive')
+AUDIT_ARCHIVE_COMPRESSION = os.getenv('AUDIT_ARCHIVE_COMPRESSION', 'zstd' if zstandard else 'gzip').lower()
+# Decoded archive rows kept in memory for /audit/?include_archived=true (0 disables the cache)
+AUDIT_ARCHIVE_CACHE_ROWS = int(os.getenv('AUDIT_ARCHIVE_CACHE_ROWS', '200000'))
+
+_EXTENSIONS = {"zstd": ".jsonl.zst", "gzip": ".jsonl.gz"}
+_ARCHIVE_NAME = re.compile(r"audit_trail_(\d{4})_(\d{2})(?:-\d+)?\.jsonl\.(zst|gz)$")
+
+# Month arithmetic
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + (value.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"p{month.year:04d}{month.month:02d}"
+
+# Archive files
+
+_AUDIT_FIELDS = [column.name for column in AuditTrail.__table__.columns]
+
+def _serialize(record: AuditTrail) -> Dict[str, Any]:
+    # Same shape as the /audit/ API (routers_audit_trail.serialize_audit_record) so
+    # archived rows can be returned as-is; built here so the cron CLI doesn't import
+    # the routers (auth and crud import each other)
+    values = {name: getattr(record, name) for name in _AUDIT_FIELDS}
+    values["timestamp"] = record.timestamp.isoformat() if record.timestamp else None
+    return values
+
+def _open_archive_writer(path: str, compression: str):
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed; set AUDIT_ARCHIVE_COMPRESSION=gzip")
+        raw = open(path, "wb")
+        return io.TextIOWrapper(zstandard.ZstdCompressor(level=10).stream_writer(raw), encoding="utf-8")
+    return gzip.open(path, "wt", encoding="utf-8")
+
+def _open_archive_reader(path: str):
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        raw = open(path, "rb")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True), encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+def list_archives(archive_dir: str = AUDIT_ARCHIVE_DIR) -> List[Tuple[date, str]]:
+    """(month, path) for every archive file, oldest first"""
+    archives = []
+    for path in glob.glob(os.path.join(archive_dir, "audit_trail_*.jsonl.*")):
+        match = _ARCHIVE_NAME.search(os.path.basename(path))
+        if match:
+            archives.append((date(int(match.group(1)), int(match.group(2)), 1), path))
+    return sorted(archives)
+
+def _new_archive_path(month: date, archive_dir: str) -> str:
+    extension = _EXTENSIONS.get(AUDIT_ARCHIVE_COMPRESSION, _EXTENSIONS["gzip"])
+    base = os.path.join(archive_dir, f"audit_trail_{month.year:04d}_{month.month:02d}")
+    path, part = f"{base}{extension}", 1
+    # Late rows for an already archived month go to an extra part file
+    while os.path.exists(path):
+        part += 1
+        path = f"{base}-{part}{extension}"
+    return path
+
+# Partition management (MySQL)
+
+def _mysql_partitions(db: Session) -> List[str]:
+    rows = db.execute(text(
+        "SELECT partition_name FROM information_schema.partitions "
+        "WHERE table_schema = DATABASE() AND table_name = 'audit_trail' AND partition_name IS NOT NULL"
+    )).fetchall()
+    return [row[0] for row in rows]
+
+def ensure_monthly_partitions(db: Session, months_ahead: int = 3) -> List[str]:
+    """
+    Split p_future so every month up to months_ahead has its own partition.
+
+    Only applies to MySQL with audit_trail already partitioned (moreschema.sql);
+    returns the partitions that were added.
+    """
+    if db.get_bind().dialect.name != "mysql":
+        return []
+    existing = set(_mysql_partitions(db))
+    if "p_future" not in existing:
+        return []
+
+    added = []
+    current = month_start(date.today())
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        upper = add_months(month, 1).isoformat()
+        db.execute(text(
+            f"ALTER TABLE audit_trail REORGANIZE PARTITION p_future INTO ("
+            f"PARTITION {name} VALUES LESS THAN (UNIX_TIMESTAMP('{upper}')), "
+            f"PARTITION p_future VALUES LESS THAN MAXVALUE)"
+        ))
+        added.append(name)
+    return added
+
+# Archival
+
+def archive_month(db: Session, month: date, archive_dir: str = AUDIT_ARCHIVE_DIR) -> int:
+    """Export one month of audit_trail to an archive file and remove it from the hot table"""
+    month = month_start(month)
+    lower, upper = datetime(month.year, month.month, 1), datetime.combine(add_months(month, 1), datetime.min.time())
+    in_month = (AuditTrail.timestamp >= lower) & (AuditTrail.timestamp < upper)
+
+    if db.query(AuditTrail.id).filter(in_month).first() is None:
+        return 0
+
+    os.makedirs(archive_dir, exist_ok=True)
+    path = _new_archive_path(month, archive_dir)
+    temp_path = f"{path}.tmp"
+    count = 0
+    # Write under a temporary name so readers never see a partial archive
+    with _open_archive_writer(temp_path, "zstd" if path.endswith(".zst") else "gzip") as f:
+        for record in db.query(AuditTrail).filter(in_month).order_by(AuditTrail.id).yield_per(1000):
+            f.write(json.dumps(_serialize(record), default=str) + "\n")
+            count += 1
+    os.replace(temp_path, path)
+
+    try:
+        name = partition_name(month)
+        if db.get_bind().dialect.name == "mysql" and name in _mysql_partitions(db):
+            db.execute(text(f"ALTER TABLE audit_trail DROP PARTITION {name}"))
+        else:
+            db.query(AuditTrail).filter(in_month).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        # The rows are still in the table; don't keep a duplicate copy on disk
+        os.remove(path)
+        raise
+    return count
+
+def apply_retention(db: Session, retention_months: int = AUDIT_RETENTION_MONTHS,
+                    archive_dir: str = AUDIT_ARCHIVE_DIR) -> Dict[str, int]:
+    """Archive every month older than the retention window; returns rows archived per month"""
+    cutoff = add_months(month_start(date.today()), -retention_months)
+    oldest = db.query(AuditTrail.timestamp).filter(
+        AuditTrail.timestamp < datetime.combine(cutoff, datetime.min.time())
+    ).order_by(AuditTrail.timestamp).first()
+
+    archived = {}
+    if oldest is not None and oldest[0] is not None:
+        month = month_start(oldest[0])
+        while month < cutoff:
+            count = archive_month(db, month, archive_dir)
+            if count:
+                archived[month.strftime("%Y-%m")] = count
+            month = add_months(month, 1)
+    ensure_monthly_partitions(db)
+    return archived
+
+# Reading archives back
+
+def _parse_filter_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed.replace(tzinfo=None)
+
+def _contains(value, term: str) -> bool:
+    return value is not None and term.lower() in str(value).lower()
+
+def record_matches(record: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    """Python equivalent of routers_audit_trail.apply_audit_filters for archived rows"""
+    if filters.get("user_id") and record.get("user_id") != filters["user_id"]:
+        return False
+    if filters.get("record_id") and record.get("record_id") != filters["record_id"]:
+        return False
+    for name in ("action", "table_name", "ip_address"):
+        if filters.get(name) and not _contains(record.get(name), filters[name]):
+            return False
+    timestamp = record.get("timestamp")
+    start, end = filters.get("start"), filters.get("end")
+    if start or end:
+        if not timestamp:
+            return False
+        moment = datetime.fromisoformat(timestamp)
+        if (start and moment < start) or (end and moment > end):
+            return False
+    search = filters.get("search")
+    if search and not any(_contains(record.get(name), search) for name in SEARCH_COLUMNS):
+        return False
+    return True
+
+def read_archive(path: str) -> Iterable[Dict[str, Any]]:
+    """Stream the rows of one archive file"""
+    with _open_archive_reader(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                record["archived"] = True
+                yield record
+
+def archives_in_range(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                      archive_dir: str = AUDIT_ARCHIVE_DIR) -> List[Tuple[date, str]]:
+    """(month, path) of the archive files whose month overlaps [start, end], oldest first"""
+    return [
+        (month, path) for month, path in list_archives(archive_dir)
+        if not (start and add_months(month, 1) <= month_start(start)) and not (end and month > end.date())
+    ]
+
+def iter_archived_records(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                          archive_dir: str = AUDIT_ARCHIVE_DIR) -> Iterable[Dict[str, Any]]:
+    """Stream archived rows, skipping files whose month lies outside [start, end]"""
+    for _, path in archives_in_range(start, end, archive_dir):
+        yield from read_archive(path)
+
+class ArchiveCache:
+    """
+    Decoded archive files (LRU, at most max_rows rows in total) and the number
+    of rows each filter set matched per file.
+
+    Entries are keyed by path and checked against the file's size and mtime;
+    a file larger than max_rows is streamed instead of cached.
+    """
+
+    def __init__(self, max_rows: int = AUDIT_ARCHIVE_CACHE_ROWS, max_counts: int = 4096):
+        self.max_rows = max_rows
+        self.max_counts = max_counts
+        self._files: "OrderedDict[str, Tuple[Tuple[int, int], List[Dict[str, Any]]]]" = OrderedDict()
+        self._counts: "OrderedDict[Tuple, int]" = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _signature(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def records(self, path: str) -> Iterable[Dict[str, Any]]:
+        signature = self._signature(path)
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None and entry[0] == signature:
+                self._files.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        reader = read_archive(path)
+        if self.max_rows <= 0:
+            return reader
+        records = []
+        for record in reader:
+            records.append(record)
+            if len(records) > self.max_rows:
+                # Too big to cache: hand over what was read and stream the rest
+                return itertools.chain(records, reader)
+        with self._lock:
+            previous = self._files.pop(path, None)
+            if previous is not None:
+                self._rows -= len(previous[1])
+            self._files[path] = (signature, records)
+            self._rows += len(records)
+            while self._rows > self.max_rows:
+                _, (_, evicted) = self._files.popitem(last=False)
+                self._rows -= len(evicted)
+        return records
+
+    def count(self, path: str, filters_key: Tuple) -> Optional[int]:
+        key = (path, self._signature(path), filters_key)
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+            return count
+
+    def set_count(self, path: str, filters_key: Tuple, count: int):
+        key = (path, self._signature(path), filters_key)
+        with self._lock:
+            self._counts[key] = count
+            while len(self._counts) > self.max_counts:
+                self._counts.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            self._counts.clear()
+            self._rows = 0
+
+    def stats(self):
+        with self._lock:
+            return {"files": len(self._files), "rows": self._rows, "counts": len(self._counts),
+                    "hits": self.hits, "misses": self.misses}
+
+archive_cache = ArchiveCache()
+
+def sort_key(sort_by: str):
+    """Ordering used for merging archived and live rows; NULLs sort lowest as in SQL"""
+    def key(record):
+        value = record.get(sort_by)
+        return ((0, "") if value is None else (1, value), record.get("id") or 0)
+    return key
+
+def query_archived(filters: Dict[str, Any], sort_by: str, sort_order: str, top_n: int,
+                   archive_dir: str = AUDIT_ARCHIVE_DIR, count_total: bool = True,
+                   cache: Optional[ArchiveCache] = None) -> Tuple[Optional[int], List[Dict[str, Any]]]:
+    """
+    Matching archived rows: (total matches, first top_n in the requested order).
+
+    Beyond the cached files only top_n rows are kept in memory. Sorted by
+    timestamp, months that can't reach the first top_n rows are not scanned
+    again once their match count is cached (nor at all when count_total is
+    False, in which case the total is None).
+    """
+    cache = archive_cache if cache is None else cache
+    filters = dict(filters)
+    filters["start"] = _parse_filter_date(filters.pop("start_date", None))
+    filters["end"] = _parse_filter_date(filters.pop("end_date", None))
+    filters_key = tuple(sorted((name, str(value)) for name, value in filters.items() if value))
+
+    archives = archives_in_range(filters["start"], filters["end"], archive_dir)
+    if sort_by == "timestamp" and sort_order == "desc":
+        archives.reverse()
+    select = heapq.nlargest if sort_order == "desc" else heapq.nsmallest
+    key = sort_key(sort_by)
+
+    total, top, settled, current_month = 0, [], False, None
+    for month, path in archives:
+        if month != current_month:
+            # A whole month sorts after every row of the months before it
+            settled = sort_by == "timestamp" and len(top) >= top_n
+            current_month = month
+        if settled:
+            if not count_total:
+                break
+            count = cache.count(path, filters_key)
+            if count is None:
+                count = sum(1 for record in cache.records(path) if record_matches(record, filters))
+                cache.set_count(path, filters_key, count)
+            total += count
+            continue
+        count = 0
+        def matching():
+            nonlocal count
+            for record in cache.records(path):
+                if record_matches(record, filters):
+                    count += 1
+                    yield record
+        top = select(top_n, itertools.chain(top, matching()), key=key)
+        cache.set_count(path, filters_key, count)
+        total += count
+    return (total if count_total else None), top
+
+def merge_records(live: List[Dict[str, Any]], archived: List[Dict[str, Any]], sort_by: str, sort_order: str):
+    return sorted(live + archived, key=sort_key(sort_by), reverse=sort_order == "desc")
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive audit_trail months older than the retention window")
+    parser.add_argument("--retention-months", type=int, default=AUDIT_RETENTION_MONTHS)
+    parser.add_argument("--archive-dir", default=AUDIT_ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    from fastapi_app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        archived = apply_retention(db, args.retention_months, args.archive_dir)
+    finally:
+        db.close()
+    if not archived:
+        print("Nothing to archive")
+    for month, count in archived.items():
+        print(f"Archived {count} audit records for {month}")
+
+if __name__ == "__main__":
+    main()
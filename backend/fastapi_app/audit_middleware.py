@@ -3,10 +3,10 @@ import json
 from typing import Dict, Any, Optional
 from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from fastapi_app.database import SessionLocal
-from fastapi_app.models import AuditTrail
-from fastapi_app.token_utils import get_current_user_from_token
+from starlette.concurrency import run_in_threadpool
+from fastapi_app.audit_writer import audit_writer
+from fastapi_app.token_utils import get_request_principal
+from fastapi_app.audit_routes import AuditRouteTable, AuditClassification
 import re
 
 class AuditMiddleware:
@@ -20,6 +20,8 @@ class AuditMiddleware:
             r'secret["\']?\s*:\s*["\'][^"\']*["\']',
             r'key["\']?\s*:\s*["\'][^"\']*["\']'
         ]
+        # Query parameters carrying credentials (e.g. the /notifications/stream ticket)
+        self.sensitive_query_regex = re.compile(r'(^|[?&])(access_token|ticket|token)=[^&#]*', re.IGNORECASE)
         
         # Define audit-worthy endpoints (exclude static files, health checks, etc.)
         self.audit_worthy_patterns = [
@@ -46,20 +48,43 @@ class AuditMiddleware:
             r'/redoc',
             r'/openapi.json'
         ]
+        
+        # Map common API paths to table names
+        self.table_mapping = {
+            "users": "users",
+            "assets": "assets",
+            "maintenance": "maintenance",
+            "transfers": "transfers",
+            "auctions": "auctions",
+            "disposals": "disposals",
+            "notifications": "notifications",
+            "reports": "reports",
+            "audit": "audit_trail",
+            "auth": "auth",
+            "departments": "departments",
+            "locations": "asset_locations",
+            "maintenance-complaints": "maintenance_complaints",
+            "transfer-requests": "transfer_requests"
+        }
+        
+        # Compile the pattern lists once instead of re.search-ing each string per request
+        self.exclude_regex = re.compile("|".join(self.exclude_patterns), re.IGNORECASE)
+        self.audit_worthy_regex = re.compile("|".join(self.audit_worthy_patterns), re.IGNORECASE)
+        self.view_regex = re.compile(r'/(\d+|\{[^/]+\})$')
+        self.record_id_regex = re.compile(r'/(\d+)(?:/|$)')
+        
+        # Route template trie, built from the app's routes on first use (routers are
+        # included after the middleware is registered)
+        self.route_table: Optional[AuditRouteTable] = None
 
     def should_audit(self, path: str) -> bool:
         """Determine if the request should be audited"""
         # Check if path matches any exclude patterns
-        for pattern in self.exclude_patterns:
-            if re.search(pattern, path, re.IGNORECASE):
-                return False
+        if self.exclude_regex.search(path):
+            return False
         
         # Check if path matches any audit-worthy patterns
-        for pattern in self.audit_worthy_patterns:
-            if re.search(pattern, path, re.IGNORECASE):
-                return True
-        
-        return False
+        return self.audit_worthy_regex.search(path) is not None
 
     def mask_sensitive_data(self, data: str) -> str:
         """Mask sensitive data in request/response bodies"""
@@ -68,6 +93,10 @@ class AuditMiddleware:
             masked_data = re.sub(pattern, r'\1: "***MASKED***"', masked_data, flags=re.IGNORECASE)
         return masked_data
 
+    def mask_query(self, data: str) -> str:
+        """Mask credential query parameters in a URL or query string"""
+        return self.sensitive_query_regex.sub(r'\1\2=***MASKED***', data)
+
     def extract_user_info(self, request: Request) -> Dict[str, Any]:
         """Extract user information from the request"""
         user_info = {
@@ -78,18 +107,16 @@ class AuditMiddleware:
         }
         
         try:
-            # Try to get user from authorization header
-            auth_header = request.headers.get("authorization")
-            if auth_header and auth_header.startswith("Bearer "):
-                token = auth_header.split(" ")[1]
-                user = get_current_user_from_token(token)
-                if user:
-                    user_info.update({
-                        "user_id": user.id,
-                        "username": user.username,
-                        "user_email": user.email,
-                        "full_name": f"{user.first_name} {user.last_name}"
-                    })
+            # Resolve the bearer token once; the result is stashed on request.state
+            # and reused by the get_current_user dependency
+            user = get_request_principal(request)
+            if user:
+                user_info.update({
+                    "user_id": user.id,
+                    "username": user.username,
+                    "user_email": user.email,
+                    "full_name": f"{user.first_name} {user.last_name}"
+                })
         except Exception:
             pass
         
@@ -98,7 +125,8 @@ class AuditMiddleware:
     def determine_action(self, method: str, path: str) -> str:
         """Determine the action based on HTTP method and path"""
         if method == "GET":
-            if "/{id}" in path or re.search(r'/\d+$', path):
+            # Matches concrete ids ("/assets/5") and route templates ("/assets/{asset_id}")
+            if self.view_regex.search(path):
                 return "VIEW"
             return "LIST"
         elif method == "POST":
@@ -121,30 +149,13 @@ class AuditMiddleware:
         segments = clean_path.strip("/").split("/")
         if segments:
             table_name = segments[0]
-            # Map common API paths to table names
-            table_mapping = {
-                "users": "users",
-                "assets": "assets",
-                "maintenance": "maintenance",
-                "transfers": "transfers",
-                "auctions": "auctions",
-                "disposals": "disposals",
-                "notifications": "notifications",
-                "reports": "reports",
-                "audit": "audit_trail",
-                "auth": "auth",
-                "departments": "departments",
-                "locations": "asset_locations",
-                "maintenance-complaints": "maintenance_complaints",
-                "transfer-requests": "transfer_requests"
-            }
-            return table_mapping.get(table_name, table_name)
+            return self.table_mapping.get(table_name, table_name)
         return None
 
     def extract_record_id(self, path: str) -> Optional[int]:
         """Extract record ID from path if present"""
         # Look for numeric IDs in the path
-        id_match = re.search(r'/(\d+)(?:/|$)', path)
+        id_match = self.record_id_regex.search(path)
         if id_match:
             try:
                 return int(id_match.group(1))
@@ -152,19 +163,45 @@ class AuditMiddleware:
                 pass
         return None
 
+    def classify_template(self, method: str, template: str):
+        """Audit decision, action and table for a route template (computed once per route)"""
+        if not self.should_audit(template):
+            return False, None, None
+        return True, self.determine_action(method, template), self.extract_table_name(template)
+
+    def classify_by_pattern(self, method: str, path: str) -> AuditClassification:
+        """Classify a concrete path that matched no route template"""
+        if not self.should_audit(path):
+            return AuditClassification(False, None, None, None)
+        return AuditClassification(
+            True,
+            self.determine_action(method, path),
+            self.extract_table_name(path),
+            self.extract_record_id(path)
+        )
+
+    def classify(self, method: str, path: str) -> AuditClassification:
+        """Audit decision, action, table name and record id in a single route-table lookup"""
+        if self.route_table is None:
+            self.route_table = AuditRouteTable.from_app(self.app, self.classify_template, self.classify_by_pattern)
+        return self.route_table.classify(method, path)
+
     async def __call__(self, request: Request, call_next):
         start_time = time.time()
         
+        # Classify the request against the precompiled route table
+        method = request.method
+        path = str(request.url.path)
+        classification = self.classify(method, path)
+        
         # Check if this request should be audited
-        if not self.should_audit(request.url.path):
+        if not classification.audit:
             response = await call_next(request)
             return response
         
         # Extract request information
-        method = request.method
-        path = str(request.url.path)
-        query_params = str(request.url.query)
-        full_url = str(request.url)
+        query_params = self.mask_query(str(request.url.query))
+        full_url = self.mask_query(str(request.url))
         
         # Get client IP
         client_ip = request.client.host if request.client else None
@@ -178,10 +215,10 @@ class AuditMiddleware:
         # Extract user information
         user_info = self.extract_user_info(request)
         
-        # Determine action and table
-        action = self.determine_action(method, path)
-        table_name = self.extract_table_name(path)
-        record_id = self.extract_record_id(path)
+        # Action, table and record id were resolved by the route table
+        action = classification.action
+        table_name = classification.table_name
+        record_id = classification.record_id
         
         # Prepare request body (for POST/PUT requests)
         request_body = None
@@ -189,7 +226,9 @@ class AuditMiddleware:
         new_values = None
         
         try:
-            if method in ["POST", "PUT", "PATCH"]:
+            # JSON bodies only: file uploads (/assets/import) aren't buffered here
+            content_type = request.headers.get("content-type", "")
+            if method in ["POST", "PUT", "PATCH"] and content_type.startswith("application/json"):
                 body_bytes = await request.body()
                 if body_bytes:
                     request_body = body_bytes.decode('utf-8')
@@ -241,7 +280,7 @@ class AuditMiddleware:
                 }
             }
             
-            # Save audit record asynchronously
+            # Queue audit record for the background writer
             await self.save_audit_record(audit_data)
             
             return response
@@ -275,20 +314,20 @@ class AuditMiddleware:
                 }
             }
             
-            # Save audit record asynchronously
+            # Queue audit record for the background writer
             await self.save_audit_record(audit_data)
             
             # Re-raise the exception
             raise
 
     async def save_audit_record(self, audit_data: Dict[str, Any]):
-        """Save audit record to database"""
+        """Hand the audit record to the batched background writer"""
         try:
-            db = SessionLocal()
-            audit_record = AuditTrail(**audit_data)
-            db.add(audit_record)
-            db.commit()
-            db.close()
+            if audit_writer.overflow_policy == 'block':
+                # submit() may wait for room in the queue; don't stall the event loop
+                await run_in_threadpool(audit_writer.submit, audit_data)
+            else:
+                audit_writer.submit(audit_data)
         except Exception as e:
             # Log error but don't fail the request
             print(f"Error saving audit record: {str(e)}")
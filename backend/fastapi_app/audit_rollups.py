@@ -0,0 +1,214 @@
+"""
+Hourly rollups of audit_trail for the statistics endpoints.
+
+AuditWriter folds every batch it inserts into audit_hourly_rollup (action x
+table x status class per hour) and audit_actor_hourly_rollup (user / IP per
+hour) in the same transaction, so the stats endpoints aggregate a few rows per
+hour instead of scanning the raw log. AuditTrail rows added through an ORM
+session anywhere else (transfer approvals, auctions, disposals, POST /audit/)
+are folded in by an after_flush hook, in the flush's transaction. Archived
+months keep their rollups.
+
+Date filters are applied at hour granularity. rebuild_rollups recomputes the
+tables from audit_trail; it runs at startup when the rollups are empty and can
+be run by hand after bulk imports:
+
+    python -m fastapi_app.audit_rollups
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Iterable, Optional
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from fastapi_app.models import AuditTrail, AuditHourlyRollup, AuditActorHourlyRollup
+
+def _get(record, name: str):
+    # Records are dicts coming from the writer or AuditTrail instances
+    if isinstance(record, dict):
+        return record.get(name)
+    return getattr(record, name, None)
+
+def bucket_hour(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def status_class(status: Optional[int]) -> str:
+    if status is None:
+        return "none"
+    return f"{int(status) // 100}xx"
+
+def aggregate(records: Iterable[Any]):
+    """Fold raw audit records into rollup rows (stats rows, actor rows)"""
+    stats = defaultdict(lambda: [0, 0])
+    actors = defaultdict(int)
+    for record in records:
+        timestamp = _get(record, "timestamp")
+        if timestamp is None:
+            continue
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        hour = bucket_hour(timestamp)
+        counts = stats[(hour, _get(record, "action") or "", _get(record, "table_name") or "",
+                        status_class(_get(record, "response_status")))]
+        counts[0] += 1
+        if _get(record, "error_message") is not None:
+            counts[1] += 1
+        actors[(hour, _get(record, "user_id") or 0, _get(record, "ip_address") or "")] += 1
+
+    stats_rows = [
+        {"bucket_hour": key[0], "action": key[1], "table_name": key[2], "status_class": key[3],
+         "record_count": count, "error_count": errors}
+        for key, (count, errors) in stats.items()
+    ]
+    actor_rows = [
+        {"bucket_hour": key[0], "user_id": key[1], "ip_address": key[2], "record_count": count}
+        for key, count in actors.items()
+    ]
+    return stats_rows, actor_rows
+
+def _upsert(db: Session, model, rows, counters):
+    """Add rows to model, summing counters into rows that already exist"""
+    if not rows:
+        return
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[column.name for column in table.primary_key.columns],
+            set_={name: table.c[name] + stmt.excluded[name] for name in counters}
+        )
+        db.execute(stmt, rows)
+    elif dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_duplicate_key_update({name: table.c[name] + stmt.inserted[name] for name in counters})
+        db.execute(stmt, rows)
+    else:
+        key_columns = [column.name for column in table.primary_key.columns]
+        for row in rows:
+            existing = db.get(model, tuple(row[name] for name in key_columns))
+            if existing is None:
+                db.add(model(**row))
+            else:
+                for name in counters:
+                    setattr(existing, name, getattr(existing, name) + row[name])
+        db.flush()
+
+def record_rollups(db: Session, records: Iterable[Any]):
+    """Fold newly inserted audit records into the rollups; the caller commits"""
+    stats_rows, actor_rows = aggregate(records)
+    _upsert(db, AuditHourlyRollup, stats_rows, ("record_count", "error_count"))
+    _upsert(db, AuditActorHourlyRollup, actor_rows, ("record_count",))
+
+@event.listens_for(Session, "after_flush")
+def _rollup_flushed(session, flush_context):
+    # AuditWriter inserts through Core and calls record_rollups itself; this covers ORM writers
+    records = [instance for instance in session.new if isinstance(instance, AuditTrail)]
+    if records:
+        record_rollups(session, records)
+
+def rebuild_rollups(db: Session, since: Optional[datetime] = None, chunk_size: int = 5000) -> int:
+    """
+    Recompute rollups from audit_trail for every hour from since (default: the
+    oldest raw row, so rollups of archived months are kept). Returns rows read.
+    """
+    if since is None:
+        since = db.query(func.min(AuditTrail.timestamp)).scalar()
+        if since is None:
+            return 0
+    since = bucket_hour(since)
+    db.query(AuditHourlyRollup).filter(AuditHourlyRollup.bucket_hour >= since).delete(synchronize_session=False)
+    db.query(AuditActorHourlyRollup).filter(AuditActorHourlyRollup.bucket_hour >= since).delete(synchronize_session=False)
+
+    columns = [AuditTrail.timestamp, AuditTrail.action, AuditTrail.table_name, AuditTrail.response_status,
+               AuditTrail.error_message, AuditTrail.user_id, AuditTrail.ip_address]
+    rows = db.query(*columns).filter(AuditTrail.timestamp >= since).execution_options(yield_per=chunk_size)
+    stats_rows, actor_rows = aggregate(row._asdict() for row in rows)
+    if stats_rows:
+        db.bulk_insert_mappings(AuditHourlyRollup, stats_rows)
+        db.bulk_insert_mappings(AuditActorHourlyRollup, actor_rows)
+    db.commit()
+    return sum(row["record_count"] for row in stats_rows)
+
+def ensure_rollups(db: Session) -> int:
+    """Backfill the rollups on first start against an existing audit log"""
+    if db.query(AuditHourlyRollup.bucket_hour).first() is not None:
+        return 0
+    if db.query(AuditTrail.id).first() is None:
+        return 0
+    return rebuild_rollups(db)
+
+# Queries used by the stats endpoints
+
+def _in_range(query, column, start: Optional[datetime], end: Optional[datetime]):
+    if start is not None:
+        query = query.filter(column >= bucket_hour(start))
+    if end is not None:
+        query = query.filter(column <= end)
+    return query
+
+def count_records(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """(records, records with an error) in the range"""
+    total, errors = _in_range(
+        db.query(func.sum(AuditHourlyRollup.record_count), func.sum(AuditHourlyRollup.error_count)),
+        AuditHourlyRollup.bucket_hour, start, end
+    ).one()
+    return int(total or 0), int(errors or 0)
+
+def count_unique_tables(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+    return _in_range(
+        db.query(func.count(func.distinct(AuditHourlyRollup.table_name))).filter(AuditHourlyRollup.table_name != ''),
+        AuditHourlyRollup.bucket_hour, start, end
+    ).scalar() or 0
+
+def count_unique_actors(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """(distinct users, distinct IP addresses) in the range"""
+    users = _in_range(
+        db.query(func.count(func.distinct(AuditActorHourlyRollup.user_id))).filter(AuditActorHourlyRollup.user_id != 0),
+        AuditActorHourlyRollup.bucket_hour, start, end
+    ).scalar() or 0
+    ips = _in_range(
+        db.query(func.count(func.distinct(AuditActorHourlyRollup.ip_address))).filter(AuditActorHourlyRollup.ip_address != ''),
+        AuditActorHourlyRollup.bucket_hour, start, end
+    ).scalar() or 0
+    return users, ips
+
+def action_breakdown(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    rows = _in_range(
+        db.query(AuditHourlyRollup.action, func.sum(AuditHourlyRollup.record_count).label('count')),
+        AuditHourlyRollup.bucket_hour, start, end
+    ).group_by(AuditHourlyRollup.action).all()
+    return [{"action": row.action, "count": int(row.count)} for row in rows]
+
+def table_breakdown(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    rows = _in_range(
+        db.query(AuditHourlyRollup.table_name, func.sum(AuditHourlyRollup.record_count).label('count'))
+        .filter(AuditHourlyRollup.table_name != ''),
+        AuditHourlyRollup.bucket_hour, start, end
+    ).group_by(AuditHourlyRollup.table_name).all()
+    return [{"table": row.table_name, "count": int(row.count)} for row in rows]
+
+def daily_activity(db: Session, start: datetime, end: Optional[datetime] = None):
+    day = func.date(AuditHourlyRollup.bucket_hour)
+    rows = _in_range(
+        db.query(day.label('date'), func.sum(AuditHourlyRollup.record_count).label('count')),
+        AuditHourlyRollup.bucket_hour, start, end
+    ).group_by(day).all()
+    return [{"date": str(row.date), "count": int(row.count)} for row in rows]
+
+def hourly_activity(db: Session, start: datetime):
+    hour = func.extract('hour', AuditHourlyRollup.bucket_hour)
+    rows = _in_range(
+        db.query(hour.label('hour'), func.sum(AuditHourlyRollup.record_count).label('count')),
+        AuditHourlyRollup.bucket_hour, start, None
+    ).group_by(hour).all()
+    return [{"hour": int(row.hour), "count": int(row.count)} for row in rows]
+
+if __name__ == "__main__":
+    from fastapi_app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt audit rollups from {rebuild_rollups(db)} audit records")
+    finally:
+        db.close()
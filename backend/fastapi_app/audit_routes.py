@@ -0,0 +1,117 @@
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+class AuditClassification(NamedTuple):
+    """What AuditMiddleware needs to know about a request, resolved in one lookup"""
+    audit: bool
+    action: Optional[str]
+    table_name: Optional[str]
+    record_id: Optional[int]
+
+class _RouteEntry(NamedTuple):
+    audit: bool
+    action: str
+    table_name: Optional[str]
+    # Positions of {param} segments, in path order, used for record id extraction
+    param_positions: Tuple[int, ...]
+
+class _TrieNode:
+    __slots__ = ("static", "param", "methods")
+
+    def __init__(self):
+        self.static: Dict[str, "_TrieNode"] = {}
+        self.param: Optional["_TrieNode"] = None
+        self.methods: Dict[str, _RouteEntry] = {}
+
+def _split(path: str) -> List[str]:
+    # Keep the trailing empty segment so "/assets/" and "/assets" stay distinct,
+    # exactly like the router (which redirects one to the other)
+    return path.split("/")[1:]
+
+def iter_app_routes(routes: Iterable, prefix: str = "") -> Iterable[Tuple[str, Iterable[str]]]:
+    """Yield (path template, methods) for every HTTP route, including included routers"""
+    for route in routes:
+        path = getattr(route, "path", None)
+        methods = getattr(route, "methods", None)
+        if path is not None and methods:
+            yield prefix + path, methods
+        elif hasattr(route, "original_router"):
+            # Newer FastAPI keeps included routers as nested objects
+            context = getattr(route, "include_context", None)
+            nested_prefix = prefix + (getattr(context, "prefix", "") or "")
+            yield from iter_app_routes(route.original_router.routes, nested_prefix)
+
+class AuditRouteTable:
+    """
+    Segment trie over the application's route templates.
+
+    Each leaf holds, per HTTP method, the precomputed audit decision, action and
+    table name for that template, plus where the path parameters sit so the
+    record id can be read straight out of the split path. Paths that match no
+    template fall back to the supplied pattern-based classifier.
+    """
+
+    def __init__(self, fallback: Callable[[str, str], AuditClassification]):
+        self.root = _TrieNode()
+        self.fallback = fallback
+        self.route_count = 0
+
+    @classmethod
+    def from_app(cls, app, classify_template: Callable[[str, str], Tuple[bool, str, Optional[str]]],
+                 fallback: Callable[[str, str], AuditClassification]) -> "AuditRouteTable":
+        table = cls(fallback)
+        for path, methods in iter_app_routes(app.routes):
+            for method in methods:
+                audit, action, table_name = classify_template(method, path)
+                table.add(method, path, audit, action, table_name)
+        return table
+
+    def add(self, method: str, template: str, audit: bool, action: str, table_name: Optional[str]):
+        node = self.root
+        param_positions = []
+        for position, segment in enumerate(_split(template)):
+            if segment.startswith("{") and segment.endswith("}"):
+                if ":path}" in segment:
+                    # Catch-all converters can't be represented segment-wise; use the fallback
+                    return
+                param_positions.append(position)
+                if node.param is None:
+                    node.param = _TrieNode()
+                node = node.param
+            else:
+                node = node.static.setdefault(segment, _TrieNode())
+        node.methods[method.upper()] = _RouteEntry(audit, action, table_name, tuple(param_positions))
+        self.route_count += 1
+
+    def _match(self, segments: List[str]) -> Optional[_TrieNode]:
+        # Static segments win over parameters, as in the router; backtrack only on a dead end
+        stack = [(self.root, 0)]
+        while stack:
+            node, index = stack.pop()
+            if index == len(segments):
+                if node.methods:
+                    return node
+                continue
+            segment = segments[index]
+            if node.param is not None and segment:
+                stack.append((node.param, index + 1))
+            child = node.static.get(segment)
+            if child is not None:
+                stack.append((child, index + 1))
+        return None
+
+    def classify(self, method: str, path: str) -> AuditClassification:
+        segments = _split(path)
+        node = self._match(segments)
+        entry = node.methods.get(method.upper()) if node is not None else None
+        if entry is None:
+            return self.fallback(method, path)
+        if not entry.audit:
+            return AuditClassification(False, None, None, None)
+
+        record_id = None
+        for position in entry.param_positions:
+            value = segments[position]
+            if value.isdigit():
+                record_id = int(value)
+                break
+        return AuditClassification(True, entry.action, entry.table_name, record_id)
@@ -0,0 +1,186 @@
+"""
+Search index behind the /audit/ search parameter.
+
+Matching depends on the backend ensure_search_index picked:
+
+- fts5_trigram (SQLite) and like: substring matching, the same hits as the
+  original ilike '%term%' on every column.
+- fts5 (SQLite without the trigram tokenizer): word-prefix matching.
+- fulltext (MySQL): word-prefix matching. "admin" finds "administrator" but
+  not "sysadmin", and a term inside a word matches nothing. Terms the InnoDB
+  parser never indexes (stopwords, tokens under MIN_TOKEN_LENGTH) fall back
+  to ilike, so they still find their substring hits.
+
+The word-prefix backends require every token of the term to match.
+"""
+import re
+import threading
+from typing import Optional
+from sqlalchemy import or_, text, literal_column, table, column
+from sqlalchemy.exc import SQLAlchemyError
+from fastapi_app.models import AuditTrail
+
+# Columns covered by the /audit/ search parameter
+SEARCH_COLUMNS = [
+    "username",
+    "user_email",
+    "full_name",
+    "action",
+    "table_name",
+    "ip_address",
+    "user_agent",
+    "error_message",
+]
+
+FTS_TABLE = "audit_trail_fts"
+FULLTEXT_INDEX = "ft_audit_trail_search"
+
+# Trigram FTS and MySQL's default InnoDB FULLTEXT parser can't match shorter tokens
+MIN_TOKEN_LENGTH = 3
+
+# InnoDB's default FULLTEXT stopwords: never indexed, so MATCH can't find them
+INNODB_STOPWORDS = frozenset({
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en", "for", "from", "how", "i",
+    "in", "is", "it", "la", "of", "on", "or", "the", "this", "to", "und", "was", "what", "when",
+    "where", "who", "will", "with", "www",
+})
+
+_fts = table(FTS_TABLE, column("rowid"), column("rank"))
+_columns_sql = ", ".join(SEARCH_COLUMNS)
+_backend_lock = threading.Lock()
+_backends = {}
+
+def _create_sqlite_index(connection) -> str:
+    existing = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE}
+    ).scalar()
+    if existing is None:
+        try:
+            # trigram gives substring matching, the closest thing to the old ilike '%term%'
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({_columns_sql}, "
+                f"content='audit_trail', content_rowid='id', tokenize='trigram')"
+            ))
+            tokenizer = "fts5_trigram"
+        except SQLAlchemyError:
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({_columns_sql}, "
+                f"content='audit_trail', content_rowid='id')"
+            ))
+            tokenizer = "fts5"
+        # Index rows written before the FTS table existed
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    else:
+        tokenizer = "fts5_trigram" if "trigram" in existing else "fts5"
+
+    # Keep the index in step with audit_trail at write time
+    new_values = ", ".join(f"new.{name}" for name in SEARCH_COLUMNS)
+    old_values = ", ".join(f"old.{name}" for name in SEARCH_COLUMNS)
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS audit_trail_fts_insert AFTER INSERT ON audit_trail BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {_columns_sql}) VALUES (new.id, {new_values}); END"
+    ))
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS audit_trail_fts_delete AFTER DELETE ON audit_trail BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns_sql}) VALUES ('delete', old.id, {old_values}); END"
+    ))
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS audit_trail_fts_update AFTER UPDATE ON audit_trail BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns_sql}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {_columns_sql}) VALUES (new.id, {new_values}); END"
+    ))
+    return tokenizer
+
+def _create_mysql_index(connection) -> str:
+    exists = connection.execute(
+        text(
+            "SELECT COUNT(*) FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = 'audit_trail' AND index_name = :name"
+        ),
+        {"name": FULLTEXT_INDEX}
+    ).scalar()
+    if not exists:
+        connection.execute(text(f"ALTER TABLE audit_trail ADD FULLTEXT INDEX {FULLTEXT_INDEX} ({_columns_sql})"))
+    return "fulltext"
+
+def ensure_search_index(engine) -> str:
+    """
+    Create the audit search index for this database if needed and return the backend name.
+
+    SQLite gets an external-content FTS5 table kept up to date by triggers, MySQL a
+    FULLTEXT index (maintained by InnoDB). Anything else, or a failure to create the
+    index, falls back to "like" (the original ilike scan).
+    """
+    with _backend_lock:
+        if engine in _backends:
+            return _backends[engine]
+        dialect = engine.dialect.name
+        backend = "like"
+        try:
+            with engine.begin() as connection:
+                if dialect == "sqlite":
+                    backend = _create_sqlite_index(connection)
+                elif dialect == "mysql":
+                    backend = _create_mysql_index(connection)
+        except SQLAlchemyError as e:
+            print(f"Audit search index unavailable, using ilike search: {str(e)}")
+            backend = "like"
+        _backends[engine] = backend
+        return backend
+
+def _tokens(term: str):
+    return [token for token in re.split(r"[^\w@.:/-]+", term) if token]
+
+def _like_filter(term: str):
+    return or_(*[getattr(AuditTrail, name).ilike(f"%{term}%") for name in SEARCH_COLUMNS])
+
+def _match_query(backend: str, term: str) -> Optional[str]:
+    """Translate free text into the index's query syntax, or None if the index can't serve it"""
+    tokens = _tokens(term)
+    if not tokens:
+        return None
+    if backend in ("fts5_trigram", "fulltext") and any(len(token) < MIN_TOKEN_LENGTH for token in tokens):
+        return None
+    if backend == "fts5_trigram":
+        # One phrase: a trigram phrase is a literal substring of one column, just like ilike
+        # (which reads % and _ as wildcards, so leave those to it)
+        if "%" in term or "_" in term:
+            return None
+        return '"' + term.replace('"', '""') + '"'
+    if backend == "fts5":
+        return " AND ".join('"' + token.replace('"', '""') + '"*' for token in tokens)
+    if backend == "fulltext":
+        # The parser splits on punctuation too; any stopword piece would make the token unmatchable
+        words = [word for token in tokens for word in re.split(r"\W+", token.lower()) if word]
+        if any(word in INNODB_STOPWORDS for word in words):
+            return None
+        # Boolean mode: every token required, prefix matching; quote tokens with punctuation
+        return " ".join(f'+"{token}"' if re.search(r"\W", token) else f"+{token}*" for token in tokens)
+    return None
+
+def apply_search(query, term: str):
+    """
+    Filter a query over AuditTrail to rows matching term through the search index.
+
+    Returns (query, relevance) where relevance is an ORDER BY clause for best-first
+    ordering, or None when the search fell back to ilike.
+    """
+    backend = ensure_search_index(query.session.get_bind())
+    match_query = _match_query(backend, term)
+    if match_query is None:
+        return query.filter(_like_filter(term)), None
+
+    if backend.startswith("fts5"):
+        query = query.join(_fts, _fts.c.rowid == AuditTrail.id).filter(
+            literal_column(FTS_TABLE).op("MATCH")(match_query)
+        )
+        # FTS5 rank is bm25: lower is better
+        return query, _fts.c.rank.asc()
+
+    match = text(f"MATCH ({_columns_sql}) AGAINST (:audit_search IN BOOLEAN MODE)").bindparams(
+        audit_search=match_query
+    )
+    return query.filter(match), text(
+        f"MATCH ({_columns_sql}) AGAINST (:audit_search_rank IN BOOLEAN MODE) DESC"
+    ).bindparams(audit_search_rank=match_query)
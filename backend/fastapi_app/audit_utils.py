@@ -1,8 +1,7 @@
 import json
 from typing import Dict, Any, Optional
 from sqlalchemy.orm import Session
-from fastapi_app.database import SessionLocal
-from fastapi_app.models import AuditTrail
+from fastapi_app.audit_writer import audit_writer
 from fastapi_app.token_utils import get_current_user_from_token
 
 def create_audit_log(
@@ -47,30 +46,26 @@ def create_audit_log(
         additional_data: Any additional data to store
     """
     try:
-        db = SessionLocal()
-        audit_record = AuditTrail(
-            user_id=user_id,
-            username=username,
-            user_email=user_email,
-            full_name=full_name,
-            action=action,
-            table_name=table_name,
-            record_id=record_id,
-            old_values=old_values,
-            new_values=new_values,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            request_method=request_method,
-            request_url=request_url,
-            response_status=response_status,
-            execution_time=execution_time,
-            error_message=error_message,
-            additional_data=additional_data
-        )
-        db.add(audit_record)
-        db.commit()
-        db.close()
-        return True
+        # Routed through the same batched writer as AuditMiddleware
+        return audit_writer.submit({
+            "user_id": user_id,
+            "username": username,
+            "user_email": user_email,
+            "full_name": full_name,
+            "action": action,
+            "table_name": table_name,
+            "record_id": record_id,
+            "old_values": old_values,
+            "new_values": new_values,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "request_method": request_method,
+            "request_url": request_url,
+            "response_status": response_status,
+            "execution_time": execution_time,
+            "error_message": error_message,
+            "additional_data": additional_data
+        })
     except Exception as e:
         print(f"Error creating audit log: {str(e)}")
         return False
@@ -308,41 +303,19 @@ def get_audit_summary(db: Session, days: int = 7) -> Dict[str, Any]:
         Dictionary with audit summary statistics
     """
     from datetime import datetime, timedelta
-    from sqlalchemy import func
+    from fastapi_app import audit_rollups
     
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
     
-    # Get basic stats
-    total_records = db.query(AuditTrail).filter(
-        AuditTrail.timestamp >= start_date
-    ).count()
-    
-    unique_users = db.query(func.count(func.distinct(AuditTrail.user_id))).filter(
-        AuditTrail.timestamp >= start_date
-    ).scalar()
-    
-    unique_ips = db.query(func.count(func.distinct(AuditTrail.ip_address))).filter(
-        AuditTrail.timestamp >= start_date
-    ).scalar()
-    
-    error_count = db.query(AuditTrail).filter(
-        AuditTrail.timestamp >= start_date,
-        AuditTrail.error_message.isnot(None)
-    ).count()
-    
-    # Get action breakdown
-    action_stats = db.query(
-        AuditTrail.action,
-        func.count(AuditTrail.id).label('count')
-    ).filter(
-        AuditTrail.timestamp >= start_date
-    ).group_by(AuditTrail.action).all()
+    # Get basic stats from the hourly rollups
+    total_records, error_count = audit_rollups.count_records(db, start_date)
+    unique_users, unique_ips = audit_rollups.count_unique_actors(db, start_date)
     
     return {
         "total_records": total_records,
         "unique_users": unique_users,
         "unique_ips": unique_ips,
         "error_count": error_count,
-        "action_breakdown": [{"action": stat.action, "count": stat.count} for stat in action_stats]
+        "action_breakdown": audit_rollups.action_breakdown(db, start_date)
     } 
\ No newline at end of file
@@ -0,0 +1,268 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, OperationalError
+from fastapi_app.database import SessionLocal
+from fastapi_app.models import AuditTrail
+from fastapi_app.audit_rollups import record_rollups
+
+# Writer tunables
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '200'))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '1.0'))
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+# What to do when the queue is full: block | drop | spill
+AUDIT_OVERFLOW_POLICY = os.getenv('AUDIT_OVERFLOW_POLICY', 'spill').lower()
+AUDIT_BLOCK_TIMEOUT = float(os.getenv('AUDIT_BLOCK_TIMEOUT', '5.0'))
+AUDIT_SPILL_PATH = os.getenv('AUDIT_SPILL_PATH', 'audit_spill.jsonl')
+# Records the database rejected on their own; kept for inspection, never replayed
+AUDIT_DEAD_LETTER_PATH = os.getenv('AUDIT_DEAD_LETTER_PATH', 'audit_dead_letter.jsonl')
+
+OVERFLOW_POLICIES = ('block', 'drop', 'spill')
+
+# Every column except the primary key, so each batch is a homogeneous executemany
+AUDIT_COLUMNS = [column.name for column in AuditTrail.__table__.columns if column.name != 'id']
+
+_FLUSH = object()
+_STOP = object()
+
+class AuditWriter:
+    """
+    Background writer for audit_trail rows.
+
+    Records are queued in memory and a worker thread bulk-inserts them in
+    batches, flushing when a batch is full or the flush interval elapses.
+    The queue is bounded; when it is full the overflow policy decides whether
+    callers block, records are dropped, or records are spilled to a JSON Lines
+    file that the worker replays once it is idle.
+
+    A batch the database rejects is retried one record at a time: records
+    that fail on their own go to the dead-letter file, so a single bad value
+    never holds back the rest of its batch. Only records that failed because
+    the database was unreachable are spilled for replay.
+
+    With the 'block' policy submit() may wait for room in the queue; async
+    callers hand it to the threadpool (see AuditMiddleware.save_audit_record).
+    """
+
+    def __init__(
+        self,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+        max_queue_size: int = AUDIT_QUEUE_SIZE,
+        overflow_policy: str = AUDIT_OVERFLOW_POLICY,
+        block_timeout: float = AUDIT_BLOCK_TIMEOUT,
+        spill_path: str = AUDIT_SPILL_PATH,
+        dead_letter_path: str = AUDIT_DEAD_LETTER_PATH,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy: {overflow_policy}")
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.spill_path = spill_path
+        self.dead_letter_path = dead_letter_path
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self.stats = {"submitted": 0, "written": 0, "dropped": 0, "spilled": 0, "failed_batches": 0,
+                      "dead_lettered": 0}
+
+    # Public API
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Queue an audit record; returns False if it had to be dropped"""
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        # Stamp at submission time so rows keep the request time, not the flush time
+        record = dict(record)
+        if record.get("timestamp") is None:
+            record["timestamp"] = datetime.now()
+        self.stats["submitted"] += 1
+
+        try:
+            if self.overflow_policy == 'block':
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            if self.overflow_policy == 'spill':
+                self._spill([record])
+                return True
+            self.stats["dropped"] += 1
+            return False
+
+    def flush(self):
+        """Write everything queued so far and wait until it is committed"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def stop(self, timeout: float = 10.0):
+        """Drain the queue, replay any spilled records and stop the worker"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    # Worker
+
+    def _run(self):
+        batch: List[Dict[str, Any]] = []
+        deadline = 0.0
+        while True:
+            if batch:
+                timeout = max(0.0, deadline - time.monotonic())
+            else:
+                timeout = self.flush_interval
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._write_batch(batch)
+                self._task_done(len(batch) + 1)
+                self._replay_spill()
+                return
+
+            if item is _FLUSH:
+                self._write_batch(batch)
+                self._task_done(len(batch) + 1)
+                batch = []
+                continue
+
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write_batch(batch)
+                self._task_done(len(batch))
+                batch = []
+            elif not batch and item is None:
+                # Idle: catch up on anything that overflowed to disk
+                self._replay_spill()
+
+    def _task_done(self, count: int):
+        for _ in range(count):
+            self._queue.task_done()
+
+    def _insert(self, records: List[Dict[str, Any]]):
+        rows = [{column: record.get(column) for column in AUDIT_COLUMNS} for record in records]
+        db = SessionLocal()
+        try:
+            db.execute(insert(AuditTrail), rows)
+            # Same transaction, so the stats rollups never disagree with the log
+            record_rollups(db, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.stats["written"] += len(rows)
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        try:
+            self._insert(batch)
+            return
+        except Exception as e:
+            self.stats["failed_batches"] += 1
+            print(f"Error saving audit batch of {len(batch)} records: {str(e)}")
+            if _unavailable(e):
+                # Keep the rows on disk rather than losing them
+                self._spill(batch)
+                return
+
+        # Find the records the database rejects and set them aside
+        for index, record in enumerate(batch):
+            try:
+                self._insert([record])
+            except Exception as e:
+                if _unavailable(e):
+                    self._spill(batch[index:])
+                    return
+                print(f"Error saving audit record, moved to {self.dead_letter_path}: {str(e)}")
+                self._dead_letter(record)
+
+    # Spill file handling
+
+    def _spill(self, records: List[Dict[str, Any]]):
+        try:
+            with self._spill_lock:
+                with open(self.spill_path, "a", encoding="utf-8") as f:
+                    for record in records:
+                        f.write(json.dumps(record, default=_json_default) + "\n")
+            self.stats["spilled"] += len(records)
+        except Exception as e:
+            self.stats["dropped"] += len(records)
+            print(f"Error spilling audit records to {self.spill_path}: {str(e)}")
+
+    def _dead_letter(self, record: Dict[str, Any]):
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=_json_default) + "\n")
+            self.stats["dead_lettered"] += 1
+        except Exception as e:
+            self.stats["dropped"] += 1
+            print(f"Error writing audit record to {self.dead_letter_path}: {str(e)}")
+
+    def _replay_spill(self):
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return
+            replay_path = f"{self.spill_path}.replay"
+            os.replace(self.spill_path, replay_path)
+
+        batch: List[Dict[str, Any]] = []
+        with open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record.get("timestamp"), str):
+                    record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    self._write_batch(batch)
+                    batch = []
+        self._write_batch(batch)
+        os.remove(replay_path)
+
+def _unavailable(error: Exception) -> bool:
+    """True when the database couldn't be reached, rather than rejecting the rows"""
+    return isinstance(error, DBAPIError) and (error.connection_invalidated or isinstance(error, OperationalError))
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+# Process-wide writer shared by AuditMiddleware and audit_utils
+audit_writer = AuditWriter()
@@ -1,14 +1,12 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
+from jose import jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from . import crud, models, deps
-
-SECRET_KEY = "your_super_secret_key_change_this"
-ALGORITHM = "HS256"
+from . import models, deps
+from .token_utils import SECRET_KEY, ALGORITHM, decode_token, get_request_principal
 ACCESS_TOKEN_EXPIRE_MINUTES = 120
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -29,27 +27,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def decode_access_token(token: str):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
-        return None
+    return decode_token(token)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(deps.get_db)):
+def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(deps.get_db)):
     print("Token received in get_current_user:", token)  # Debug line
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    payload = decode_access_token(token)
-    print("Decoded payload:", payload)  # Debug line
-    if payload is None:
-        raise credentials_exception
-    username: str = payload.get("sub")
-    if username is None:
-        raise credentials_exception
-    user = crud.get_user_by_username(db, username=username)
+    # Reuses the identity AuditMiddleware already resolved for this request, if any;
+    # otherwise decodes once and resolves through the principal cache
+    user = get_request_principal(request, token=token, db=db)
     if user is None:
         raise credentials_exception
     return user 
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""
+Commit-time notifications of which tables a session wrote to.
+
+Caches built from table contents (dashboard snapshot, report aggregates)
+subscribe to the tables they read and are told after every commit that
+touched one of them, whichever router or crud function did the write:
+
+    on_commit({"assets", "maintenance"}, lambda tables: snapshot.invalidate())
+
+Both unit-of-work flushes and ORM-executed INSERT / UPDATE / DELETE
+statements are tracked. Rolled back writes are discarded.
+"""
+import threading
+from typing import Callable, Iterable, List, Set, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_SESSION_KEY = "changed_tables"
+_subscribers: List[Tuple[frozenset, Callable[[Set[str]], None]]] = []
+_subscribers_lock = threading.Lock()
+
+def on_commit(tables: Iterable[str], callback: Callable[[Set[str]], None]):
+    """Call callback(changed tables) after each commit that wrote to any of tables"""
+    with _subscribers_lock:
+        _subscribers.append((frozenset(tables), callback))
+
+def notify(tables: Iterable[str]):
+    """Report writes made outside a tracked session (e.g. raw connections or other processes)"""
+    changed = set(tables)
+    with _subscribers_lock:
+        subscribers = list(_subscribers)
+    for watched, callback in subscribers:
+        touched = watched & changed
+        if touched:
+            try:
+                callback(touched)
+            except Exception as e:
+                print(f"Error in commit subscriber: {str(e)}")
+
+def _changed(session: Session) -> Set[str]:
+    return session.info.setdefault(_SESSION_KEY, set())
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    changed = _changed(session)
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(instance, "__tablename__", None)
+        if table is not None:
+            changed.add(table)
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None and getattr(table, "name", None):
+            _changed(orm_execute_state.session).add(table.name)
+
+@event.listens_for(Session, "after_commit")
+def _publish(session):
+    changed = session.info.pop(_SESSION_KEY, None)
+    if changed:
+        notify(changed)
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop(_SESSION_KEY, None)
@@ -0,0 +1,150 @@
+"""
+Typed columnar (Parquet / Arrow IPC) export of the asset register.
+
+Rows are read from a server-side cursor in batches of COLUMNAR_EXPORT_BATCH_SIZE
+and each batch is converted to an Arrow record batch with a schema derived
+from the model columns (DECIMAL stays decimal128, dates stay date32, enums
+are plain strings). Parquet gets one row group per batch; the file is
+streamed to the client as the writer produces it.
+
+Requires the optional pyarrow package.
+"""
+import os
+from typing import Iterator, List, Optional
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import String, select, type_coerce
+from sqlalchemy import types as sqltypes
+from fastapi_app import models
+from fastapi_app.database import SessionLocal
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # optional dependency, the export endpoints answer 501 without it
+    pyarrow = None
+
+COLUMNAR_EXPORT_BATCH_SIZE = int(os.getenv('COLUMNAR_EXPORT_BATCH_SIZE', '65536'))
+
+EXPORT_MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+# Every column of the asset register, in table order
+ASSET_COLUMNS = {column.name: column for column in models.Asset.__table__.columns}
+
+def _arrow_type(column):
+    column_type = column.type
+    if isinstance(column_type, sqltypes.Enum):
+        return pyarrow.string()
+    if isinstance(column_type, sqltypes.Integer):
+        return pyarrow.int64()
+    if isinstance(column_type, sqltypes.Float):
+        return pyarrow.float64()
+    if isinstance(column_type, sqltypes.Numeric):
+        return pyarrow.decimal128(column_type.precision or 38, column_type.scale or 0)
+    if isinstance(column_type, sqltypes.DateTime):
+        return pyarrow.timestamp("us")
+    if isinstance(column_type, sqltypes.Date):
+        return pyarrow.date32()
+    return pyarrow.string()
+
+def _select_column(column):
+    # Read enums as their stored strings instead of building Python enum members
+    if isinstance(column.type, sqltypes.Enum):
+        return type_coerce(column, String).label(column.name)
+    return column
+
+def project_columns(columns: Optional[str]) -> List[str]:
+    """Validated column names from a comma separated ?columns= value (all columns when empty)"""
+    if not columns:
+        return list(ASSET_COLUMNS)
+    names = [name.strip() for name in columns.split(",") if name.strip()]
+    unknown = [name for name in names if name not in ASSET_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown asset columns: {', '.join(unknown)}")
+    return list(dict.fromkeys(names))
+
+def asset_schema(names: List[str]):
+    return pyarrow.schema([pyarrow.field(name, _arrow_type(ASSET_COLUMNS[name])) for name in names])
+
+def asset_select(names: List[str], status: Optional[str] = None, category: Optional[str] = None):
+    stmt = select(*[_select_column(ASSET_COLUMNS[name]) for name in names])
+    if status:
+        stmt = stmt.where(models.Asset.status == status)
+    if category:
+        stmt = stmt.where(models.Asset.category == category)
+    return stmt.order_by(models.Asset.id)
+
+class _ChunkSink:
+    """Write-only file object collecting what the Arrow writer produced since the last drain"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def _record_batches(stmt, schema, batch_size: int):
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        for chunk in result.partitions():
+            columns = zip(*chunk)
+            yield pyarrow.RecordBatch.from_arrays(
+                [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            )
+    finally:
+        db.close()
+
+def _write_stream(stmt, schema, export_format: str, batch_size: int) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    if export_format == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="snappy")
+    else:
+        writer = pyarrow.ipc.new_file(sink, schema)
+    try:
+        for batch in _record_batches(stmt, schema, batch_size):
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def export_assets(export_format: str, names: List[str], status: Optional[str] = None,
+                  category: Optional[str] = None,
+                  batch_size: int = COLUMNAR_EXPORT_BATCH_SIZE) -> StreamingResponse:
+    """Stream the (filtered, projected) asset register as a Parquet or Arrow IPC file"""
+    if pyarrow is None:
+        raise HTTPException(status_code=501, detail="Columnar exports require the pyarrow package")
+    schema = asset_schema(names)
+    stmt = asset_select(names, status, category)
+    return StreamingResponse(
+        _write_stream(stmt, schema, export_format, batch_size),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="assets.{export_format}"'}
+    )
@@ -1,5 +1,7 @@
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import models, schemas, user_access
+from .access_policy import policy_of
 from typing import List, Optional
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
@@ -31,79 +33,23 @@ def get_users_by_role(db: Session, role: str, skip: int = 0, limit: int = 100) -
 
 def get_users_by_role_and_locations(db: Session, role: str, locations: List[str], skip: int = 0, limit: int = 100) -> List[models.User]:
     """Get users by role who have access to any of the specified locations"""
-    users = db.query(models.User).filter(models.User.role == role).all()
-    
-    # Filter users based on location access
-    filtered_users = []
-    for user in users:
-        if not user.asset_access:
-            continue
-            
-        # Parse asset_access if it's a JSON string
-        if isinstance(user.asset_access, str):
-            import json
-            try:
-                user_locations = json.loads(user.asset_access)
-            except:
-                user_locations = [user.asset_access]
-        else:
-            user_locations = user.asset_access
-        
-        # Check if user has access to any of the specified locations
-        if any(location in user_locations for location in locations):
-            filtered_users.append(user)
-    
-    return filtered_users[skip:skip + limit]
+    return db.query(models.User).filter(
+        models.User.role == role,
+        user_access.at_any_location(locations)
+    ).order_by(models.User.id).offset(skip).limit(limit).all()
 
 def get_users_by_role_and_specific_location(db: Session, role: str, location: str, skip: int = 0, limit: int = 100) -> List[models.User]:
     """Get users by role who are specifically assigned to the given location"""
     print(f"🔍 get_users_by_role_and_specific_location called with role={role}, location={location}")
     
-    users = db.query(models.User).filter(models.User.role == role).all()
-    print(f"📊 Found {len(users)} users with role '{role}'")
-    
-    # Filter users based on specific location assignment
-    filtered_users = []
-    for user in users:
-        print(f"👤 Checking user: {user.first_name} {user.last_name}")
-        print(f"   - User location: {user.location}")
-        print(f"   - User asset_access: {user.asset_access}")
-        print(f"   - User permissions: {user.permissions}")
-        
-        # First check if user's location field matches
-        if user.location == location:
-            print(f"   ✅ User location matches target location")
-            filtered_users.append(user)
-            continue
-            
-        # Then check asset_access
-        if user.asset_access:
-            # Parse asset_access if it's a JSON string
-            if isinstance(user.asset_access, str):
-                import json
-                try:
-                    user_locations = json.loads(user.asset_access)
-                except:
-                    user_locations = [user.asset_access]
-            else:
-                user_locations = user.asset_access
-            
-            print(f"   - Parsed user_locations: {user_locations}")
-            
-            # Check if user has access to the specific location
-            if location in user_locations:
-                print(f"   ✅ User has asset_access to target location")
-                filtered_users.append(user)
-            else:
-                print(f"   ❌ User does not have asset_access to target location")
-        else:
-            print(f"   ❌ User has no asset_access")
+    # The user's own location field or asset_access to the location
+    filtered_users = db.query(models.User).filter(
+        models.User.role == role,
+        or_(models.User.location == location, user_access.at_any_location([location]))
+    ).order_by(models.User.id).offset(skip).limit(limit).all()
     
     print(f"🎯 Final filtered users count: {len(filtered_users)}")
-    for user in filtered_users:
-        print(f"   - {user.first_name} {user.last_name} (ID: {user.id})")
-    
-    return filtered_users[skip:skip + limit]
+    return filtered_users
 
 def get_users_by_permission(db: Session, permission: str, current_user: models.User, location: str = None, skip: int = 0, limit: int = 100) -> List[models.User]:
     """Get users with specific permission, filtered by location for non-admin users"""
@@ -121,134 +67,25 @@ def get_users_by_permission(db: Session, permission: str, current_user: models.U
     target_role = permission_to_role.get(permission, 'manager')
     print(f"🎯 Looking for users with role: {target_role}")
     
-    # Get all users with the target role or admin role
-    users = db.query(models.User).filter(
-        models.User.role.in_([target_role, 'admin', 'manager'])
-    ).all()
-    print(f"📊 Found {len(users)} users with role {target_role} or admin/manager")
-    
-    # Debug: Show all manager users and their permissions
-    print("🔍 All manager users:")
-    for user in users:
-        print(f"   - {user.first_name} {user.last_name} (ID: {user.id})")
-        print(f"     Role: {user.role}")
-        print(f"     Permissions: {user.permissions}")
-        print(f"     Asset Access: {user.asset_access}")
-    
-    # Filter users based on permission and location access
-    filtered_users = []
-    for user in users:
-        print(f"🔍 Checking user: {user.first_name} {user.last_name}")
-        print(f"   - User permissions: {user.permissions}")
-        print(f"   - User asset_access: {user.asset_access}")
-        
-        # Check if user has the required permission
-        has_permission = False
-        
-        # Admin users have all permissions
-        if user.role == 'admin':
-            has_permission = True
-            print(f"   ✅ Admin user has all permissions")
-        # Check specific role match
-        elif user.role == target_role:
-            has_permission = True
-            print(f"   ✅ User has correct role: {user.role}")
-        # Check permissions field
-        elif user.permissions:
-            # Parse permissions if it's a JSON string
-            if isinstance(user.permissions, str):
-                import json
-                try:
-                    user_permissions = json.loads(user.permissions)
-                except:
-                    user_permissions = [user.permissions]
-            else:
-                user_permissions = user.permissions
-            
-            print(f"   - Parsed permissions: {user_permissions}")
-            has_permission = permission in user_permissions or 'all' in user_permissions
-            print(f"   - Has {permission} permission: {has_permission}")
-        
-        if not has_permission:
-            print(f"   ❌ User does not have {permission} permission or correct role")
-            continue
-        
-        # Check location access if location is specified
-        if location:
-            print(f"   🏢 Checking location access for: {location}")
-            
-            # Check if target user has access to the specified location
-            user_has_location_access = False
-            if user.asset_access:
-                if isinstance(user.asset_access, str):
-                    import json
-                    try:
-                        user_locations = json.loads(user.asset_access)
-                    except:
-                        user_locations = [user.asset_access]
-                else:
-                    user_locations = user.asset_access
-                
-                print(f"   - Target user locations: {user_locations}")
-                
-                # Check if the specified location is in user's assigned locations
-                user_has_location_access = location in user_locations
-                print(f"   - Has access to {location}: {user_has_location_access}")
-            
-            if not user_has_location_access:
-                print(f"   ❌ User does not have access to location: {location}")
-                continue
-        
-        # For non-admin users, also check if they can see this user based on their own location access
-        elif current_user.role != 'admin':
-            print(f"   🔒 Non-admin user, checking location access")
-            
-            # Get current user's locations
-            current_user_locations = []
-            if current_user.asset_access:
-                if isinstance(current_user.asset_access, str):
-                    import json
-                    try:
-                        current_user_locations = json.loads(current_user.asset_access)
-                    except:
-                        current_user_locations = [current_user.asset_access]
-                else:
-                    current_user_locations = current_user.asset_access
-            
-            print(f"   - Current user locations: {current_user_locations}")
-            
-            # Check if target user has access to any of current user's locations
-            user_has_location_access = False
-            if user.asset_access:
-                if isinstance(user.asset_access, str):
-                    import json
-                    try:
-                        user_locations = json.loads(user.asset_access)
-                    except:
-                        user_locations = [user.asset_access]
-                else:
-                    user_locations = user.asset_access
-                
-                print(f"   - Target user locations: {user_locations}")
-                
-                # Check for location overlap
-                common_locations = set(current_user_locations) & set(user_locations)
-                user_has_location_access = len(common_locations) > 0
-                print(f"   - Common locations: {common_locations}")
-                print(f"   - Has location access: {user_has_location_access}")
-            
-            if not user_has_location_access:
-                print(f"   ❌ User does not have location access")
-                continue
-        
-        print(f"   ✅ User passed all checks")
-        filtered_users.append(user)
-    
+    # Admins have all permissions; the target role has this one; others need it granted
+    query = db.query(models.User).filter(
+        models.User.role.in_([target_role, 'admin', 'manager']),
+        or_(
+            models.User.role.in_(['admin', target_role]),
+            user_access.granted([permission, 'all'])
+        )
+    )
+    
+    if location:
+        # Target users must have access to the specified location
+        query = query.filter(user_access.at_any_location([location]))
+    elif current_user.role != 'admin':
+        # Non-admins only see users sharing at least one of their locations
+        query = query.filter(user_access.sharing_location_with(current_user.id))
+    
+    filtered_users = query.order_by(models.User.id).offset(skip).limit(limit).all()
     print(f"🎯 Final filtered users count: {len(filtered_users)}")
-    for user in filtered_users:
-        print(f"   - {user.first_name} {user.last_name} (ID: {user.id})")
-    
-    return filtered_users[skip:skip + limit]
+    return filtered_users
 
 def create_user(db: Session, user: schemas.UserCreate) -> models.User:
     user_dict = user.dict()
@@ -318,18 +155,24 @@ def delete_asset(db: Session, asset_id: int):
 
 def get_maintenance(db: Session, maintenance_id: int):
     # Get maintenance record with asset information
-    result = db.query(models.Maintenance, models.Asset.name.label('asset_name'), models.Asset.category.label('asset_category')).join(
+    result = db.query(
+        models.Maintenance,
+        models.Asset.name.label('asset_name'),
+        models.Asset.category.label('asset_category'),
+        models.Asset.location.label('asset_location')
+    ).join(
         models.Asset, models.Maintenance.asset_id == models.Asset.id, isouter=True
     ).filter(models.Maintenance.id == maintenance_id).first()
     
     if result:
-        maintenance, asset_name, asset_category = result
+        maintenance, asset_name, asset_category, asset_location = result
         # Create a dictionary with asset information
         maintenance_dict = {
             'id': maintenance.id,
             'asset_id': maintenance.asset_id,
             'asset_name': asset_name,
             'asset_category': asset_category,
+            'asset_location': asset_location,  # For location checks, not part of MaintenanceRead
             'maintenance_type': 'preventive',  # Default value
             'maintenance_date': maintenance.maintenance_date,
             'start_date': None,  # Not in database
@@ -429,109 +272,65 @@ def delete_maintenance(db: Session, maintenance_id: int):
 
 def get_maintenances_by_user_locations(db: Session, current_user: models.User, skip: int = 0, limit: int = 100):
     """Get maintenance records for assets in user's assigned locations"""
-    # Get user's assigned locations
-    if not current_user.asset_access:
-        return []
-    
-    # Parse asset_access if it's a JSON string
-    if isinstance(current_user.asset_access, str):
-        import json
-        try:
-            asset_access = json.loads(current_user.asset_access)
-        except:
-            asset_access = [current_user.asset_access]
-    else:
-        asset_access = current_user.asset_access
-    
-    # Get assets in user's locations
-    assets_in_locations = db.query(models.Asset).filter(
-        models.Asset.location.in_(asset_access)
-    ).all()
+    # Maintenance records for assets in user's locations, with asset information
+    results = db.query(models.Maintenance, models.Asset.name.label('asset_name'), models.Asset.category.label('asset_category')).join(
+        models.Asset, models.Maintenance.asset_id == models.Asset.id
+    ).filter(
+        policy_of(current_user).visible_assets()
+    ).offset(skip).limit(limit).all()
     
-    asset_ids = [asset.id for asset in assets_in_locations]
+    # Convert to list of dictionaries with proper structure
+    maintenance_list = []
+    for maintenance, asset_name, asset_category in results:
+        maintenance_dict = {
+            'id': maintenance.id,
+            'asset_id': maintenance.asset_id,
+            'asset_name': asset_name,  # Now populated from asset join
+            'asset_category': asset_category,
+            'maintenance_type': 'preventive',  # Default value
+            'maintenance_date': maintenance.maintenance_date,
+            'start_date': None,  # Not in database
+            'completion_date': None,  # Not in database
+            'description': maintenance.description,
+            'cost': float(maintenance.cost) if maintenance.cost else 0.0,
+            'priority': maintenance.priority,
+            'performed_by': maintenance.performed_by,
+            'vendor': None,  # Not in database
+            'notes': None,  # Not in database
+            'next_maintenance_date': None,  # Not in database
+            'status': maintenance.status,
+            'created_at': maintenance.created_at,
+            'updated_at': None  # Not in database
+        }
+        maintenance_list.append(maintenance_dict)
     
-    # Get maintenance records for these assets with asset information
-    if asset_ids:
-        results = db.query(models.Maintenance, models.Asset.name.label('asset_name'), models.Asset.category.label('asset_category')).join(
-            models.Asset, models.Maintenance.asset_id == models.Asset.id, isouter=True
-        ).filter(
-            models.Maintenance.asset_id.in_(asset_ids)
-        ).offset(skip).limit(limit).all()
-        
-        # Convert to list of dictionaries with proper structure
-        maintenance_list = []
-        for maintenance, asset_name, asset_category in results:
-            maintenance_dict = {
-                'id': maintenance.id,
-                'asset_id': maintenance.asset_id,
-                'asset_name': asset_name,  # Now populated from asset join
-                'asset_category': asset_category,
-                'maintenance_type': 'preventive',  # Default value
-                'maintenance_date': maintenance.maintenance_date,
-                'start_date': None,  # Not in database
-                'completion_date': None,  # Not in database
-                'description': maintenance.description,
-                'cost': float(maintenance.cost) if maintenance.cost else 0.0,
-                'priority': maintenance.priority,
-                'performed_by': maintenance.performed_by,
-                'vendor': None,  # Not in database
-                'notes': None,  # Not in database
-                'next_maintenance_date': None,  # Not in database
-                'status': maintenance.status,
-                'created_at': maintenance.created_at,
-                'updated_at': None  # Not in database
-            }
-            maintenance_list.append(maintenance_dict)
-        
-        return maintenance_list
-    else:
-        return []
+    return maintenance_list
 
-def can_access_maintenance_location(db: Session, current_user: models.User, maintenance_record: models.Maintenance):
+def can_access_maintenance_location(db: Session, current_user: models.User, maintenance_record):
     """Check if user can access a specific maintenance record based on asset location"""
+    policy = policy_of(current_user)
     # Admin users can access all maintenance records
-    if current_user.role == 'admin':
+    if policy.is_admin:
         return True
     
+    # Records from get_maintenance already carry their asset's location
+    if isinstance(maintenance_record, dict):
+        return bool(maintenance_record.get('asset_id')) and policy.can_access_location(maintenance_record.get('asset_location'))
+    
     # If no asset_id, deny access for non-admin users
     if not maintenance_record.asset_id:
         return False
-    
-    # Get the asset
-    asset = db.query(models.Asset).filter(models.Asset.id == maintenance_record.asset_id).first()
-    if not asset:
-        return False
-    
-    # Check if user has access to this asset's location
-    return can_access_asset_location(db, current_user, maintenance_record.asset_id)
+    return policy.can_access_asset(db, maintenance_record.asset_id)
 
 def can_access_asset_location(db: Session, current_user: models.User, asset_id: int):
     """Check if user can access an asset based on location"""
+    policy = policy_of(current_user)
     # Admin users can access all assets
-    if current_user.role == 'admin':
+    if policy.is_admin:
         return True
     
-    # Get the asset
-    asset = db.query(models.Asset).filter(models.Asset.id == asset_id).first()
-    if not asset:
-        return False
-    
-    # Check if user has asset_access configured
-    if not current_user.asset_access:
-        return False
-    
-    # Parse asset_access if it's a JSON string
-    if isinstance(current_user.asset_access, str):
-        import json
-        try:
-            asset_access = json.loads(current_user.asset_access)
-        except:
-            asset_access = [current_user.asset_access]
-    else:
-        asset_access = current_user.asset_access
-    
-    # Check if asset location is in user's assigned locations
-    return asset.location in asset_access
+    # The asset exists and is in one of user's assigned locations
+    return policy.can_access_asset(db, asset_id)
 
 def create_transfer_request(db: Session, transfer_request: schemas.TransferRequestCreate, user_id: int):
     data = transfer_request.dict()
@@ -542,14 +341,27 @@ def create_transfer_request(db: Session, transfer_request: schemas.TransferReque
     db.refresh(db_transfer_request)
     return db_transfer_request
 
-def get_transfer_request(db: Session, transfer_request_id: int):
-    """Get a single transfer request with enhanced asset and user information"""
-    transfer = db.query(models.TransferRequest).filter(models.TransferRequest.id == transfer_request_id).first()
-    
-    if not transfer:
-        return None
-    
-    # Enhance transfer request with asset and user information
+def transfer_request_query(db: Session):
+    """Transfer requests with their asset and requester details, in a single query"""
+    return db.query(
+        models.TransferRequest,
+        models.Asset.id.label('asset_found_id'),
+        models.Asset.name.label('asset_name'),
+        models.Asset.category.label('asset_category'),
+        models.Asset.location.label('asset_location'),
+        models.User.id.label('requester_id'),
+        models.User.first_name.label('requester_first_name'),
+        models.User.last_name.label('requester_last_name'),
+        models.User.email.label('requester_email')
+    ).outerjoin(
+        models.Asset, models.TransferRequest.asset_id == models.Asset.id
+    ).outerjoin(
+        models.User, models.TransferRequest.requested_by == models.User.id
+    )
+
+def enhance_transfer_request(row):
+    """Build the enhanced transfer request dict from a transfer_request_query row"""
+    transfer = row.TransferRequest
     enhanced_transfer = {
         'id': transfer.id,
         'asset_id': transfer.asset_id,
@@ -579,81 +391,45 @@ def get_transfer_request(db: Session, transfer_request_id: int):
         'created_at': transfer.created_at
     }
     
-    # Get asset information if asset_id exists
-    if transfer.asset_id:
-        asset = db.query(models.Asset).filter(models.Asset.id == transfer.asset_id).first()
-        if asset:
-            enhanced_transfer['asset_name'] = asset.name
-            enhanced_transfer['asset_category'] = asset.category
-            enhanced_transfer['asset_location'] = asset.location
+    # Asset information if the asset exists
+    if row.asset_found_id is not None:
+        enhanced_transfer['asset_name'] = row.asset_name
+        enhanced_transfer['asset_category'] = row.asset_category
+        enhanced_transfer['asset_location'] = row.asset_location
     
-    # Get requester information
-    if transfer.requested_by:
-        requester = db.query(models.User).filter(models.User.id == transfer.requested_by).first()
-        if requester:
-            enhanced_transfer['requested_by_name'] = f"{requester.first_name} {requester.last_name}"
-            enhanced_transfer['requested_by_email'] = requester.email
+    # Requester information
+    if row.requester_id is not None:
+        enhanced_transfer['requested_by_name'] = f"{row.requester_first_name} {row.requester_last_name}"
+        enhanced_transfer['requested_by_email'] = row.requester_email
     
     return enhanced_transfer
 
-def get_transfer_requests(db: Session, user_id: int = None, is_admin: bool = False):
-    """Get transfer requests with enhanced asset and user information"""
-    query = db.query(models.TransferRequest)
+def get_transfer_request(db: Session, transfer_request_id: int):
+    """Get a single transfer request with enhanced asset and user information"""
+    row = transfer_request_query(db).filter(models.TransferRequest.id == transfer_request_id).first()
+    if not row:
+        return None
+    return enhance_transfer_request(row)
+
+def get_transfer_requests(db: Session, user_id: int = None, is_admin: bool = False, skip: int = 0, limit: int = 100,
+                          status: Optional[str] = None, location: Optional[str] = None):
+    """Get a page of transfer requests with enhanced asset and user information, newest first"""
+    query = transfer_request_query(db)
     if not is_admin and user_id is not None:
         query = query.filter(models.TransferRequest.requested_by == user_id)
-    
-    transfer_requests = query.order_by(models.TransferRequest.created_at.desc()).all()
-    
-    # Enhance transfer requests with asset and user information
-    enhanced_requests = []
-    for transfer in transfer_requests:
-        enhanced_transfer = {
-            'id': transfer.id,
-            'asset_id': transfer.asset_id,
-            'asset_name': None,
-            'asset_category': None,
-            'asset_location': None,
-            'transfer_type': 'internal',  # Default type
-            'status': transfer.status or 'pending',
-            'from_location': transfer.from_location,
-            'to_location': transfer.to_location,
-            'from_department': None,
-            'to_department': None,
-            'from_custodian': None,
-            'to_custodian': None,
-            'request_date': transfer.created_at.date() if transfer.created_at else None,
-            'approved_date': None,
-            'transfer_date': None,
-            'completion_date': None,
-            'reason': transfer.reason,
-            'notes': transfer.notes,
-            'estimated_cost': None,
-            'actual_cost': None,
-            'approval_by': None,
-            'requested_by': transfer.requested_by,
-            'requested_by_name': None,
-            'requested_by_email': None,
-            'created_at': transfer.created_at
-        }
-        
-        # Get asset information if asset_id exists
-        if transfer.asset_id:
-            asset = db.query(models.Asset).filter(models.Asset.id == transfer.asset_id).first()
-            if asset:
-                enhanced_transfer['asset_name'] = asset.name
-                enhanced_transfer['asset_category'] = asset.category
-                enhanced_transfer['asset_location'] = asset.location
-        
-        # Get requester information
-        if transfer.requested_by:
-            requester = db.query(models.User).filter(models.User.id == transfer.requested_by).first()
-            if requester:
-                enhanced_transfer['requested_by_name'] = f"{requester.first_name} {requester.last_name}"
-                enhanced_transfer['requested_by_email'] = requester.email
-        
-        enhanced_requests.append(enhanced_transfer)
-    
-    return enhanced_requests
+    if status:
+        query = query.filter(models.TransferRequest.status == status)
+    if location:
+        # Transfers out of or into the location
+        query = query.filter(or_(
+            models.TransferRequest.from_location == location,
+            models.TransferRequest.to_location == location
+        ))
+    
+    rows = query.order_by(
+        models.TransferRequest.created_at.desc(), models.TransferRequest.id.desc()
+    ).offset(skip).limit(limit).all()
+    return [enhance_transfer_request(row) for row in rows]
 
 def update_transfer_request(db: Session, transfer_request_id: int, transfer_request_update: schemas.TransferRequestUpdate):
     db_transfer_request = db.query(models.TransferRequest).filter(models.TransferRequest.id == transfer_request_id).first()
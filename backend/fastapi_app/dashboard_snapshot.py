@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import select, func, case, and_, true
+from sqlalchemy.orm import Session
+from fastapi_app import models, depreciation_snapshots
+from fastapi_app.change_tracking import on_commit
+
+# Upper bound on snapshot age (seconds); writes to the tables below invalidate it sooner
+DASHBOARD_SNAPSHOT_TTL = float(os.getenv('DASHBOARD_SNAPSHOT_TTL', '60'))
+
+# Tables whose writes change the dashboard KPIs
+SNAPSHOT_TABLES = ("assets", "maintenance", "transfers", "auctions", "disposals", "notifications",
+                   "notification_unread_counts", "users")
+
+EMPTY_STATS = {
+    "totalAssets": 0,
+    "totalValue": 0,
+    "activeAssets": 0,
+    "maintenanceDue": 0,
+    "criticalIssues": 0,
+    "pendingTransfers": 0,
+    "activeAuctions": 0,
+    "pendingDisposals": 0,
+    "totalUsers": 0,
+    "unreadNotifications": 0,
+    "monthlyDepreciation": 0,
+    "yearlyDepreciation": 0
+}
+
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+def _aggregates(db: Session, subqueries) -> Dict[str, Any]:
+    """
+    Values of single-row subqueries, cross joined into one query. If that fails
+    each subquery runs on its own, and the columns of one that fails are left out.
+    """
+    joined = subqueries[0]
+    for subquery in subqueries[1:]:
+        joined = joined.join(subquery, true())
+    try:
+        return dict(db.execute(select(*subqueries).select_from(joined)).one()._mapping)
+    except Exception as e:
+        db.rollback()
+        print(f"Error in dashboard stats query, computing KPIs one by one: {e}")
+    values = {}
+    for subquery in subqueries:
+        try:
+            values.update(db.execute(select(subquery)).one()._mapping)
+        except Exception as e:
+            db.rollback()
+            print(f"Error computing dashboard KPIs {', '.join(subquery.c.keys())}: {e}")
+    return values
+
+def compute_stats(db: Session) -> Dict[str, Any]:
+    """
+    Dashboard KPIs: one single-row aggregate per table, cross joined, plus
+    depreciation from the monthly snapshots. A KPI that can't be computed is 0.
+    """
+    due_by = datetime.now().date() + timedelta(days=7)
+    assets = select(
+        func.count(models.Asset.id).label("total_assets"),
+        func.sum(models.Asset.purchase_cost).label("total_value"),
+        _count_where(models.Asset.status == 'active').label("active_assets")
+    ).subquery()
+    maintenance = select(
+        _count_where(and_(
+            models.Maintenance.status == 'scheduled',
+            models.Maintenance.maintenance_date <= due_by
+        )).label("maintenance_due"),
+        _count_where(models.Maintenance.priority == 'critical').label("critical_issues")
+    ).subquery()
+    transfers = select(_count_where(models.Transfer.status == 'pending').label("pending_transfers")).subquery()
+    auctions = select(_count_where(models.Auction.status == 'scheduled').label("active_auctions")).subquery()
+    disposals = select(_count_where(models.Disposal.status == 'pending').label("pending_disposals")).subquery()
+    users = select(func.count(models.User.id).label("total_users")).subquery()
+    # Sum of the per-user counters (notification_counts.py) rather than a scan of notifications
+    notifications = select(
+        func.coalesce(func.sum(models.NotificationUnreadCount.unread), 0).label("unread_notifications")
+    ).subquery()
+    row = _aggregates(db, [assets, maintenance, transfers, auctions, disposals, users, notifications])
+
+    def value(name):
+        return row.get(name) or 0
+
+    try:
+        # Carried forward from last month's snapshot; only assets added since are computed
+        charges = depreciation_snapshots.current_charges(db)
+    except Exception as e:
+        db.rollback()
+        print(f"Error computing dashboard depreciation: {e}")
+        charges = {"monthlyDepreciation": 0, "yearlyDepreciation": 0}
+    return {
+        "totalAssets": int(value("total_assets")),
+        "totalValue": float(value("total_value")),
+        "activeAssets": int(value("active_assets")),
+        "maintenanceDue": int(value("maintenance_due")),
+        "criticalIssues": int(value("critical_issues")),
+        "pendingTransfers": int(value("pending_transfers")),
+        "activeAuctions": int(value("active_auctions")),
+        "pendingDisposals": int(value("pending_disposals")),
+        "totalUsers": int(value("total_users")),
+        "unreadNotifications": int(value("unread_notifications")),
+        "monthlyDepreciation": charges["monthlyDepreciation"],
+        "yearlyDepreciation": charges["yearlyDepreciation"]
+    }
+
+class DashboardSnapshot:
+    """
+    Cached dashboard KPIs.
+
+    The snapshot is recomputed when it is older than the TTL or after a commit
+    that wrote to one of SNAPSHOT_TABLES. Concurrent requests for a stale
+    snapshot share one recomputation.
+    """
+
+    def __init__(self, ttl: float = DASHBOARD_SNAPSHOT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+        self._stats: Optional[Dict[str, Any]] = None
+        self._computed_at: Optional[datetime] = None
+        self._computed_monotonic = 0.0
+        # Bumped on every invalidation so a computation racing a write isn't cached as fresh
+        self._generation = 0
+        self.recomputations = 0
+
+    def invalidate(self, tables=None):
+        with self._lock:
+            self._generation += 1
+            self._stats = None
+
+    def _cached(self) -> Optional[Tuple[Dict[str, Any], datetime, float]]:
+        with self._lock:
+            if self._stats is None:
+                return None
+            age = time.monotonic() - self._computed_monotonic
+            if age >= self.ttl:
+                return None
+            return self._stats, self._computed_at, age * 1000
+
+    def get(self, db: Session) -> Tuple[Dict[str, Any], datetime, float]:
+        """Return (stats, computed_at, age in ms)"""
+        cached = self._cached()
+        if cached is not None:
+            return cached
+        with self._compute_lock:
+            # Another request may have recomputed while we waited
+            cached = self._cached()
+            if cached is not None:
+                return cached
+            with self._lock:
+                generation = self._generation
+            stats = compute_stats(db)
+            computed_at, computed_monotonic = datetime.now(), time.monotonic()
+            with self._lock:
+                self.recomputations += 1
+                if generation == self._generation:
+                    self._stats = stats
+                    self._computed_at = computed_at
+                    self._computed_monotonic = computed_monotonic
+            return stats, computed_at, 0.0
+
+# Process-wide snapshot used by the dashboard router
+dashboard_snapshot = DashboardSnapshot()
+on_commit(SNAPSHOT_TABLES, dashboard_snapshot.invalidate)
@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 
 # Use SQLite for development, MySQL for production
@@ -16,4 +16,46 @@ else:
     DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}/{DB_NAME}"
     engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine) 
\ No newline at end of file
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Nullable columns added to existing tables after they were created; init_db adds them when missing
+ADDED_COLUMNS = {
+    "notifications": ("payload_id", "thread_root_id"),
+    "asset_depreciation_snapshot": ("next_year_depreciation",),
+    "notification_payloads": ("fanout_status", "pending_recipients", "fanout_error"),
+}
+
+def init_db():
+    """
+    Create tables and indexes declared in models that are missing from the database.
+
+    Existing tables are left untouched apart from the ADDED_COLUMNS; indexes added to
+    existing tables are created individually (checkfirst), skipping the single-column
+    primary key indexes. Users without an unread notification counter get one, and
+    replies written before thread_root_id existed get theirs.
+    """
+    from fastapi_app import models, notification_counts, notification_threads
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns(models.Base.metadata)
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            columns = list(index.columns)
+            if len(columns) == 1 and columns[0].primary_key:
+                continue
+            index.create(bind=engine, checkfirst=True) 
+    with engine.begin() as connection:
+        notification_counts.backfill(connection)
+        notification_threads.backfill(connection)
+
+def add_missing_columns(metadata):
+    """ALTER TABLE ... ADD COLUMN for the ADDED_COLUMNS an existing table doesn't have yet"""
+    inspector = inspect(engine)
+    for table_name, column_names in ADDED_COLUMNS.items():
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        table = metadata.tables[table_name]
+        with engine.begin() as connection:
+            for name in column_names:
+                if name in existing:
+                    continue
+                column_type = table.c[name].type.compile(dialect=engine.dialect)
+                connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {column_type} NULL"))
@@ -0,0 +1,191 @@
+"""
+Monthly depreciation snapshots of the asset register.
+
+Once an accounting month has ended it is closed by writing one
+asset_depreciation_snapshot row per asset on the register (see
+fastapi_app/depreciation.py for the figures) and one asset_depreciation_period
+row. Closed periods are never rewritten, so reports read them with a single
+aggregate instead of recomputing the register.
+
+The open (current) month is derived from the previous month's snapshot:
+accumulated depreciation + the charge already due for the next month, for
+assets still on the register, plus a live computation for assets that were
+not in that snapshot. When the previous month is not closed either, the
+whole register is computed live. current_charges derives the open month's
+charge and the twelve months' charge for the dashboard the same way, from
+next_period_depreciation / next_year_depreciation.
+
+Snapshots are appended by the startup hook and by cron:
+
+    python -m fastapi_app.depreciation_snapshots [--since 2025-01] [--through 2026-09]
+
+Without --since only the months after the latest closed period are written
+(just the last ended month the first time). A backfilled month uses the
+assets on the register today.
+"""
+import argparse
+from datetime import date, datetime
+from typing import Dict, Optional
+from sqlalchemy import exists, extract, func, insert, or_, select
+from sqlalchemy.orm import Session
+from fastapi_app import depreciation
+from fastapi_app.audit_archive import add_months, month_start
+from fastapi_app.models import Asset, AssetDepreciationPeriod, AssetDepreciationSnapshot
+
+SNAPSHOT_INSERT_BATCH = 10000
+
+def last_ended_month(today: Optional[date] = None) -> date:
+    return add_months(month_start(today or datetime.now().date()), -1)
+
+def is_closed(db: Session, period: date) -> bool:
+    return db.get(AssetDepreciationPeriod, month_start(period)) is not None
+
+def latest_closed_period(db: Session) -> Optional[date]:
+    return db.query(func.max(AssetDepreciationPeriod.period)).scalar()
+
+def write_period(db: Session, period: date) -> int:
+    """Snapshot every asset on the register as at the end of period; returns the number of rows"""
+    period = month_start(period)
+    next_period = add_months(period, 1)
+    columns = depreciation.load_columns(db, or_(Asset.purchase_date.is_(None), Asset.purchase_date < next_period))
+    figures = depreciation.compute(columns, period)
+    upcoming = depreciation.compute(columns, next_period)
+
+    purchase_year = columns.purchase_month // 12
+    rows = []
+    count = 0
+    try:
+        for index in range(len(columns)):
+            rows.append({
+                "period": period,
+                "asset_id": int(columns.ids[index]),
+                "category": columns.category_names[columns.category[index]],
+                "purchase_year": int(purchase_year[index]) if columns.purchase_month[index] >= 0 else None,
+                "book_value": round(float(columns.cost[index]), 2),
+                "accumulated_depreciation": round(float(figures["accumulated"][index]), 2),
+                "net_book_value": round(float(figures["book_value"][index]), 2),
+                "period_depreciation": round(float(figures["monthly"][index]), 2),
+                "next_period_depreciation": round(float(upcoming["monthly"][index]), 2),
+                "next_year_depreciation": round(float(upcoming["yearly"][index]), 2),
+            })
+            if len(rows) == SNAPSHOT_INSERT_BATCH:
+                db.execute(insert(AssetDepreciationSnapshot), rows)
+                count += len(rows)
+                rows = []
+        if rows:
+            db.execute(insert(AssetDepreciationSnapshot), rows)
+            count += len(rows)
+        db.add(AssetDepreciationPeriod(period=period, asset_count=count, created_at=datetime.now()))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return count
+
+def close_periods(db: Session, since: Optional[date] = None, through: Optional[date] = None) -> Dict[date, int]:
+    """Write the snapshots of every ended month not closed yet; returns rows written per month"""
+    through = month_start(through) if through else last_ended_month()
+    through = min(through, last_ended_month())
+    if since is None:
+        latest = latest_closed_period(db)
+        since = add_months(latest, 1) if latest else through
+    written = {}
+    period = month_start(since)
+    while period <= through:
+        if not is_closed(db, period):
+            written[period] = write_period(db, period)
+        period = add_months(period, 1)
+    return written
+
+def accumulated_depreciation(db: Session, as_of: date, purchase_year: Optional[int] = None) -> float:
+    """Accumulated depreciation of the register at the end of as_of's month, from snapshots where possible"""
+    period = month_start(as_of)
+    year_filter = [AssetDepreciationSnapshot.purchase_year == purchase_year] if purchase_year is not None else []
+    asset_filter = [extract('year', Asset.purchase_date) == purchase_year] if purchase_year is not None else []
+
+    if is_closed(db, period):
+        total = db.query(func.sum(AssetDepreciationSnapshot.accumulated_depreciation)).filter(
+            AssetDepreciationSnapshot.period == period, *year_filter
+        ).scalar()
+        return float(total or 0)
+
+    previous = add_months(period, -1)
+    if not is_closed(db, previous):
+        columns = depreciation.load_columns(db, *asset_filter)
+        return depreciation.totals(columns, depreciation.compute(columns, as_of))["accumulatedDepreciation"]
+
+    # Open period: roll the previous snapshot forward one month for assets still on the register
+    carried = db.query(func.sum(
+        AssetDepreciationSnapshot.accumulated_depreciation + AssetDepreciationSnapshot.next_period_depreciation
+    )).join(Asset, Asset.id == AssetDepreciationSnapshot.asset_id).filter(
+        AssetDepreciationSnapshot.period == previous,
+        Asset.status.notin_(depreciation.OFF_REGISTER_STATUSES),
+        *year_filter
+    ).scalar()
+    # ...and compute assets added since live
+    in_snapshot = exists(select(AssetDepreciationSnapshot.asset_id).where(
+        AssetDepreciationSnapshot.period == previous,
+        AssetDepreciationSnapshot.asset_id == Asset.id
+    ))
+    added = depreciation.load_columns(db, ~in_snapshot, *asset_filter)
+    live = depreciation.totals(added, depreciation.compute(added, as_of))["accumulatedDepreciation"]
+    return float(carried or 0) + live
+
+def current_charges(db: Session, as_of: Optional[date] = None) -> Dict[str, float]:
+    """
+    monthlyDepreciation (charge for as_of's month) and yearlyDepreciation (the
+    twelve months starting with it), from the previous month's snapshot where possible
+    """
+    period = month_start(as_of or datetime.now().date())
+    previous = add_months(period, -1)
+    if is_closed(db, previous):
+        Snapshot = AssetDepreciationSnapshot
+        carried = db.query(
+            func.sum(Snapshot.next_period_depreciation),
+            func.sum(Snapshot.next_year_depreciation),
+            func.count(Snapshot.asset_id),
+            func.count(Snapshot.next_year_depreciation),
+        ).join(Asset, Asset.id == Snapshot.asset_id).filter(
+            Snapshot.period == previous,
+            Asset.status.notin_(depreciation.OFF_REGISTER_STATUSES)
+        ).one()
+        monthly, yearly, assets, with_year = carried
+        # Periods closed before next_year_depreciation existed are computed live below
+        if assets == with_year:
+            in_snapshot = exists(select(Snapshot.asset_id).where(
+                Snapshot.period == previous,
+                Snapshot.asset_id == Asset.id
+            ))
+            added = depreciation.load_columns(db, ~in_snapshot)
+            live = depreciation.totals(added, depreciation.compute(added, period))
+            return {
+                "monthlyDepreciation": float(monthly or 0) + live["monthlyDepreciation"],
+                "yearlyDepreciation": float(yearly or 0) + live["yearlyDepreciation"],
+            }
+
+    columns = depreciation.load_columns(db)
+    figures = depreciation.totals(columns, depreciation.compute(columns, period))
+    return {name: figures[name] for name in ("monthlyDepreciation", "yearlyDepreciation")}
+
+def _parse_month(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m").date()
+
+def main():
+    parser = argparse.ArgumentParser(description="Write depreciation snapshots for ended accounting months")
+    parser.add_argument("--since", type=_parse_month, help="first month to close (YYYY-MM)")
+    parser.add_argument("--through", type=_parse_month, help="last month to close (YYYY-MM, default: last ended month)")
+    args = parser.parse_args()
+
+    from fastapi_app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        written = close_periods(db, args.since, args.through)
+    finally:
+        db.close()
+    if not written:
+        print("No periods to close")
+    for period, count in written.items():
+        print(f"Closed {period:%Y-%m} with {count} asset snapshots")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import threading
+from datetime import date
+from typing import Dict, List, Optional
+from sqlalchemy import func, extract
+from sqlalchemy.orm import Session
+from fastapi_app import models
+from fastapi_app.change_tracking import on_commit
+
+# Ledger sources: name -> (table, amount column, date column, extra filters)
+LEDGER_SOURCES = {
+    "purchases": ("assets", models.Asset.purchase_cost, models.Asset.purchase_date, ()),
+    "disposals": ("disposals", models.Disposal.proceeds, models.Disposal.disposal_date, ()),
+    # final_bid in the API is stored as winning_bid
+    "auctions": ("auctions", models.Auction.winning_bid, models.Auction.auction_date, (models.Auction.status == 'completed',)),
+}
+
+def _monthly_totals(db: Session, source: str, year: int) -> List[float]:
+    """One GROUP BY month over a year of a source table; returns 12 monthly sums"""
+    _, amount, when, filters = LEDGER_SOURCES[source]
+    month = extract('month', when)
+    rows = db.query(month.label('month'), func.sum(amount).label('total')).filter(
+        when >= date(year, 1, 1),
+        when < date(year + 1, 1, 1),
+        *filters
+    ).group_by(month).all()
+
+    totals = [0.0] * 12
+    for row in rows:
+        if row.month is not None:
+            totals[int(row.month) - 1] = float(row.total or 0)
+    return totals
+
+class FinancialLedger:
+    """
+    Monthly purchases / disposal proceeds / auction proceeds per year.
+
+    Each year is cached per source. A commit that wrote to a source's table
+    drops that source for every cached year, since back-dated edits and bulk
+    imports can land in any year; the years shown again are recomputed with
+    one GROUP BY each.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._years: Dict[int, Dict[str, List[float]]] = {}
+        # Bumped on every invalidation so totals computed concurrently with a write aren't cached
+        self._version = 0
+        self.queries = 0
+
+    def invalidate(self, year: Optional[int] = None, sources=None):
+        with self._lock:
+            self._version += 1
+            years = [year] if year is not None else list(self._years)
+            for cached_year in years:
+                entry = self._years.get(cached_year)
+                if entry is None:
+                    continue
+                for source in (sources or list(entry)):
+                    entry.pop(source, None)
+
+    def on_tables_committed(self, tables):
+        sources = [name for name, (table, *_) in LEDGER_SOURCES.items() if table in tables]
+        if sources:
+            self.invalidate(sources=sources)
+
+    def get_year(self, db: Session, year: int) -> Dict[str, List[float]]:
+        """{"purchases": [12 floats], "disposals": [...], "auctions": [...]}"""
+        with self._lock:
+            cached = dict(self._years.get(year, {}))
+            version = self._version
+        missing = [source for source in LEDGER_SOURCES if source not in cached]
+        for source in missing:
+            cached[source] = _monthly_totals(db, source, year)
+            self.queries += 1
+        if missing:
+            with self._lock:
+                if version != self._version:
+                    return cached
+                self._years.setdefault(year, {}).update({source: cached[source] for source in missing})
+        return cached
+
+# Process-wide ledger used by the financial report
+financial_ledger = FinancialLedger()
+on_commit({table for table, *_ in LEDGER_SOURCES.values()}, financial_ledger.on_tables_committed)
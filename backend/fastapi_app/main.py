@@ -2,6 +2,14 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi_app.audit_middleware import create_audit_middleware
+from fastapi_app.audit_writer import audit_writer
+from fastapi_app.notification_fanout import fanout_worker, resume_pending
+from fastapi_app.asset_import import import_worker, fail_interrupted
+from fastapi_app.database import init_db, engine, SessionLocal
+from fastapi_app.audit_search import ensure_search_index
+from fastapi_app.audit_rollups import ensure_rollups
+from fastapi_app.depreciation_snapshots import close_periods
+from fastapi_app.user_access import rebuild_user_access
 from fastapi_app.routers_users import router as users_router
 from fastapi_app.routers_auth import router as auth_router
 from fastapi_app.routers_assets import router as assets_router
@@ -12,6 +20,7 @@ from fastapi_app.routers_transfer_requests import router as transfer_requests_ro
 from fastapi_app.routers_auctions import router as auctions_router
 from fastapi_app.routers_disposals import router as disposals_router
 from fastapi_app.routers_reports import router as reports_router
+from fastapi_app.routers_exports import router as exports_router
 from fastapi_app.routers_departments import router as departments_router
 from fastapi_app.routers_locations import router as locations_router
 from fastapi_app.routers_maintenance_complaints import router as maintenance_complaints_router
@@ -27,11 +36,74 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Keyset pagination cursor of /notifications/
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Add audit middleware
 app.middleware("http")(create_audit_middleware(app))
 
+@app.on_event("startup")
+def create_missing_schema():
+    init_db()
+    ensure_search_index(engine)
+    db = SessionLocal()
+    try:
+        # Backfill stats rollups before the audit writer starts adding to them
+        ensure_rollups(db)
+    except Exception as e:
+        print(f"Error backfilling audit rollups: {str(e)}")
+    try:
+        # Pick up asset_access / permissions edited directly in the database
+        rebuild_user_access(db)
+    except Exception as e:
+        print(f"Error syncing user access tables: {str(e)}")
+    try:
+        # Imports queued before a restart lost their uploads
+        fail_interrupted(db)
+    except Exception as e:
+        print(f"Error closing interrupted asset imports: {str(e)}")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def close_depreciation_periods():
+    # Catch up on months that ended while the API was down; cron runs the same job
+    db = SessionLocal()
+    try:
+        close_periods(db)
+    except Exception as e:
+        print(f"Error writing depreciation snapshots: {str(e)}")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def start_audit_writer():
+    audit_writer.start()
+
+@app.on_event("shutdown")
+def stop_audit_writer():
+    # Flush queued audit rows before the process exits
+    audit_writer.stop()
+
+@app.on_event("shutdown")
+def stop_import_worker():
+    # Stop a running import after its current batch and cancel the queued ones (waits up to 10s)
+    import_worker.stop()
+
+@app.on_event("startup")
+def resume_fanouts():
+    # Deferred notification fan-outs a restart interrupted
+    try:
+        resume_pending()
+    except Exception as e:
+        print(f"Error resuming notification fan-outs: {str(e)}")
+
+@app.on_event("shutdown")
+def stop_fanout_worker():
+    # Finish deferred notification fan-outs before the process exits
+    fanout_worker.stop()
+
 UPLOAD_DIR = os.getenv("ASSET_UPLOAD_DIR", "backend/uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
@@ -46,6 +118,7 @@ app.include_router(notifications_router)
 app.include_router(dashboard_router)
 app.include_router(transfer_requests_router)
 app.include_router(reports_router)
+app.include_router(exports_router)
 app.include_router(departments_router)
 app.include_router(locations_router)
 app.include_router(maintenance_complaints_router)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, Text, JSON, TIMESTAMP, DECIMAL, Date, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Enum, Text, JSON, TIMESTAMP, DECIMAL, Date, ForeignKey, Float, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import enum
@@ -38,6 +38,26 @@ class User(Base):
     notes = Column(Text)
     created_at = Column(TIMESTAMP)
 
+class UserLocationAccess(Base):
+    """users.asset_access normalized: one row per user x location (see user_access.py)"""
+    __tablename__ = 'user_location_access'
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    location = Column(String(100), primary_key=True)
+
+    __table_args__ = (
+        Index('ix_user_location_access_location', 'location', 'user_id'),
+    )
+
+class UserPermission(Base):
+    """users.permissions normalized: one row per user x permission (see user_access.py)"""
+    __tablename__ = 'user_permission'
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    permission = Column(String(50), primary_key=True)
+
+    __table_args__ = (
+        Index('ix_user_permission_permission', 'permission', 'user_id'),
+    )
+
 class AssetStatus(str, enum.Enum):
     active = 'active'
     maintenance = 'maintenance'
@@ -52,7 +72,7 @@ class Asset(Base):
     category = Column(String(50))
     purchase_date = Column(Date)
     purchase_cost = Column(DECIMAL(12,2))
-    location = Column(String(100))
+    location = Column(String(100), index=True)
     status = Column(Enum(AssetStatus), default=AssetStatus.active)
     image_url = Column(String(255))
     barcode = Column(String(100), unique=True)
@@ -76,6 +96,32 @@ class Asset(Base):
     created_at = Column(TIMESTAMP)
     updated_at = Column(TIMESTAMP) 
 
+class AssetImportStatus(str, enum.Enum):
+    queued = 'queued'
+    running = 'running'
+    completed = 'completed'
+    failed = 'failed'
+
+class AssetImportJob(Base):
+    """Progress and error report of one /assets/import upload (asset_import.py)"""
+    __tablename__ = 'asset_import_jobs'
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'))
+    filename = Column(String(255))
+    format = Column(String(10))
+    status = Column(Enum(AssetImportStatus), default=AssetImportStatus.queued)
+    batch_size = Column(Integer)
+    rows_read = Column(Integer, default=0)
+    rows_inserted = Column(Integer, default=0)
+    rows_failed = Column(Integer, default=0)
+    # [{"row", "field", "message"}], the first ASSET_IMPORT_MAX_ERRORS of them
+    errors = Column(JSON)
+    # Why a failed job stopped
+    error_message = Column(Text)
+    created_at = Column(TIMESTAMP)
+    started_at = Column(TIMESTAMP)
+    finished_at = Column(TIMESTAMP)
+
 class MaintenanceType(str, enum.Enum):
     preventive = 'preventive'
     corrective = 'corrective'
@@ -228,10 +274,93 @@ class AuditTrail(Base):
     additional_data = Column(JSON)  # Any additional audit data
     timestamp = Column(TIMESTAMP, default=datetime.now)
 
+    # (sort column, id) indexes backing keyset pagination for every /audit/ sort_by option
+    __table_args__ = (
+        Index('ix_audit_trail_timestamp_id', 'timestamp', 'id'),
+        Index('ix_audit_trail_user_id_id', 'user_id', 'id'),
+        Index('ix_audit_trail_action_id', 'action', 'id'),
+        Index('ix_audit_trail_table_name_id', 'table_name', 'id'),
+        Index('ix_audit_trail_ip_address_id', 'ip_address', 'id'),
+    )
+
+class AuditHourlyRollup(Base):
+    """audit_trail counts per hour x action x table x status class, kept up to date by the audit writer"""
+    __tablename__ = 'audit_hourly_rollup'
+    bucket_hour = Column(TIMESTAMP, primary_key=True)
+    action = Column(String(100), primary_key=True)
+    table_name = Column(String(100), primary_key=True, default='')  # '' when the record has no table
+    status_class = Column(String(7), primary_key=True)  # 2xx, 4xx, 5xx, ... or 'none'
+    record_count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)  # rows with an error_message
+
+    # Covering indexes for the per-action / per-table breakdowns
+    __table_args__ = (
+        Index('ix_audit_hourly_rollup_action', 'action', 'bucket_hour', 'record_count'),
+        Index('ix_audit_hourly_rollup_table_name', 'table_name', 'bucket_hour', 'record_count'),
+    )
+
+class AuditActorHourlyRollup(Base):
+    """Who acted in each hour, so distinct user / IP counts don't need the raw log"""
+    __tablename__ = 'audit_actor_hourly_rollup'
+    bucket_hour = Column(TIMESTAMP, primary_key=True)
+    user_id = Column(Integer, primary_key=True, default=0)  # 0 when the record has no user
+    ip_address = Column(String(45), primary_key=True, default='')  # '' when unknown
+    record_count = Column(Integer, nullable=False, default=0)
+
+    # Covering indexes so distinct user / IP counts are an ordered index scan
+    __table_args__ = (
+        Index('ix_audit_actor_hourly_rollup_user_id', 'user_id', 'bucket_hour'),
+        Index('ix_audit_actor_hourly_rollup_ip_address', 'ip_address', 'bucket_hour'),
+    )
+
+class AssetDepreciationPeriod(Base):
+    """Accounting months whose depreciation snapshot has been written (closed periods)"""
+    __tablename__ = 'asset_depreciation_period'
+    period = Column(Date, primary_key=True)  # first day of the month
+    asset_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(TIMESTAMP)
+
+class AssetDepreciationSnapshot(Base):
+    """Per-asset depreciation as at the end of a closed month, written once by depreciation_snapshots"""
+    __tablename__ = 'asset_depreciation_snapshot'
+    period = Column(Date, primary_key=True)  # first day of the month
+    asset_id = Column(Integer, primary_key=True)  # no FK: closed periods outlive deleted assets
+    category = Column(String(50))
+    purchase_year = Column(Integer)  # NULL when the asset has no purchase date
+    book_value = Column(DECIMAL(14,2), nullable=False)  # gross carrying amount (purchase cost)
+    accumulated_depreciation = Column(DECIMAL(14,2), nullable=False)
+    net_book_value = Column(DECIMAL(14,2), nullable=False)
+    period_depreciation = Column(DECIMAL(14,2), nullable=False)  # charged during this month
+    next_period_depreciation = Column(DECIMAL(14,2), nullable=False)  # due next month, for the open period
+    next_year_depreciation = Column(DECIMAL(14,2))  # due over the twelve months starting next month
+
+    __table_args__ = (
+        Index('ix_asset_depreciation_snapshot_period_year', 'period', 'purchase_year'),
+    )
+
 class NotificationDirection(str, enum.Enum):
     sent = 'sent'
     received = 'received'
 
+class NotificationPayload(Base):
+    """Content shared by every recipient of a fanned-out notification (see notification_fanout.py)"""
+    __tablename__ = 'notification_payloads'
+    id = Column(Integer, primary_key=True, index=True)
+    sender_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    title = Column(String(255), nullable=True)
+    message = Column(Text)
+    type = Column(String(50), nullable=True)
+    priority = Column(String(20), nullable=True)
+    action_url = Column(String(255), nullable=True)
+    action_text = Column(String(100), nullable=True)
+    notification_metadata = Column(JSON, nullable=True)
+    recipient_count = Column(Integer, default=0)
+    created_at = Column(TIMESTAMP)
+    # Deferred fan-outs: 'pending' with the recipients still to write, 'failed' with the error
+    fanout_status = Column(String(20), nullable=True, index=True)
+    pending_recipients = Column(JSON, nullable=True)
+    fanout_error = Column(Text, nullable=True)
+
 class Notification(Base):
     __tablename__ = 'notifications'
     id = Column(Integer, primary_key=True, index=True)
@@ -248,6 +377,45 @@ class Notification(Base):
     is_read = Column(Integer, default=0)
     created_at = Column(TIMESTAMP)
     parent_id = Column(Integer, ForeignKey('notifications.id'), nullable=True)
+    # First notification of the reply chain (NULL on the first notification itself)
+    thread_root_id = Column(Integer, ForeignKey('notifications.id'), nullable=True)
+    # Set on fanned-out rows, whose title, message, action and metadata live in the payload
+    payload_id = Column(Integer, ForeignKey('notification_payloads.id'), nullable=True, index=True)
+
+    # (created_at, id) keyset pagination of /notifications/, overall and per recipient
+    __table_args__ = (
+        Index('ix_notifications_created_at_id', 'created_at', 'id'),
+        Index('ix_notifications_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        # Whole reply chains in (created_at, id) order, /notifications/threads/{root_id}
+        Index('ix_notifications_thread_root_id_created_at_id', 'thread_root_id', 'created_at', 'id'),
+    )
+
+class NotificationUnreadCount(Base):
+    """Per-user unread notification counter, maintained by notification_counts.py"""
+    __tablename__ = 'notification_unread_counts'
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    unread = Column(Integer, nullable=False, default=0)
+    # The user's notifications with an id up to this one count as read ("mark all read")
+    read_through_id = Column(Integer, nullable=False, default=0)
+
+class NotificationArchive(Base):
+    """Compressed originals of notifications compacted into a digest (notification_compaction.py)"""
+    __tablename__ = 'notification_archive'
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
+    # The digest notification summarizing them (no FK: digests are compacted in turn)
+    digest_id = Column(Integer, nullable=True)
+    notification_count = Column(Integer, nullable=False, default=0)
+    first_created_at = Column(TIMESTAMP, nullable=True)
+    last_created_at = Column(TIMESTAMP, nullable=True)
+    compression = Column(String(10), nullable=False)
+    # JSON list of NotificationRead payloads; MEDIUMBLOB on MySQL
+    data = Column(LargeBinary(length=16777215), nullable=False)
+    archived_at = Column(TIMESTAMP)
+
+    __table_args__ = (
+        Index('ix_notification_archive_user_id_last_created_at', 'user_id', 'last_created_at'),
+    )
 
 class Department(Base):
     __tablename__ = 'departments'
@@ -322,6 +490,12 @@ class TransferRequest(Base):
     notes = Column(Text, nullable=True)
     created_at = Column(TIMESTAMP)
 
+    # Newest-first pages of /transfer_requests/, overall and per requester
+    __table_args__ = (
+        Index('ix_transfer_requests_created_at_id', 'created_at', 'id'),
+        Index('ix_transfer_requests_requested_by_created_at', 'requested_by', 'created_at'),
+    )
+
 class AssetHistory(Base):
     __tablename__ = 'asset_history'
     id = Column(Integer, primary_key=True, index=True)
@@ -6,4 +6,160 @@ ADD COLUMN custodian_id INT NULL,
 ADD CONSTRAINT fk_transfer_custodian
   FOREIGN KEY (custodian_id) REFERENCES users(id);
 
-   ALTER TABLE auctions ADD COLUMN location VARCHAR(255);
\ No newline at end of file
+   ALTER TABLE auctions ADD COLUMN location VARCHAR(255);
+
+-- Keyset pagination indexes for /audit/ (one per sort_by column, with id as tiebreaker)
+CREATE INDEX ix_audit_trail_timestamp_id ON audit_trail (timestamp, id);
+CREATE INDEX ix_audit_trail_user_id_id ON audit_trail (user_id, id);
+CREATE INDEX ix_audit_trail_action_id ON audit_trail (action, id);
+CREATE INDEX ix_audit_trail_table_name_id ON audit_trail (table_name, id);
+CREATE INDEX ix_audit_trail_ip_address_id ON audit_trail (ip_address, id);
+
+-- Full-text index behind the /audit/ search parameter (SQLite uses an FTS5 table instead)
+ALTER TABLE audit_trail ADD FULLTEXT INDEX ft_audit_trail_search (username, user_email, full_name, action, table_name, ip_address, user_agent, error_message);
+
+-- Optional: monthly range partitions for audit_trail (see fastapi_app/audit_archive.py).
+-- InnoDB partitioned tables allow neither foreign keys nor FULLTEXT indexes, so this
+-- trades the FK on user_id and the search index above for O(1) retention: archiving a
+-- month drops its partition. Without it, archival falls back to a range DELETE.
+-- ALTER TABLE audit_trail DROP FOREIGN KEY audit_trail_ibfk_1;
+-- ALTER TABLE audit_trail DROP INDEX ft_audit_trail_search;
+-- ALTER TABLE audit_trail MODIFY timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+-- ALTER TABLE audit_trail DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp);
+-- ALTER TABLE audit_trail PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (
+--     PARTITION p_history VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01')),
+--     PARTITION p_future VALUES LESS THAN MAXVALUE
+-- );
+-- Monthly partitions are then split out of p_future by the retention job.
+
+-- Hourly audit statistics rollups (fastapi_app/audit_rollups.py), maintained by the audit writer
+CREATE TABLE IF NOT EXISTS audit_hourly_rollup (
+    bucket_hour TIMESTAMP NOT NULL,
+    action VARCHAR(100) NOT NULL,
+    table_name VARCHAR(100) NOT NULL DEFAULT '',
+    status_class VARCHAR(7) NOT NULL,
+    record_count INT NOT NULL DEFAULT 0,
+    error_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_hour, action, table_name, status_class)
+);
+
+CREATE TABLE IF NOT EXISTS audit_actor_hourly_rollup (
+    bucket_hour TIMESTAMP NOT NULL,
+    user_id INT NOT NULL DEFAULT 0,
+    ip_address VARCHAR(45) NOT NULL DEFAULT '',
+    record_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_hour, user_id, ip_address)
+);
+CREATE INDEX ix_audit_actor_hourly_rollup_user_id ON audit_actor_hourly_rollup (user_id, bucket_hour);
+CREATE INDEX ix_audit_actor_hourly_rollup_ip_address ON audit_actor_hourly_rollup (ip_address, bucket_hour);
+CREATE INDEX ix_audit_hourly_rollup_action ON audit_hourly_rollup (action, bucket_hour, record_count);
+CREATE INDEX ix_audit_hourly_rollup_table_name ON audit_hourly_rollup (table_name, bucket_hour, record_count);
+
+-- Monthly per-asset depreciation snapshots (fastapi_app/depreciation_snapshots.py)
+CREATE TABLE IF NOT EXISTS asset_depreciation_period (
+    period DATE NOT NULL PRIMARY KEY,
+    asset_count INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NULL
+);
+
+CREATE TABLE IF NOT EXISTS asset_depreciation_snapshot (
+    period DATE NOT NULL,
+    asset_id INT NOT NULL,
+    category VARCHAR(50) NULL,
+    purchase_year INT NULL,
+    book_value DECIMAL(14,2) NOT NULL,
+    accumulated_depreciation DECIMAL(14,2) NOT NULL,
+    net_book_value DECIMAL(14,2) NOT NULL,
+    period_depreciation DECIMAL(14,2) NOT NULL,
+    next_period_depreciation DECIMAL(14,2) NOT NULL,
+    next_year_depreciation DECIMAL(14,2) NULL,
+    PRIMARY KEY (period, asset_id)
+);
+CREATE INDEX ix_asset_depreciation_snapshot_period_year ON asset_depreciation_snapshot (period, purchase_year);
+
+-- Normalized users.asset_access / users.permissions (fastapi_app/user_access.py)
+CREATE TABLE IF NOT EXISTS user_location_access (
+    user_id INT NOT NULL,
+    location VARCHAR(100) NOT NULL,
+    PRIMARY KEY (user_id, location),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+CREATE INDEX ix_user_location_access_location ON user_location_access (location, user_id);
+
+CREATE TABLE IF NOT EXISTS user_permission (
+    user_id INT NOT NULL,
+    permission VARCHAR(50) NOT NULL,
+    PRIMARY KEY (user_id, permission),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+CREATE INDEX ix_user_permission_permission ON user_permission (permission, user_id);
+CREATE INDEX ix_assets_location ON assets (location);
+CREATE INDEX ix_notifications_created_at_id ON notifications (created_at, id);
+CREATE INDEX ix_notifications_user_id_created_at_id ON notifications (user_id, created_at, id);
+CREATE INDEX ix_transfer_requests_created_at_id ON transfer_requests (created_at, id);
+CREATE INDEX ix_transfer_requests_requested_by_created_at ON transfer_requests (requested_by, created_at);
+CREATE TABLE IF NOT EXISTS notification_payloads (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    sender_id INT NULL,
+    title VARCHAR(255) NULL,
+    message TEXT,
+    type VARCHAR(50) NULL,
+    priority VARCHAR(20) NULL,
+    action_url VARCHAR(255) NULL,
+    action_text VARCHAR(100) NULL,
+    notification_metadata JSON NULL,
+    recipient_count INT DEFAULT 0,
+    created_at TIMESTAMP NULL,
+    fanout_status VARCHAR(20) NULL,
+    pending_recipients JSON NULL,
+    fanout_error TEXT NULL,
+    FOREIGN KEY (sender_id) REFERENCES users(id)
+);
+CREATE INDEX ix_notification_payloads_fanout_status ON notification_payloads (fanout_status);
+ALTER TABLE notifications
+ADD COLUMN payload_id INT NULL,
+ADD FOREIGN KEY (payload_id) REFERENCES notification_payloads(id);
+CREATE INDEX ix_notifications_payload_id ON notifications (payload_id);
+CREATE TABLE IF NOT EXISTS notification_unread_counts (
+    user_id INT PRIMARY KEY,
+    unread INT NOT NULL DEFAULT 0,
+    read_through_id INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+INSERT INTO notification_unread_counts (user_id, unread)
+SELECT u.id, (SELECT COUNT(*) FROM notifications n WHERE n.user_id = u.id AND n.is_read = 0) FROM users u
+WHERE u.id NOT IN (SELECT user_id FROM notification_unread_counts);
+ALTER TABLE notifications
+ADD COLUMN thread_root_id INT NULL,
+ADD FOREIGN KEY (thread_root_id) REFERENCES notifications(id);
+CREATE INDEX ix_notifications_thread_root_id_created_at_id ON notifications (thread_root_id, created_at, id);
+CREATE TABLE IF NOT EXISTS notification_archive (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NULL,
+    digest_id INT NULL,
+    notification_count INT NOT NULL DEFAULT 0,
+    first_created_at TIMESTAMP NULL,
+    last_created_at TIMESTAMP NULL,
+    compression VARCHAR(10) NOT NULL,
+    data MEDIUMBLOB NOT NULL,
+    archived_at TIMESTAMP NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+CREATE INDEX ix_notification_archive_user_id_last_created_at ON notification_archive (user_id, last_created_at);
+CREATE TABLE IF NOT EXISTS asset_import_jobs (
+    id VARCHAR(32) PRIMARY KEY,
+    user_id INT NULL,
+    filename VARCHAR(255) NULL,
+    format VARCHAR(10) NULL,
+    status ENUM('queued', 'running', 'completed', 'failed') DEFAULT 'queued',
+    batch_size INT NULL,
+    rows_read INT DEFAULT 0,
+    rows_inserted INT DEFAULT 0,
+    rows_failed INT DEFAULT 0,
+    errors JSON NULL,
+    error_message TEXT NULL,
+    created_at TIMESTAMP NULL,
+    started_at TIMESTAMP NULL,
+    finished_at TIMESTAMP NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
@@ -0,0 +1,289 @@
+"""
+Retention and compaction for notifications.
+
+Read notifications older than their type's retention period are collapsed,
+per user, into one digest notification ("12 older notifications were
+archived: ...") and their originals are moved, compressed, to the
+notification_archive side table (zstd when the zstandard package is
+installed, gzip otherwise), so the hot notifications table only holds recent
+and unread rows. Notifications taking part in a reply thread are kept, and
+payloads of fanned-out rows go once no notification uses them any more.
+
+Retention is NOTIFICATION_RETENTION_DAYS by default and can be set per type
+with NOTIFICATION_RETENTION_BY_TYPE ("complaint_submitted=30,
+maintenance_complaint=180"; "never" keeps a type). A digest is itself read
+and old after a while: compacting it folds its counts into the next digest.
+
+Run compaction from cron or a scheduler:
+
+    python -m fastapi_app.notification_compaction --retention-days 90 --type complaint_submitted=30
+"""
+import argparse
+import gzip
+import json
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import and_, delete, exists, insert, or_, select, update
+from sqlalchemy.orm import Session, aliased
+from fastapi_app import models
+from fastapi_app.notification_details import notification_query, serialize_notification
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, fall back to gzip
+    zstandard = None
+
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', '90'))
+NOTIFICATION_ARCHIVE_COMPRESSION = os.getenv('NOTIFICATION_ARCHIVE_COMPRESSION', 'zstd' if zstandard else 'gzip').lower()
+# Notifications per archive row (and per transaction)
+NOTIFICATION_ARCHIVE_BATCH_SIZE = int(os.getenv('NOTIFICATION_ARCHIVE_BATCH_SIZE', '1000'))
+
+DIGEST_TYPE = "notification_digest"
+
+# Retention by type unless NOTIFICATION_RETENTION_BY_TYPE overrides it; None keeps the type
+DEFAULT_RETENTION_BY_TYPE: Dict[str, Optional[int]] = {
+    "complaint_submitted": 30,
+    "maintenance_complaint": 180,
+}
+
+def parse_retention(value: str) -> Dict[str, Optional[int]]:
+    """ "type=days,type=never" -> {type: days or None} """
+    retention = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        name, _, days = item.partition('=')
+        days = days.strip().lower()
+        if not name.strip() or not days:
+            raise ValueError(f"Invalid notification retention entry: {item!r}")
+        retention[name.strip()] = None if days in ("never", "keep") else int(days)
+    return retention
+
+NOTIFICATION_RETENTION_BY_TYPE = {
+    **DEFAULT_RETENTION_BY_TYPE,
+    **parse_retention(os.getenv('NOTIFICATION_RETENTION_BY_TYPE', '')),
+}
+
+# Archive encoding
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _as_datetime(value) -> Optional[datetime]:
+    if not value:
+        return None
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+def compress(records: List[Dict[str, Any]], compression: str = NOTIFICATION_ARCHIVE_COMPRESSION) -> bytes:
+    # Plain json.dumps: jsonable_encoder costs more than the compression itself
+    data = json.dumps(records, separators=(",", ":"), default=_json_default).encode("utf-8")
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed; set NOTIFICATION_ARCHIVE_COMPRESSION=gzip")
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data)
+
+def load_archive(archive: models.NotificationArchive) -> List[Dict[str, Any]]:
+    """The archived NotificationRead payloads of one archive row"""
+    if archive.compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd notification archives")
+        data = zstandard.ZstdDecompressor().decompress(archive.data)
+    else:
+        data = gzip.decompress(archive.data)
+    return json.loads(data)
+
+# Selection
+
+def expired(now: datetime, retention_days: int = NOTIFICATION_RETENTION_DAYS,
+            retention_by_type: Optional[Dict[str, Optional[int]]] = None):
+    """Filter matching notifications older than their type's retention period"""
+    retention_by_type = NOTIFICATION_RETENTION_BY_TYPE if retention_by_type is None else retention_by_type
+    Notification = models.Notification
+    conditions = [
+        and_(Notification.type == name, Notification.created_at < now - timedelta(days=days))
+        for name, days in retention_by_type.items() if days is not None
+    ]
+    conditions.append(and_(
+        or_(Notification.type.is_(None), Notification.type.notin_(list(retention_by_type))),
+        Notification.created_at < now - timedelta(days=retention_days)
+    ))
+    return or_(*conditions)
+
+def compactable(now: datetime, retention_days: int = NOTIFICATION_RETENTION_DAYS,
+                retention_by_type: Optional[Dict[str, Optional[int]]] = None):
+    """ids of expired, read notifications outside any reply thread, with their recipient"""
+    Notification = models.Notification
+    UnreadCount = models.NotificationUnreadCount
+    reply = aliased(Notification)
+    return select(Notification.id, Notification.user_id).outerjoin(
+        UnreadCount, UnreadCount.user_id == Notification.user_id
+    ).where(
+        Notification.user_id.isnot(None),
+        expired(now, retention_days, retention_by_type),
+        # Covered by "mark all read" counts as read (notification_counts.py)
+        or_(Notification.is_read == 1, Notification.id <= UnreadCount.read_through_id),
+        Notification.parent_id.is_(None),
+        Notification.thread_root_id.is_(None),
+        ~exists().where(reply.thread_root_id == Notification.id),
+    )
+
+# Digests
+
+class Digest:
+    """The digest notification of one user in one compaction run"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.id: Optional[int] = None
+        self.counts: Counter = Counter()
+        self.first_created_at: Optional[datetime] = None
+        self.last_created_at: Optional[datetime] = None
+
+    def add(self, record: Dict[str, Any]):
+        metadata = record.get("notification_metadata") or {}
+        if record.get("type") == DIGEST_TYPE and metadata.get("digest"):
+            # An earlier digest: carry its counts over instead of counting it
+            self.counts.update(metadata.get("counts") or {})
+            first, last = metadata.get("first_created_at"), metadata.get("last_created_at")
+        else:
+            self.counts[record.get("type") or "other"] += 1
+            first = last = record.get("created_at")
+        first, last = _as_datetime(first), _as_datetime(last)
+        if first and (self.first_created_at is None or first < self.first_created_at):
+            self.first_created_at = first
+        if last and (self.last_created_at is None or last > self.last_created_at):
+            self.last_created_at = last
+
+    def values(self) -> Dict[str, Any]:
+        total = sum(self.counts.values())
+        breakdown = ", ".join(f"{count} {name}" for name, count in self.counts.most_common())
+        period = ""
+        if self.first_created_at and self.last_created_at:
+            period = f" from {self.first_created_at:%Y-%m-%d} to {self.last_created_at:%Y-%m-%d}"
+        return {
+            "title": f"{total} older notifications archived",
+            "message": f"{total} read notifications{period} were archived: {breakdown}.",
+            "created_at": self.last_created_at,
+            "notification_metadata": {
+                "digest": True,
+                "archived": total,
+                "counts": dict(self.counts),
+                "first_created_at": self.first_created_at.isoformat() if self.first_created_at else None,
+                "last_created_at": self.last_created_at.isoformat() if self.last_created_at else None,
+            },
+        }
+
+    def save(self, db: Session):
+        # Core statements: a digest is already read and isn't pushed to /notifications/stream
+        if self.id is None:
+            self.id = db.execute(insert(models.Notification).values(
+                user_id=self.user_id,
+                type=DIGEST_TYPE,
+                priority="low",
+                direction=models.NotificationDirection.received,
+                is_read=1,
+                **self.values()
+            )).inserted_primary_key[0]
+        else:
+            db.execute(update(models.Notification).where(models.Notification.id == self.id).values(**self.values()))
+
+# Compaction
+
+def _archive_batch(db: Session, digest: Digest, ids: List[int], compression: str, now: datetime) -> int:
+    rows = notification_query(db).filter(models.Notification.id.in_(ids)).order_by(models.Notification.id).all()
+    records = [serialize_notification(row) for row in rows]
+    for record in records:
+        digest.add(record)
+    digest.save(db)
+
+    created = [row.Notification.created_at for row in rows if row.Notification.created_at]
+    data = compress(records, compression)
+    db.add(models.NotificationArchive(
+        user_id=digest.user_id,
+        digest_id=digest.id,
+        notification_count=len(records),
+        first_created_at=min(created) if created else None,
+        last_created_at=max(created) if created else None,
+        compression=compression,
+        data=data,
+        archived_at=now,
+    ))
+    db.execute(delete(models.Notification).where(models.Notification.id.in_(ids)),
+               execution_options={"synchronize_session": False})
+
+    payload_ids = {row.Notification.payload_id for row in rows if row.Notification.payload_id}
+    if payload_ids:
+        Payload = models.NotificationPayload
+        db.execute(delete(Payload).where(
+            Payload.id.in_(payload_ids),
+            ~exists().where(models.Notification.payload_id == Payload.id)
+        ), execution_options={"synchronize_session": False})
+    return len(data)
+
+def compact(db: Session, now: Optional[datetime] = None, retention_days: int = NOTIFICATION_RETENTION_DAYS,
+            retention_by_type: Optional[Dict[str, Optional[int]]] = None,
+            batch_size: int = NOTIFICATION_ARCHIVE_BATCH_SIZE,
+            compression: str = NOTIFICATION_ARCHIVE_COMPRESSION) -> Dict[str, int]:
+    """
+    Compact every user's expired read notifications into a digest and the archive.
+
+    Each batch (archive row, digest update and deletes) is its own transaction.
+    Returns totals: users, notifications archived, archive bytes written.
+    """
+    now = now or datetime.now()
+    candidates = compactable(now, retention_days, retention_by_type).subquery()
+    user_ids = [user_id for (user_id,) in db.execute(
+        select(candidates.c.user_id).distinct().order_by(candidates.c.user_id)
+    )]
+
+    stats = {"users": 0, "archived": 0, "archive_bytes": 0}
+    for user_id in user_ids:
+        digest = Digest(user_id)
+        while True:
+            ids = [notification_id for (notification_id,) in db.execute(
+                select(candidates.c.id).where(candidates.c.user_id == user_id).order_by(candidates.c.id).limit(batch_size)
+            )]
+            # Never fold this run's own digest back into itself
+            ids = [notification_id for notification_id in ids if notification_id != digest.id]
+            if not ids:
+                break
+            try:
+                stats["archive_bytes"] += _archive_batch(db, digest, ids, compression, now)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            stats["archived"] += len(ids)
+        if digest.id is not None:
+            stats["users"] += 1
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact old read notifications into per-user digests")
+    parser.add_argument("--retention-days", type=int, default=NOTIFICATION_RETENTION_DAYS)
+    parser.add_argument("--type", action="append", default=[], metavar="TYPE=DAYS",
+                        help="retention of one notification type in days, or 'never' (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=NOTIFICATION_ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+    retention_by_type = {**NOTIFICATION_RETENTION_BY_TYPE, **parse_retention(",".join(args.type))}
+
+    from fastapi_app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        stats = compact(db, retention_days=args.retention_days, retention_by_type=retention_by_type,
+                        batch_size=args.batch_size)
+    finally:
+        db.close()
+    if not stats["archived"]:
+        print("Nothing to compact")
+    else:
+        print(f"Archived {stats['archived']} notifications of {stats['users']} users "
+              f"into {stats['archive_bytes'] / 1e3:.1f} kB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Per-user unread notification counters.
+
+notification_unread_counts holds each user's number of unread notifications
+and a read_through_id: the user's notifications with an id up to it count as
+read whatever their is_read column says. That is what lets mark_all_read
+clear a user's notifications with one single-row UPDATE instead of rewriting
+every row, and unread_count answer with a primary key lookup instead of a
+COUNT over notifications.
+
+The counters change in the same transaction as the notifications:
+Notification objects added, deleted or with is_read changed through an ORM
+session are applied at flush time by the session hook below, and bulk
+inserts (notification_fanout.py) call add_unread. A counter row is created
+with its user and init_db backfills existing users; a row that is still
+missing is rebuilt from the notifications table the first time it is read.
+"""
+from collections import defaultdict
+from typing import Dict, Optional
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from fastapi_app import models
+
+Counter = models.NotificationUnreadCount
+
+# Users per UPDATE ... WHERE user_id IN (...) of add_unread
+COUNTER_BATCH_SIZE = 1000
+
+def effective_is_read(notification, read_through_id: Optional[int]) -> int:
+    """is_read of notification, counting mark-all-read (read_through_id) in"""
+    if notification.is_read:
+        return 1
+    return 1 if read_through_id and notification.id is not None and notification.id <= read_through_id else 0
+
+def add_unread(connection, counts: Dict[int, int]):
+    """Add counts ({user id: new unread notifications}) to the users' counters; one UPDATE per distinct count"""
+    by_amount = defaultdict(list)
+    for user_id, amount in counts.items():
+        if user_id is not None and amount:
+            by_amount[amount].append(user_id)
+    for amount, user_ids in by_amount.items():
+        for start in range(0, len(user_ids), COUNTER_BATCH_SIZE):
+            connection.execute(
+                update(Counter)
+                .where(Counter.user_id.in_(user_ids[start:start + COUNTER_BATCH_SIZE]))
+                .values(unread=Counter.unread + amount)
+            )
+
+def _count_unread(db: Session, user_id: int, read_through_id: int = 0) -> int:
+    return db.query(func.count(models.Notification.id)).filter(
+        models.Notification.user_id == user_id,
+        models.Notification.is_read == 0,
+        models.Notification.id > read_through_id
+    ).scalar() or 0
+
+def get_counter(db: Session, user_id: int) -> Counter:
+    """The counter row of user_id, rebuilt from the notifications table (and committed) when missing"""
+    counter = db.get(Counter, user_id)
+    if counter is not None:
+        return counter
+    counter = Counter(user_id=user_id, unread=_count_unread(db, user_id), read_through_id=0)
+    db.add(counter)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Rebuilt by a concurrent request
+        db.rollback()
+        return db.get(Counter, user_id)
+    return counter
+
+def unread_count(db: Session, user_id: int) -> int:
+    return get_counter(db, user_id).unread
+
+def mark_all_read(db: Session, user_id: int) -> Counter:
+    """Mark every notification of user_id read by moving its read_through_id; the caller commits"""
+    get_counter(db, user_id)
+    latest = select(func.coalesce(func.max(models.Notification.id), 0)).scalar_subquery()
+    db.execute(
+        update(Counter).where(Counter.user_id == user_id).values(unread=0, read_through_id=latest),
+        execution_options={"synchronize_session": "fetch"}
+    )
+    return db.get(Counter, user_id)
+
+def backfill(connection):
+    """Create the counter rows of users that have none, counting their unread notifications"""
+    unread = select(
+        models.Notification.user_id,
+        func.count(models.Notification.id).label("unread")
+    ).where(models.Notification.is_read == 0).group_by(models.Notification.user_id).subquery()
+    connection.execute(insert(Counter).from_select(
+        ["user_id", "unread", "read_through_id"],
+        select(models.User.id, func.coalesce(unread.c.unread, 0), 0)
+        .outerjoin(unread, unread.c.user_id == models.User.id)
+        .where(~select(Counter.user_id).where(Counter.user_id == models.User.id).exists())
+    ))
+
+def _adjust(connection, notification, delta: int):
+    # Rows covered by the user's read_through_id already count as read
+    statement = update(Counter).where(
+        Counter.user_id == notification.user_id,
+        Counter.read_through_id < notification.id
+    )
+    if delta < 0:
+        statement = statement.where(Counter.unread > 0)
+    connection.execute(statement.values(unread=Counter.unread + delta))
+
+@event.listens_for(Session, "after_flush")
+def _apply_flush(session, flush_context):
+    created = defaultdict(int)
+    changed = []
+    new_users = []
+    for instance in session.new:
+        if isinstance(instance, models.Notification):
+            if instance.user_id is not None and not instance.is_read:
+                created[instance.user_id] += 1
+        elif isinstance(instance, models.User):
+            new_users.append(instance.id)
+    for instance in session.dirty:
+        if isinstance(instance, models.Notification) and instance.user_id is not None:
+            history = inspect(instance).attrs.is_read.history
+            if history.deleted and bool(history.deleted[0]) != bool(instance.is_read):
+                changed.append((instance, -1 if instance.is_read else 1))
+    for instance in session.deleted:
+        if isinstance(instance, models.Notification) and instance.user_id is not None and not instance.is_read:
+            changed.append((instance, -1))
+    if not (created or changed or new_users):
+        return
+
+    connection = session.connection()
+    if new_users:
+        connection.execute(insert(Counter), [
+            {"user_id": user_id, "unread": 0, "read_through_id": 0} for user_id in new_users
+        ])
+    add_unread(connection, created)
+    for notification, delta in changed:
+        _adjust(connection, notification, delta)
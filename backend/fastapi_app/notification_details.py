@@ -0,0 +1,75 @@
+"""
+Notifications joined with their recipient's and sender's details.
+
+notification_query selects both users through aliased outer joins, so a page
+of notifications (or a batch of new ones pushed to /notifications/stream) is
+one query; serialize_notification turns a row into the NotificationRead
+shape the frontend expects. Fanned-out rows take their title, message,
+action and metadata from the shared notification_payloads row, and is_read
+counts the recipient's "mark all read" in.
+"""
+from sqlalchemy.orm import Session, aliased
+from fastapi_app import models
+from fastapi_app.notification_counts import effective_is_read
+
+Recipient = aliased(models.User, name="recipient")
+Sender = aliased(models.User, name="sender")
+
+def notification_query(db: Session):
+    """Notifications with their recipient's and sender's details, in a single query"""
+    return db.query(
+        models.Notification,
+        Recipient.id.label("recipient_user_id"),
+        Recipient.first_name.label("recipient_first_name"),
+        Recipient.last_name.label("recipient_last_name"),
+        Recipient.email.label("recipient_email"),
+        Sender.id.label("sender_user_id"),
+        Sender.first_name.label("sender_first_name"),
+        Sender.last_name.label("sender_last_name"),
+        Sender.username.label("sender_username"),
+        Sender.email.label("sender_email"),
+        models.NotificationPayload,
+        models.NotificationUnreadCount.read_through_id,
+    ).outerjoin(
+        Recipient, Recipient.id == models.Notification.user_id
+    ).outerjoin(
+        Sender, Sender.id == models.Notification.sender_id
+    ).outerjoin(
+        models.NotificationPayload, models.NotificationPayload.id == models.Notification.payload_id
+    ).outerjoin(
+        models.NotificationUnreadCount, models.NotificationUnreadCount.user_id == models.Notification.user_id
+    )
+
+def serialize_notification(row) -> dict:
+    notification = row.Notification
+    # Content of fanned-out rows lives in the shared payload
+    content = row.NotificationPayload or notification
+    has_recipient = row.recipient_user_id is not None
+    has_sender = row.sender_user_id is not None
+    return {
+        "id": notification.id,
+        "user_id": notification.user_id,
+        "sender_id": notification.sender_id,
+        "title": content.title,
+        "message": content.message,
+        "type": notification.type or content.type,
+        "priority": notification.priority or content.priority,
+        "action_url": content.action_url,
+        "action_text": content.action_text,
+        "notification_metadata": content.notification_metadata if content.notification_metadata else {},
+        "direction": notification.direction,
+        "is_read": effective_is_read(notification, row.read_through_id),
+        "parent_id": notification.parent_id,
+        "thread_root_id": notification.thread_root_id,
+        "created_at": notification.created_at,
+        # Add recipient details
+        "recipient_id": notification.user_id,
+        "recipient_name": f"{row.recipient_first_name} {row.recipient_last_name}" if has_recipient else "Unknown",
+        "recipient_email": row.recipient_email if has_recipient else "Unknown",
+        # Add sender details
+        "sender_name": f"{row.sender_first_name} {row.sender_last_name}" if has_sender else None,
+        "sender_first_name": row.sender_first_name if has_sender else None,
+        "sender_last_name": row.sender_last_name if has_sender else None,
+        "sender_username": row.sender_username if has_sender else None,
+        "sender_email": row.sender_email if has_sender else None,
+    }
@@ -0,0 +1,253 @@
+"""
+Fan-out of one notification to many recipients.
+
+The content (title, message, action, metadata) is stored once in
+notification_payloads and each recipient gets a thin notifications row
+pointing at it. The rows are written NOTIFICATION_FANOUT_BATCH_SIZE at a
+time with one bulk insert(Notification) each, which SQLAlchemy sends as
+multi-row INSERT ... VALUES batches, instead of one ORM object per recipient.
+
+Fan-outs to NOTIFICATION_FANOUT_DEFER_THRESHOLD recipients or more are
+handed to a background worker so the request returns immediately (0
+disables deferring). The payload row is written in the caller's transaction
+with the recipients still to notify and fanout_status 'pending', and is
+queued only once that transaction commits. The worker writes the thin rows
+and clears the status in one transaction; a fan-out that fails is marked
+'failed' with the error, and pending ones interrupted by a restart are
+queued again at startup (resume_pending). When the worker's queue is full
+the fan-out runs in the committing thread instead.
+"""
+import atexit
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+from fastapi_app import models
+from fastapi_app.database import SessionLocal
+from fastapi_app.notification_counts import add_unread
+from fastapi_app.notification_hub import notification_hub, track_created
+
+NOTIFICATION_FANOUT_BATCH_SIZE = int(os.getenv('NOTIFICATION_FANOUT_BATCH_SIZE', '1000'))
+NOTIFICATION_FANOUT_DEFER_THRESHOLD = int(os.getenv('NOTIFICATION_FANOUT_DEFER_THRESHOLD', '200'))
+NOTIFICATION_FANOUT_QUEUE_SIZE = int(os.getenv('NOTIFICATION_FANOUT_QUEUE_SIZE', '1000'))
+
+# NotificationPayload.fanout_status of deferred fan-outs; None once the rows are written
+FANOUT_PENDING = "pending"
+FANOUT_FAILED = "failed"
+
+_SESSION_KEY = "deferred_fanouts"
+_STOP = object()
+
+def _recipients(recipient_ids: Iterable[int]) -> List[int]:
+    return list(dict.fromkeys(user_id for user_id in recipient_ids if user_id is not None))
+
+def fan_out(
+    db: Session,
+    recipient_ids: Iterable[int],
+    *,
+    sender_id: Optional[int] = None,
+    title: Optional[str] = None,
+    message: Optional[str] = None,
+    type: Optional[str] = None,
+    priority: Optional[str] = None,
+    action_url: Optional[str] = None,
+    action_text: Optional[str] = None,
+    notification_metadata: Optional[Dict[str, Any]] = None,
+    created_at: Optional[datetime] = None,
+) -> int:
+    """
+    Add one payload row and a thin notification per recipient to db's transaction.
+
+    The caller commits. Returns the number of recipients.
+    """
+    recipients = _recipients(recipient_ids)
+    if not recipients:
+        return 0
+    payload = models.NotificationPayload(
+        sender_id=sender_id,
+        title=title,
+        message=message,
+        type=type,
+        priority=priority,
+        action_url=action_url,
+        action_text=action_text,
+        notification_metadata=notification_metadata,
+        recipient_count=len(recipients),
+        created_at=created_at or datetime.now(),
+    )
+    db.add(payload)
+    db.flush()
+    _write_rows(db, payload, recipients)
+    return len(recipients)
+
+def _write_rows(db: Session, payload: models.NotificationPayload, recipients: List[int]):
+    """Thin notification rows pointing at payload, and the recipients' unread counters"""
+    for start in range(0, len(recipients), NOTIFICATION_FANOUT_BATCH_SIZE):
+        db.execute(insert(models.Notification), [
+            {
+                "user_id": user_id,
+                "sender_id": payload.sender_id,
+                "payload_id": payload.id,
+                "type": payload.type,
+                "priority": payload.priority,
+                "direction": models.NotificationDirection.received,
+                "is_read": 0,
+                "created_at": payload.created_at,
+            }
+            for user_id in recipients[start:start + NOTIFICATION_FANOUT_BATCH_SIZE]
+        ])
+    add_unread(db, dict.fromkeys(recipients, 1))
+
+    # Rows written by INSERT statements bypass the flush hook; only look their ids up for live streams
+    if notification_hub.connected(recipients):
+        track_created(db, dict(db.execute(
+            select(models.Notification.id, models.Notification.user_id).where(models.Notification.payload_id == payload.id)
+        ).all()))
+
+class FanoutWorker:
+    """Background thread running deferred fan-outs (pending payload ids), each in its own session and transaction"""
+
+    def __init__(self, max_queue_size: int = NOTIFICATION_FANOUT_QUEUE_SIZE):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.stats = {"deferred": 0, "written": 0, "failed": 0, "ran_inline": 0}
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="notification-fanout", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def submit(self, payload_id: int) -> bool:
+        """Queue a pending fan-out; returns False when the queue is full"""
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        try:
+            self._queue.put_nowait(payload_id)
+        except queue.Full:
+            return False
+        self.stats["deferred"] += 1
+        return True
+
+    def dispatch(self, payload_id: int):
+        """Queue a pending fan-out, or run it in the calling thread when the queue is full"""
+        if not self.submit(payload_id):
+            self.stats["ran_inline"] += 1
+            self.run(payload_id)
+
+    def run(self, payload_id: int):
+        """Write the rows of a pending fan-out, or mark it failed"""
+        db = SessionLocal()
+        try:
+            payload = db.get(models.NotificationPayload, payload_id)
+            if payload is None or payload.fanout_status != FANOUT_PENDING:
+                return
+            recipients = list(payload.pending_recipients or [])
+            # Claim it: another process resuming pending fan-outs may have got here first
+            claimed = db.execute(update(models.NotificationPayload).where(
+                models.NotificationPayload.id == payload_id,
+                models.NotificationPayload.fanout_status == FANOUT_PENDING
+            ).values(fanout_status=None, pending_recipients=None).execution_options(synchronize_session=False)).rowcount
+            if not claimed:
+                db.rollback()
+                return
+            _write_rows(db, payload, recipients)
+            db.commit()
+            self.stats["written"] += len(recipients)
+        except Exception as e:
+            db.rollback()
+            self.stats["failed"] += 1
+            print(f"Error fanning out notification payload {payload_id}: {str(e)}")
+            try:
+                db.execute(update(models.NotificationPayload).where(
+                    models.NotificationPayload.id == payload_id,
+                    models.NotificationPayload.fanout_status == FANOUT_PENDING
+                ).values(fanout_status=FANOUT_FAILED, fanout_error=str(e)[:1000]).execution_options(synchronize_session=False))
+                db.commit()
+            except Exception as mark_error:
+                # Still pending: resume_pending retries it on the next start
+                db.rollback()
+                print(f"Error marking notification payload {payload_id} failed: {str(mark_error)}")
+        finally:
+            db.close()
+
+    def flush(self):
+        """Wait until every queued fan-out is written"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def stop(self, timeout: float = 10.0):
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self.run(item)
+            finally:
+                self._queue.task_done()
+
+# Process-wide worker for deferred fan-outs
+fanout_worker = FanoutWorker()
+
+def notify_users(db: Session, recipient_ids: Iterable[int], **content) -> Dict[str, Any]:
+    """
+    Fan a notification out to recipient_ids, deferring large fan-outs to the worker.
+
+    Both join db's transaction (the caller commits): inline fan-outs write
+    every row, deferred ones the pending payload, which is handed to the
+    worker after the commit. Returns {"recipients": count, "deferred": bool}.
+    """
+    recipients = _recipients(recipient_ids)
+    if not (NOTIFICATION_FANOUT_DEFER_THRESHOLD and len(recipients) >= NOTIFICATION_FANOUT_DEFER_THRESHOLD):
+        return {"recipients": fan_out(db, recipients, **content), "deferred": False}
+    payload = models.NotificationPayload(
+        **content,
+        recipient_count=len(recipients),
+        pending_recipients=recipients,
+        fanout_status=FANOUT_PENDING,
+    )
+    if payload.created_at is None:
+        payload.created_at = datetime.now()
+    db.add(payload)
+    db.flush()
+    db.info.setdefault(_SESSION_KEY, []).append(payload.id)
+    return {"recipients": len(recipients), "deferred": True}
+
+def resume_pending() -> int:
+    """Hand the fan-outs still pending (e.g. interrupted by a restart) to the worker; returns how many"""
+    db = SessionLocal()
+    try:
+        payload_ids = [payload_id for (payload_id,) in db.query(models.NotificationPayload.id).filter(
+            models.NotificationPayload.fanout_status == FANOUT_PENDING
+        ).order_by(models.NotificationPayload.id)]
+    finally:
+        db.close()
+    for payload_id in payload_ids:
+        fanout_worker.dispatch(payload_id)
+    return len(payload_ids)
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_deferred(session):
+    for payload_id in session.info.pop(_SESSION_KEY, ()):
+        try:
+            fanout_worker.dispatch(payload_id)
+        except Exception as e:
+            # Left pending; resume_pending picks it up on the next start
+            print(f"Error queueing notification payload {payload_id}: {str(e)}")
+
+@event.listens_for(Session, "after_rollback")
+def _discard_deferred(session):
+    session.info.pop(_SESSION_KEY, None)
@@ -0,0 +1,175 @@
+"""
+In-process pub/sub of newly created notifications, feeding /notifications/stream.
+
+Every Notification row inserted through an ORM session is collected at flush
+time and published to its recipient's subscribers once the session commits
+(rolled back inserts are discarded), so create_notification and any later
+writer publish without extra code; bulk inserts (notification_fanout.py)
+register their rows with track_created. The published event is the
+NotificationRead payload, loaded for the whole commit with one joined
+query, and only when a recipient is connected.
+
+Each subscription holds at most NOTIFICATION_STREAM_QUEUE_SIZE undelivered
+events. A client that falls further behind is sent a "resync" event and
+disconnected instead of buffering without bound; it reconnects with
+Last-Event-ID and the missed notifications are replayed from the database.
+
+The hub lives in one process: with several API workers a stream only sees
+notifications created by its own worker until it reconnects, so run the
+stream behind sticky sessions or a single worker.
+"""
+import asyncio
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from fastapi_app import models, schemas
+from fastapi_app.notification_details import notification_query, serialize_notification
+
+# Undelivered events per subscription before the client is told to resync
+NOTIFICATION_STREAM_QUEUE_SIZE = int(os.getenv('NOTIFICATION_STREAM_QUEUE_SIZE', '100'))
+
+_SESSION_KEY = "created_notifications"
+
+# Queued in place of further events once a subscription overflowed
+OVERFLOW = object()
+
+class Subscription:
+    """One connected stream; events are delivered on the event loop that created it"""
+
+    def __init__(self, hub: "NotificationHub", user_id: int, max_pending: int):
+        self.hub = hub
+        self.user_id = user_id
+        self.max_pending = max_pending
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.overflowed = False
+
+    def _offer(self, payload):
+        # Runs on self.loop
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.max_pending:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+            return
+        self.queue.put_nowait(payload)
+
+    async def next_event(self, timeout: float):
+        """The next event, OVERFLOW, or None when nothing arrived within timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+class NotificationHub:
+    """Thread-safe registry of stream subscriptions keyed by recipient user id"""
+
+    def __init__(self, max_pending: int = NOTIFICATION_STREAM_QUEUE_SIZE):
+        self.max_pending = max_pending
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.overflows = 0
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Register a stream for user_id; call from the coroutine that will consume it"""
+        subscription = Subscription(self, user_id, self.max_pending)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+        if subscription.overflowed:
+            self.overflows += 1
+
+    def connected(self, user_ids: Iterable[int]) -> Set[int]:
+        """The user ids among user_ids with at least one open stream"""
+        with self._lock:
+            return {user_id for user_id in user_ids if user_id in self._subscriptions}
+
+    def publish(self, user_id: int, payload: dict):
+        """Queue payload on every stream of user_id; safe to call from any thread"""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._offer, payload)
+            except RuntimeError:
+                # The stream's event loop is gone
+                self.unsubscribe(subscription)
+        self.published += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._subscriptions),
+                "streams": sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+                "published": self.published,
+                "overflows": self.overflows,
+                "max_pending": self.max_pending,
+            }
+
+# Process-wide hub used by the session hooks below and /notifications/stream
+notification_hub = NotificationHub()
+
+def notification_events(db: Session, notification_ids: List[int]) -> List[dict]:
+    """JSON-ready NotificationRead payloads of notification_ids, in id order, from one query"""
+    rows = notification_query(db).filter(
+        models.Notification.id.in_(notification_ids)
+    ).order_by(models.Notification.id).all()
+    return [jsonable_encoder(schemas.NotificationRead(**serialize_notification(row))) for row in rows]
+
+def publish_created(created: Dict[int, int], hub: Optional[NotificationHub] = None):
+    """Publish committed notifications ({notification id: recipient id}) to connected recipients"""
+    hub = hub or notification_hub
+    recipients = hub.connected(set(created.values()))
+    if not recipients:
+        return
+    from fastapi_app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        payloads = notification_events(db, [nid for nid, user_id in created.items() if user_id in recipients])
+    finally:
+        db.close()
+    for payload in payloads:
+        hub.publish(payload["user_id"], payload)
+
+def track_created(session: Session, created: Dict[int, int]):
+    """Publish notifications inserted without the unit of work ({id: recipient id}) when session commits"""
+    session.info.setdefault(_SESSION_KEY, {}).update(created)
+
+@event.listens_for(Session, "after_flush")
+def _collect_created(session, flush_context):
+    created = {
+        instance.id: instance.user_id for instance in session.new
+        if isinstance(instance, models.Notification) and instance.user_id is not None
+    }
+    if created:
+        track_created(session, created)
+
+@event.listens_for(Session, "after_commit")
+def _publish_created(session):
+    created = session.info.pop(_SESSION_KEY, None)
+    if created:
+        try:
+            publish_created(created)
+        except Exception as e:
+            print(f"Error publishing notifications: {str(e)}")
+
+@event.listens_for(Session, "after_rollback")
+def _discard_created(session):
+    session.info.pop(_SESSION_KEY, None)
@@ -0,0 +1,105 @@
+"""
+Reply chains of notifications.
+
+Every reply stores thread_root_id, the first notification of its chain
+(copied from its parent when the reply is created), so a whole conversation
+is one indexed range on (thread_root_id, created_at, id) instead of one
+parent_id lookup per level. The root itself keeps thread_root_id NULL and is
+matched by its id.
+"""
+from typing import Dict, List, Optional
+from sqlalchemy import and_, bindparam, func, or_, select, update
+from sqlalchemy.orm import Session
+from fastapi_app import models
+
+def root_of(parent: models.Notification) -> int:
+    """thread_root_id of a reply to parent"""
+    return parent.thread_root_id or parent.id
+
+def in_thread(root_id: int):
+    """Filter matching the root notification and every reply under it"""
+    return or_(models.Notification.id == root_id, models.Notification.thread_root_id == root_id)
+
+def after(created_at, last_id: int):
+    """Rows strictly after (created_at, last_id) in ORDER BY created_at, id (NULLs first)"""
+    column = models.Notification.created_at
+    id_column = models.Notification.id
+    if created_at is None:
+        return or_(and_(column.is_(None), id_column > last_id), column.isnot(None))
+    return or_(column > created_at, and_(column == created_at, id_column > last_id))
+
+def find_root(db: Session, notification_id: int) -> Optional[int]:
+    """Root of the thread notification_id belongs to, None when it doesn't exist"""
+    row = db.query(models.Notification.id, models.Notification.thread_root_id).filter(
+        models.Notification.id == notification_id
+    ).first()
+    if row is None:
+        return None
+    return row.thread_root_id or row.id
+
+def is_participant(db: Session, root_id: int, user_id: int) -> bool:
+    """Whether user_id sent or received any notification of the thread"""
+    return db.query(
+        select(models.Notification.id).where(
+            in_thread(root_id),
+            or_(models.Notification.user_id == user_id, models.Notification.sender_id == user_id)
+        ).exists()
+    ).scalar()
+
+def sender_summaries(db: Session, root_id: int) -> List[dict]:
+    """Per sender of the thread: name, message count and last message time, first sender first"""
+    rows = db.query(
+        models.Notification.sender_id,
+        models.User.first_name,
+        models.User.last_name,
+        models.User.username,
+        models.User.email,
+        func.count(models.Notification.id).label("messages"),
+        func.min(models.Notification.id).label("first_id"),
+        func.max(models.Notification.created_at).label("last_sent_at"),
+    ).outerjoin(
+        models.User, models.User.id == models.Notification.sender_id
+    ).filter(in_thread(root_id)).group_by(
+        models.Notification.sender_id,
+        models.User.first_name,
+        models.User.last_name,
+        models.User.username,
+        models.User.email,
+    ).all()
+    return [
+        {
+            "sender_id": row.sender_id,
+            "sender_name": f"{row.first_name} {row.last_name}" if row.username is not None else None,
+            "sender_username": row.username,
+            "sender_email": row.email,
+            "messages": row.messages,
+            "last_sent_at": row.last_sent_at,
+        }
+        for row in sorted(rows, key=lambda row: row.first_id)
+    ]
+
+def backfill(connection):
+    """Set thread_root_id on replies that predate it, walking parent_id in memory"""
+    missing = connection.execute(select(models.Notification.id).where(
+        models.Notification.parent_id.isnot(None),
+        models.Notification.thread_root_id.is_(None)
+    ).limit(1)).first()
+    if missing is None:
+        return
+    parents: Dict[int, int] = dict(connection.execute(select(
+        models.Notification.id, models.Notification.parent_id
+    ).where(models.Notification.parent_id.isnot(None))).all())
+
+    roots = {}
+    for notification_id in parents:
+        root, seen = notification_id, set()
+        while root in parents and root not in seen:
+            seen.add(root)
+            root = parents[root]
+        roots[notification_id] = root
+
+    table = models.Notification.__table__
+    connection.execute(
+        update(table).where(table.c.id == bindparam("row_id"), table.c.thread_root_id.is_(None)),
+        [{"row_id": notification_id, "thread_root_id": root} for notification_id, root in roots.items()]
+    )
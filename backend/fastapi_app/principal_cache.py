@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Optional
+from fastapi_app.access_policy import AccessPolicy
+
+# Tunables for the principal cache (seconds / number of entries)
+PRINCIPAL_CACHE_TTL = float(os.getenv('PRINCIPAL_CACHE_TTL', '60'))
+PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', '1024'))
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """
+    Detached, read-only copy of a users row.
+
+    Exposes the same attributes route handlers read from models.User so it can
+    be returned by get_current_user without keeping a session open. policy is
+    the user's compiled AccessPolicy, cached for as long as the snapshot is.
+    """
+    id: int
+    username: str
+    email: str
+    first_name: str
+    last_name: str
+    role: Any
+    status: Any
+    department: Optional[str] = None
+    position: Optional[str] = None
+    phone: Optional[str] = None
+    location: Optional[str] = None
+    permissions: Any = None
+    asset_access: Any = None
+    notes: Optional[str] = None
+    created_at: Optional[datetime] = None
+    policy: Optional[AccessPolicy] = field(default=None, compare=False, repr=False)
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        def _copy(value):
+            # Lists coming from JSON columns are copied so callers can't share state
+            return list(value) if isinstance(value, list) else value
+
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            role=user.role,
+            status=user.status,
+            department=user.department,
+            position=user.position,
+            phone=user.phone,
+            location=user.location,
+            permissions=_copy(user.permissions),
+            asset_access=_copy(user.asset_access),
+            notes=user.notes,
+            created_at=user.created_at,
+            policy=AccessPolicy.compile(user),
+        )
+
+class PrincipalCache:
+    """Thread-safe LRU cache of user snapshots keyed by token subject, with a TTL per entry"""
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.enabled = ttl > 0 and max_size > 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> Optional[UserSnapshot]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                self.misses += 1
+                return None
+            snapshot, expires_at = entry
+            if expires_at <= now:
+                del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return snapshot
+
+    def put(self, username: str, snapshot: UserSnapshot):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[username] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, username: str, loader: Callable[[str], Any]) -> Optional[UserSnapshot]:
+        """
+        Return the cached snapshot for username, calling loader(username) on a miss.
+
+        loader must return a models.User (or None); only found users are cached.
+        """
+        snapshot = self.get(username)
+        if snapshot is not None:
+            return snapshot
+        user = loader(username)
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        self.put(username, snapshot)
+        return snapshot
+
+    def invalidate(self, user_id: Optional[int] = None, username: Optional[str] = None):
+        """Drop cached entries for a user, matched by id and/or username"""
+        with self._lock:
+            if username is not None:
+                self._entries.pop(username, None)
+            if user_id is not None:
+                stale = [key for key, (snapshot, _) in self._entries.items() if snapshot.id == user_id]
+                for key in stale:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+# Process-wide cache used by auth.get_current_user
+principal_cache = PrincipalCache()
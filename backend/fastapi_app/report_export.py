@@ -0,0 +1,112 @@
+"""
+SQL-side aggregates and streaming exports for the /reports endpoints.
+
+Report rows are selected as plain columns (no ORM objects). With
+?format=csv or ?format=ndjson the rows are streamed from a server-side cursor
+in chunks of REPORT_EXPORT_CHUNK_SIZE, so memory use does not grow with the
+table. Totals and breakdowns are only part of the default JSON response.
+"""
+import csv
+import enum
+import io
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterator, Optional
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from fastapi_app.database import SessionLocal
+
+REPORT_EXPORT_CHUNK_SIZE = int(os.getenv('REPORT_EXPORT_CHUNK_SIZE', '1000'))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+def check_format(export_format: Optional[str]) -> Optional[str]:
+    """None for the JSON report, otherwise a validated export format"""
+    if export_format is None or export_format == "json":
+        return None
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{export_format}', use csv or ndjson")
+    return export_format
+
+def plain(value: Any) -> Any:
+    """Column value as a JSON / CSV friendly scalar"""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def rows(db: Session, stmt) -> list:
+    """All rows of stmt as dicts of plain values"""
+    return [{key: plain(value) for key, value in row.items()} for row in db.execute(stmt).mappings()]
+
+def totals(db: Session, amount, *filters) -> Dict[str, float]:
+    """{"count", "total", "average"} of amount over the filtered rows"""
+    count, total = db.execute(
+        select(func.count(), func.sum(amount)).select_from(amount.table).where(*filters)
+    ).one()
+    total = float(total or 0)
+    return {"count": count, "total": total, "average": total / count if count else 0}
+
+def count(db: Session, column, *filters) -> int:
+    return db.execute(select(func.count()).select_from(column.table).where(*filters)).scalar() or 0
+
+def breakdown(db: Session, column, *filters, missing: str = "unknown") -> Dict[str, int]:
+    """Row count per value of column, NULLs reported under missing"""
+    result = {}
+    for value, value_count in db.execute(select(column, func.count()).where(*filters).group_by(column)):
+        key = plain(value) or missing
+        result[key] = result.get(key, 0) + value_count
+    return result
+
+def _encode_csv(chunk, fieldnames, header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(fieldnames)
+    for row in chunk:
+        writer.writerow(["" if value is None else plain(value) for value in row])
+    return buffer.getvalue()
+
+def _encode_ndjson(chunk, fieldnames) -> str:
+    return "".join(
+        json.dumps({key: plain(value) for key, value in zip(fieldnames, row)}, default=str) + "\n"
+        for row in chunk
+    )
+
+def _stream(stmt, export_format: str, chunk_size: int) -> Iterator[str]:
+    # The request session may be closed before the body is sent, so the cursor gets its own
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=chunk_size))
+        fieldnames = list(result.keys())
+        header = True
+        for chunk in result.partitions():
+            if export_format == "csv":
+                yield _encode_csv(chunk, fieldnames, header)
+                header = False
+            else:
+                yield _encode_ndjson(chunk, fieldnames)
+        if header and export_format == "csv":
+            yield _encode_csv([], fieldnames, True)
+    finally:
+        db.close()
+
+def stream_export(stmt, export_format: str, name: str,
+                  chunk_size: int = REPORT_EXPORT_CHUNK_SIZE) -> StreamingResponse:
+    """Stream the rows of a column select as CSV or JSON Lines"""
+    extension = "csv" if export_format == "csv" else "ndjson"
+    return StreamingResponse(
+        _stream(stmt, export_format, chunk_size),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}_report.{extension}"'}
+    )
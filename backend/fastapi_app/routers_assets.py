@@ -1,84 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Body
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Body, Query
+from sqlalchemy import exists
 from sqlalchemy.orm import Session
-from typing import List
-from . import crud, schemas, models, deps
+from typing import List, Optional
+from . import crud, schemas, models, deps, asset_import
+from .access_policy import AccessPolicy, policy_of
 from .auth import get_current_user
+from .notification_fanout import notify_users
 import os
 
 router = APIRouter(prefix="/assets", tags=["assets"])
 
+def _check_location_access(policy: AccessPolicy, location, detail: str):
+    """Raise 403 unless the user has asset access to location"""
+    if policy.can_access_location(location):
+        return
+    if not policy.has_locations:
+        raise HTTPException(status_code=403, detail="No asset access configured")
+    raise HTTPException(status_code=403, detail=detail)
+
+def _check_can_manage(policy: AccessPolicy, action: str):
+    """Raise 403 unless the user may create, edit or delete assets"""
+    if policy.assets_view_only:
+        raise HTTPException(
+            status_code=403, 
+            detail=f"Auction and disposal managers can only view assets, not {action} them"
+        )
+    if not policy.can_manage_assets:
+        raise HTTPException(
+            status_code=403, 
+            detail=f"You don't have permission to {action} assets"
+        )
+
 @router.get("/", response_model=List[schemas.AssetRead])
 def read_assets(skip: int = 0, limit: int = 100, db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
     """Get assets with location-based filtering for non-admin users"""
     
-    print(f"User role: {current_user.role}, User asset_access: {current_user.asset_access}")
-    
-    # Admin users can see all assets
-    if current_user.role == 'admin':
-        assets = crud.get_assets(db, skip=skip, limit=limit)
-        print(f"Admin - returning {len(assets)} assets")
-        if assets:
-            print(f"Sample asset: {assets[0].__dict__}")
-        return assets
+    print(f"User role: {current_user.role}")
     
-    # For maintenance managers, only show assets from their assigned locations
-    if current_user.role == 'maintenance_manager' or (current_user.permissions and 'maintenance' in current_user.permissions):
-        if current_user.asset_access:
-            # Parse asset_access if it's a JSON string
-            if isinstance(current_user.asset_access, str):
-                import json
-                try:
-                    asset_access = json.loads(current_user.asset_access)
-                except:
-                    asset_access = [current_user.asset_access]
-            else:
-                asset_access = current_user.asset_access
-            
-            print(f"Maintenance manager asset_access: {asset_access}")
-            
-            # Filter assets by location only - no maintenance records from other locations
-            assets = db.query(models.Asset).filter(
-                models.Asset.location.in_(asset_access)
-            ).offset(skip).limit(limit).all()
-            
-            print(f"Maintenance manager - returning {len(assets)} assets from assigned locations")
-            if assets:
-                print(f"Sample asset: {assets[0].__dict__}")
-            
-            return assets
-        else:
-            # If no asset_access, return empty list
-            print("Maintenance manager has no asset_access - returning empty list")
-            return []
-    
-    # For other non-admin users, filter by their asset access locations
-    if current_user.asset_access:
-        # Parse asset_access if it's a JSON string
-        if isinstance(current_user.asset_access, str):
-            import json
-            try:
-                asset_access = json.loads(current_user.asset_access)
-            except:
-                asset_access = [current_user.asset_access]
-        else:
-            asset_access = current_user.asset_access
-        
-        print(f"Other user asset_access: {asset_access}")
-        
-        # Filter assets by location
-        assets = db.query(models.Asset).filter(
-            models.Asset.location.in_(asset_access)
-        ).offset(skip).limit(limit).all()
-        
-        print(f"Other user - returning {len(assets)} assets")
-        if assets:
-            print(f"Sample asset: {assets[0].__dict__}")
-        
-        return assets
-    
-    # If no asset access is set, return empty list for non-admin users
-    print("No asset access - returning empty list")
-    return []
+    # Admin users see all assets; everyone else (maintenance managers included) only sees assets
+    # from their assigned locations, and users without asset access get an empty list
+    policy = policy_of(current_user)
+    assets = db.query(models.Asset).filter(policy.visible_assets()).offset(skip).limit(limit).all()
+    print(f"Returning {len(assets)} assets")
+    return assets
 
 @router.get("/{asset_id}", response_model=schemas.AssetRead)
 def read_asset(asset_id: int, db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
@@ -86,126 +50,83 @@ def read_asset(asset_id: int, db: Session = Depends(deps.get_db), current_user:
     if db_asset is None:
         raise HTTPException(status_code=404, detail="Asset not found")
     
-    # Admin users can access any asset
-    if current_user.role == 'admin':
+    policy = policy_of(current_user)
+    if policy.can_access_location(db_asset.location):
         return db_asset
     
-    # For maintenance managers, check if they have any maintenance records for this asset
-    if current_user.role == 'maintenance_manager' or (current_user.permissions and 'maintenance' in current_user.permissions):
-        # Check if there are any maintenance records for this asset
-        maintenance_records = db.query(models.Maintenance).filter(
-            models.Maintenance.asset_id == asset_id
-        ).all()
-        
-        if maintenance_records:
-            # If there are maintenance records for this asset, allow access
-            return db_asset
-    
-    # For non-admin users, check if they have access to this asset's location
-    if current_user.asset_access:
-        # Parse asset_access if it's a JSON string
-        if isinstance(current_user.asset_access, str):
-            import json
-            try:
-                asset_access = json.loads(current_user.asset_access)
-            except:
-                asset_access = [current_user.asset_access]
-        else:
-            asset_access = current_user.asset_access
-        
-        # Check if user has access to this asset's location
-        if db_asset.location in asset_access:
-            return db_asset
-        else:
-            raise HTTPException(status_code=403, detail="Access denied to this asset")
+    # Maintenance managers can also see assets outside their locations that have maintenance records
+    if policy.maintains_assets and db.query(exists().where(models.Maintenance.asset_id == asset_id)).scalar():
+        return db_asset
     
-    # If no asset access is set, deny access for non-admin users
-    raise HTTPException(status_code=403, detail="No asset access configured")
+    _check_location_access(policy, db_asset.location, "Access denied to this asset")
+    return db_asset
 
 @router.post("/", response_model=schemas.AssetRead, status_code=status.HTTP_201_CREATED)
 def create_asset(asset: schemas.AssetCreate, db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
-    # Check if user can manage assets
-    if current_user.role in ['auction_manager', 'disposal_manager']:
-        raise HTTPException(
-            status_code=403, 
-            detail="Auction and disposal managers can only view assets, not create them"
-        )
+    policy = policy_of(current_user)
+    _check_can_manage(policy, "create")
     
-    # Check if user has assets permission or is a maintenance manager
-    if current_user.role != 'admin':
-        has_assets_permission = current_user.permissions and 'assets' in current_user.permissions
-        is_maintenance_manager = current_user.role == 'maintenance_manager' or (current_user.permissions and 'maintenance' in current_user.permissions)
-        
-        if not has_assets_permission and not is_maintenance_manager:
-            raise HTTPException(
-                status_code=403, 
-                detail="You don't have permission to create assets"
-            )
-    
-    # Check location-based access for non-admin users
-    if current_user.role != 'admin':
-        if current_user.asset_access:
-            # Parse asset_access if it's a JSON string
-            if isinstance(current_user.asset_access, str):
-                import json
-                try:
-                    asset_access = json.loads(current_user.asset_access)
-                except:
-                    asset_access = [current_user.asset_access]
-            else:
-                asset_access = current_user.asset_access
-            
-            # Check if user has access to create assets in this location
-            if asset.location not in asset_access:
-                raise HTTPException(status_code=403, detail="Access denied to create assets in this location")
-        else:
-            raise HTTPException(status_code=403, detail="No asset access configured")
+    _check_location_access(policy, asset.location, "Access denied to create assets in this location")
     
     return crud.create_asset(db, asset)
 
+@router.post("/import", response_model=schemas.AssetImportJobRead, status_code=status.HTTP_202_ACCEPTED)
+def import_assets(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv, xlsx or ndjson (default: from the file name)"),
+    batch_size: int = Query(asset_import.ASSET_IMPORT_BATCH_SIZE, ge=1, le=asset_import.ASSET_IMPORT_BATCH_SIZE_MAX),
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Queue a bulk import of assets; poll GET /assets/import/{job_id} for progress.
+
+    The first row (CSV, XLSX) holds AssetCreate field names; NDJSON has one
+    object per line. Rows are inserted batch_size at a time, rows that fail
+    validation, location access or barcode / qrcode uniqueness are reported
+    with their row number and skipped.
+    """
+    policy = policy_of(current_user)
+    _check_can_manage(policy, "create")
+    if not policy.is_admin and not policy.has_locations:
+        raise HTTPException(status_code=403, detail="No asset access configured")
+    
+    file_format = asset_import.detect_format(file.filename, file.content_type, format)
+    if file_format is None:
+        raise HTTPException(status_code=400, detail=f"Unsupported import format; use one of {', '.join(asset_import.IMPORT_FORMATS)}")
+    if file_format == "xlsx" and asset_import.openpyxl is None:
+        raise HTTPException(status_code=501, detail="XLSX imports require the openpyxl package")
+    
+    path = asset_import.save_upload(file.file)
+    job = asset_import.new_job(db, current_user.id, file.filename, file_format, batch_size)
+    if not asset_import.import_worker.submit(job.id, path, policy):
+        os.remove(path)
+        db.delete(job)
+        db.commit()
+        raise HTTPException(status_code=503, detail="Too many imports queued; try again later")
+    return asset_import.job_report(job)
+
+@router.get("/import/{job_id}", response_model=schemas.AssetImportJobRead)
+def get_import_job(job_id: str, db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
+    """Progress of an import and the rows it rejected"""
+    job = db.get(models.AssetImportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if current_user.role != "admin" and job.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this import")
+    return asset_import.job_report(job)
+
 @router.put("/{asset_id}", response_model=schemas.AssetRead)
 def update_asset(asset_id: int, asset: schemas.AssetCreate, db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
-    # Check if user can manage assets
-    if current_user.role in ['auction_manager', 'disposal_manager']:
-        raise HTTPException(
-            status_code=403, 
-            detail="Auction and disposal managers can only view assets, not edit them"
-        )
-    
-    # Check if user has assets permission or is a maintenance manager
-    if current_user.role != 'admin':
-        has_assets_permission = current_user.permissions and 'assets' in current_user.permissions
-        is_maintenance_manager = current_user.role == 'maintenance_manager' or (current_user.permissions and 'maintenance' in current_user.permissions)
-        
-        if not has_assets_permission and not is_maintenance_manager:
-            raise HTTPException(
-                status_code=403, 
-                detail="You don't have permission to edit assets"
-            )
+    policy = policy_of(current_user)
+    _check_can_manage(policy, "edit")
     
     # Get the existing asset to check location access
     existing_asset = crud.get_asset(db, asset_id)
     if existing_asset is None:
         raise HTTPException(status_code=404, detail="Asset not found")
     
-    # Check location-based access for non-admin users
-    if current_user.role != 'admin':
-        if current_user.asset_access:
-            # Parse asset_access if it's a JSON string
-            if isinstance(current_user.asset_access, str):
-                import json
-                try:
-                    asset_access = json.loads(current_user.asset_access)
-                except:
-                    asset_access = [current_user.asset_access]
-            else:
-                asset_access = current_user.asset_access
-            
-            # Check if user has access to this asset's location
-            if existing_asset.location not in asset_access:
-                raise HTTPException(status_code=403, detail="Access denied to this asset location")
-        else:
-            raise HTTPException(status_code=403, detail="No asset access configured")
+    _check_location_access(policy, existing_asset.location, "Access denied to this asset location")
     
     db_asset = crud.update_asset(db, asset_id, asset)
     if db_asset is None:
@@ -214,47 +135,15 @@ def update_asset(asset_id: int, asset: schemas.AssetCreate, db: Session = Depend
 
 @router.delete("/{asset_id}", response_model=schemas.AssetRead)
 def delete_asset(asset_id: int, db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
-    # Check if user can manage assets
-    if current_user.role in ['auction_manager', 'disposal_manager']:
-        raise HTTPException(
-            status_code=403, 
-            detail="Auction and disposal managers can only view assets, not delete them"
-        )
-    
-    # Check if user has assets permission or is a maintenance manager
-    if current_user.role != 'admin':
-        has_assets_permission = current_user.permissions and 'assets' in current_user.permissions
-        is_maintenance_manager = current_user.role == 'maintenance_manager' or (current_user.permissions and 'maintenance' in current_user.permissions)
-        
-        if not has_assets_permission and not is_maintenance_manager:
-            raise HTTPException(
-                status_code=403, 
-                detail="You don't have permission to delete assets"
-            )
+    policy = policy_of(current_user)
+    _check_can_manage(policy, "delete")
     
     # Get the existing asset to check location access
     existing_asset = crud.get_asset(db, asset_id)
     if existing_asset is None:
         raise HTTPException(status_code=404, detail="Asset not found")
     
-    # Check location-based access for non-admin users
-    if current_user.role != 'admin':
-        if current_user.asset_access:
-            # Parse asset_access if it's a JSON string
-            if isinstance(current_user.asset_access, str):
-                import json
-                try:
-                    asset_access = json.loads(current_user.asset_access)
-                except:
-                    asset_access = [current_user.asset_access]
-            else:
-                asset_access = current_user.asset_access
-            
-            # Check if user has access to this asset's location
-            if existing_asset.location not in asset_access:
-                raise HTTPException(status_code=403, detail="Access denied to this asset location")
-        else:
-            raise HTTPException(status_code=403, detail="No asset access configured")
+    _check_location_access(policy, existing_asset.location, "Access denied to this asset location")
     
     db_asset = crud.delete_asset(db, asset_id)
     if db_asset is None:
@@ -280,20 +169,17 @@ def file_asset_complaint(
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    # Notify all admin users
-    admin_users = db.query(models.User).filter(models.User.role == 'admin').all()
-    asset = db.query(models.Asset).filter(models.Asset.id == asset_id).first()
-    asset_name = asset.name if asset else f"Asset {asset_id}"
-    for admin in admin_users:
-        notification = models.Notification(
-            user_id=admin.id,
-            sender_id=current_user.id,
-            title=f"Asset Complaint: {asset_name}",
-            message=f"Complaint Type: {complaint_type}\nDescription: {description}",
-            type="complaint",
-            priority="high",
-            is_read=0
-        )
-        db.add(notification)
+    # Notify all admin users: one shared payload, a thin row per admin
+    admin_ids = [user_id for (user_id,) in db.query(models.User.id).filter(models.User.role == 'admin')]
+    asset_name = db.query(models.Asset.name).filter(models.Asset.id == asset_id).scalar() or f"Asset {asset_id}"
+    notify_users(
+        db,
+        admin_ids,
+        sender_id=current_user.id,
+        title=f"Asset Complaint: {asset_name}",
+        message=f"Complaint Type: {complaint_type}\nDescription: {description}",
+        type="complaint",
+        priority="high"
+    )
     db.commit()
     return {"message": "Complaint submitted and admin notified"} 
\ No newline at end of file
@@ -3,11 +3,149 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_, desc, asc
 from typing import List, Optional
 from datetime import datetime, timedelta
+import base64
+import json
 from fastapi_app import models, schemas, deps
 from fastapi_app.auth import get_current_user
+from fastapi_app.audit_search import apply_search
+from fastapi_app.audit_archive import query_archived, merge_records
+from fastapi_app import audit_rollups
 
 router = APIRouter(prefix="/audit", tags=["audit"])
 
+# Upper bound for count="approximate": counting stops after this many rows
+APPROXIMATE_COUNT_CAP = 10000
+
+def serialize_audit_record(record) -> dict:
+    return {
+        "id": record.id,
+        "user_id": record.user_id,
+        "username": record.username,
+        "user_email": record.user_email,
+        "full_name": record.full_name,
+        "action": record.action,
+        "table_name": record.table_name,
+        "record_id": record.record_id,
+        "old_values": record.old_values,
+        "new_values": record.new_values,
+        "ip_address": record.ip_address,
+        "user_agent": record.user_agent,
+        "session_id": record.session_id,
+        "request_method": record.request_method,
+        "request_url": record.request_url,
+        "request_headers": record.request_headers,
+        "response_status": record.response_status,
+        "execution_time": record.execution_time,
+        "error_message": record.error_message,
+        "additional_data": record.additional_data,
+        "timestamp": record.timestamp.isoformat() if record.timestamp else None
+    }
+
+def encode_cursor(sort_by: str, sort_order: str, record) -> str:
+    """Opaque cursor pointing just past record in the given ordering"""
+    value = getattr(record, sort_by)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = {"s": sort_by, "o": sort_order, "v": value, "id": record.id}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, last_id = payload["v"], int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if payload.get("s") != sort_by or payload.get("o") != sort_order:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort_by/sort_order")
+    if sort_by == "timestamp" and value is not None:
+        value = datetime.fromisoformat(value)
+    return value, last_id
+
+def keyset_filter(sort_by: str, sort_order: str, value, last_id: int):
+    """
+    Rows strictly after (value, last_id) in ORDER BY sort_by, id.
+
+    NULLs sort as the smallest value (MySQL and SQLite both do this), so they
+    come last in descending order and first in ascending order.
+    """
+    column = getattr(models.AuditTrail, sort_by)
+    id_column = models.AuditTrail.id
+    if sort_order == "desc":
+        if value is None:
+            return and_(column.is_(None), id_column < last_id)
+        return or_(column < value, and_(column == value, id_column < last_id), column.is_(None))
+    if value is None:
+        return or_(and_(column.is_(None), id_column > last_id), column.isnot(None))
+    return or_(column > value, and_(column == value, id_column > last_id))
+
+def apply_audit_filters(
+    query,
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    table_name: Optional[str] = None,
+    record_id: Optional[int] = None,
+    ip_address: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    search: Optional[str] = None
+):
+    """
+    Apply the /audit/ filter parameters to a query over AuditTrail.
+
+    Returns (query, relevance); relevance orders search hits best-first and is
+    None when there is no search term or the search fell back to ilike.
+    """
+    if user_id:
+        query = query.filter(models.AuditTrail.user_id == user_id)
+    
+    if action:
+        query = query.filter(models.AuditTrail.action.ilike(f"%{action}%"))
+    
+    if table_name:
+        query = query.filter(models.AuditTrail.table_name.ilike(f"%{table_name}%"))
+    
+    if record_id:
+        query = query.filter(models.AuditTrail.record_id == record_id)
+    
+    if ip_address:
+        query = query.filter(models.AuditTrail.ip_address.ilike(f"%{ip_address}%"))
+    
+    # Date range filter
+    if start_date:
+        try:
+            start_datetime = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+            query = query.filter(models.AuditTrail.timestamp >= start_datetime)
+        except ValueError:
+            pass
+    
+    if end_date:
+        try:
+            end_datetime = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+            query = query.filter(models.AuditTrail.timestamp <= end_datetime)
+        except ValueError:
+            pass
+    
+    # Search across multiple fields through the full-text index
+    relevance = None
+    if search:
+        query, relevance = apply_search(query, search)
+    
+    return query, relevance
+
+def count_audit_records(query, mode: str):
+    """Return (total, is_estimate) for count mode exact | approximate | none"""
+    if mode == "none":
+        return None, False
+    if mode == "approximate":
+        # Count at most APPROXIMATE_COUNT_CAP matching rows instead of the whole set
+        capped = query.with_entities(models.AuditTrail.id).limit(APPROXIMATE_COUNT_CAP + 1).subquery()
+        total = query.session.query(func.count()).select_from(capped).scalar()
+        if total > APPROXIMATE_COUNT_CAP:
+            return APPROXIMATE_COUNT_CAP, True
+        return total, False
+    return query.order_by(None).count(), False
+
 @router.get("/")
 def get_audit_trail(
     skip: int = Query(0, ge=0),
@@ -20,107 +158,135 @@ def get_audit_trail(
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
-    sort_by: str = Query("timestamp", regex="^(timestamp|user_id|action|table_name|ip_address)$"),
+    sort_by: str = Query("timestamp", regex="^(timestamp|user_id|action|table_name|ip_address|relevance)$"),
     sort_order: str = Query("desc", regex="^(asc|desc)$"),
+    pagination: str = Query("offset", regex="^(offset|cursor)$"),
+    cursor: Optional[str] = Query(None),
+    count: Optional[str] = Query(None, regex="^(exact|approximate|none)$"),
+    include_archived: bool = Query(False),
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Get comprehensive audit trail with filtering and search"""
+    """
+    Get comprehensive audit trail with filtering and search
+
+    pagination=cursor switches to keyset paging on (sort_by, id): pass the
+    returned next_cursor back as cursor to fetch the following page. The total
+    is then skipped unless count is given; count=approximate stops counting at
+    a fixed cap.
+
+    search is served by the full-text index; sort_by=relevance returns the best
+    matches first (offset pagination only). SQLite matches substrings like the
+    original ilike search, MySQL's FULLTEXT index matches word prefixes (see
+    audit_search.py).
+
+    include_archived=true also searches months moved out of audit_trail by the
+    retention job (offset pagination only); those records carry "archived": true.
+    """
     
     try:
         # Build query
-        query = db.query(models.AuditTrail)
-        
-        # Apply filters
-        if user_id:
-            query = query.filter(models.AuditTrail.user_id == user_id)
+        query, relevance = apply_audit_filters(
+            db.query(models.AuditTrail),
+            user_id=user_id,
+            action=action,
+            table_name=table_name,
+            record_id=record_id,
+            ip_address=ip_address,
+            start_date=start_date,
+            end_date=end_date,
+            search=search
+        )
         
-        if action:
-            query = query.filter(models.AuditTrail.action.ilike(f"%{action}%"))
+        use_cursor = pagination == "cursor" or cursor is not None
+        if include_archived and (use_cursor or sort_by == "relevance"):
+            raise HTTPException(status_code=400, detail="include_archived supports offset pagination without relevance sorting only")
+        if sort_by == "relevance":
+            if use_cursor:
+                raise HTTPException(status_code=400, detail="sort_by=relevance does not support cursor pagination")
+            if relevance is None:
+                # No index-backed search term: fall back to the default ordering
+                sort_by, sort_order = "timestamp", "desc"
+        if count is None:
+            count = "none" if use_cursor else "exact"
+        total, total_is_estimate = count_audit_records(query, count)
         
-        if table_name:
-            query = query.filter(models.AuditTrail.table_name.ilike(f"%{table_name}%"))
+        order = desc if sort_order == "desc" else asc
         
-        if record_id:
-            query = query.filter(models.AuditTrail.record_id == record_id)
+        if use_cursor:
+            # Keyset pagination: seek past the last row instead of OFFSET
+            if cursor:
+                value, last_id = decode_cursor(cursor, sort_by, sort_order)
+                query = query.filter(keyset_filter(sort_by, sort_order, value, last_id))
+            sort_column = getattr(models.AuditTrail, sort_by)
+            query = query.order_by(order(sort_column), order(models.AuditTrail.id))
+            audit_records = query.limit(limit + 1).all()
+            has_more = len(audit_records) > limit
+            audit_records = audit_records[:limit]
+            next_cursor = encode_cursor(sort_by, sort_order, audit_records[-1]) if has_more else None
+            
+            return {
+                "records": [serialize_audit_record(record) for record in audit_records],
+                "total": total,
+                "total_is_estimate": total_is_estimate,
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "has_more": has_more
+            }
         
-        if ip_address:
-            query = query.filter(models.AuditTrail.ip_address.ilike(f"%{ip_address}%"))
-        
-        # Date range filter
-        if start_date:
-            try:
-                start_datetime = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                query = query.filter(models.AuditTrail.timestamp >= start_datetime)
-            except ValueError:
-                pass
-        
-        if end_date:
-            try:
-                end_datetime = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                query = query.filter(models.AuditTrail.timestamp <= end_datetime)
-            except ValueError:
-                pass
-        
-        # Search across multiple fields
-        if search:
-            search_filter = or_(
-                models.AuditTrail.username.ilike(f"%{search}%"),
-                models.AuditTrail.user_email.ilike(f"%{search}%"),
-                models.AuditTrail.full_name.ilike(f"%{search}%"),
-                models.AuditTrail.action.ilike(f"%{search}%"),
-                models.AuditTrail.table_name.ilike(f"%{search}%"),
-                models.AuditTrail.ip_address.ilike(f"%{search}%"),
-                models.AuditTrail.user_agent.ilike(f"%{search}%"),
-                models.AuditTrail.error_message.ilike(f"%{search}%")
+        if include_archived:
+            # Archived rows live outside the database: take the first skip + limit
+            # rows from each side in the same order and merge them
+            window = skip + limit
+            sort_column = getattr(models.AuditTrail, sort_by)
+            live = query.order_by(order(sort_column), order(models.AuditTrail.id)).limit(window).all()
+            archived_total, archived = query_archived(
+                {
+                    "user_id": user_id,
+                    "action": action,
+                    "table_name": table_name,
+                    "record_id": record_id,
+                    "ip_address": ip_address,
+                    "start_date": start_date,
+                    "end_date": end_date,
+                    "search": search
+                },
+                sort_by, sort_order, window, count_total=total is not None
             )
-            query = query.filter(search_filter)
+            records = merge_records([serialize_audit_record(record) for record in live], archived, sort_by, sort_order)
+            records = records[skip:skip + limit]
+            if total is not None:
+                total += archived_total
+            
+            return {
+                "records": records,
+                "total": total,
+                "total_is_estimate": total_is_estimate,
+                "skip": skip,
+                "limit": limit,
+                "has_more": skip + limit < total if total is not None else len(records) == limit
+            }
         
         # Apply sorting
-        if sort_order == "desc":
-            query = query.order_by(desc(getattr(models.AuditTrail, sort_by)))
+        if sort_by == "relevance":
+            query = query.order_by(relevance, desc(models.AuditTrail.id))
         else:
-            query = query.order_by(asc(getattr(models.AuditTrail, sort_by)))
+            query = query.order_by(order(getattr(models.AuditTrail, sort_by)))
         
         # Apply pagination
-        total = query.count()
         audit_records = query.offset(skip).limit(limit).all()
         
-        # Convert to response format
-        result = []
-        for record in audit_records:
-            result.append({
-                "id": record.id,
-                "user_id": record.user_id,
-                "username": record.username,
-                "user_email": record.user_email,
-                "full_name": record.full_name,
-                "action": record.action,
-                "table_name": record.table_name,
-                "record_id": record.record_id,
-                "old_values": record.old_values,
-                "new_values": record.new_values,
-                "ip_address": record.ip_address,
-                "user_agent": record.user_agent,
-                "session_id": record.session_id,
-                "request_method": record.request_method,
-                "request_url": record.request_url,
-                "request_headers": record.request_headers,
-                "response_status": record.response_status,
-                "execution_time": record.execution_time,
-                "error_message": record.error_message,
-                "additional_data": record.additional_data,
-                "timestamp": record.timestamp.isoformat() if record.timestamp else None
-            })
-        
         return {
-            "records": result,
+            "records": [serialize_audit_record(record) for record in audit_records],
             "total": total,
+            "total_is_estimate": total_is_estimate,
             "skip": skip,
             "limit": limit,
-            "has_more": skip + limit < total
+            "has_more": skip + limit < total if total is not None else len(audit_records) == limit
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in audit trail: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error retrieving audit trail: {str(e)}")
@@ -139,29 +305,7 @@ def get_audit_record(
         if not audit_record:
             raise HTTPException(status_code=404, detail="Audit record not found")
         
-        return {
-            "id": audit_record.id,
-            "user_id": audit_record.user_id,
-            "username": audit_record.username,
-            "user_email": audit_record.user_email,
-            "full_name": audit_record.full_name,
-            "action": audit_record.action,
-            "table_name": audit_record.table_name,
-            "record_id": audit_record.record_id,
-            "old_values": audit_record.old_values,
-            "new_values": audit_record.new_values,
-            "ip_address": audit_record.ip_address,
-            "user_agent": audit_record.user_agent,
-            "session_id": audit_record.session_id,
-            "request_method": audit_record.request_method,
-            "request_url": audit_record.request_url,
-            "request_headers": audit_record.request_headers,
-            "response_status": audit_record.response_status,
-            "execution_time": audit_record.execution_time,
-            "error_message": audit_record.error_message,
-            "additional_data": audit_record.additional_data,
-            "timestamp": audit_record.timestamp.isoformat() if audit_record.timestamp else None
-        }
+        return serialize_audit_record(audit_record)
         
     except HTTPException:
         raise
@@ -176,50 +320,39 @@ def get_audit_stats(
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Get audit trail statistics"""
+    """
+    Get audit trail statistics
+
+    Answered from the hourly rollups, so date filters apply at hour granularity.
+    """
     
     try:
-        query = db.query(models.AuditTrail)
+        start_datetime = end_datetime = None
         
         # Apply date range filter
         if start_date:
             try:
-                start_datetime = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                query = query.filter(models.AuditTrail.timestamp >= start_datetime)
+                start_datetime = datetime.fromisoformat(start_date.replace('Z', '+00:00')).replace(tzinfo=None)
             except ValueError:
                 pass
         
         if end_date:
             try:
-                end_datetime = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                query = query.filter(models.AuditTrail.timestamp <= end_datetime)
+                end_datetime = datetime.fromisoformat(end_date.replace('Z', '+00:00')).replace(tzinfo=None)
             except ValueError:
                 pass
         
         # Get basic stats
-        total_records = query.count()
-        unique_users = query.with_entities(func.count(func.distinct(models.AuditTrail.user_id))).scalar()
-        unique_ips = query.with_entities(func.count(func.distinct(models.AuditTrail.ip_address))).scalar()
-        unique_tables = query.with_entities(func.count(func.distinct(models.AuditTrail.table_name))).scalar()
-        
-        # Get action breakdown
-        action_stats = db.query(
-            models.AuditTrail.action,
-            func.count(models.AuditTrail.id).label('count')
-        ).group_by(models.AuditTrail.action).all()
-        
-        # Get table breakdown
-        table_stats = db.query(
-            models.AuditTrail.table_name,
-            func.count(models.AuditTrail.id).label('count')
-        ).filter(models.AuditTrail.table_name.isnot(None)).group_by(models.AuditTrail.table_name).all()
+        total_records, error_count = audit_rollups.count_records(db, start_datetime, end_datetime)
+        unique_users, unique_ips = audit_rollups.count_unique_actors(db, start_datetime, end_datetime)
+        unique_tables = audit_rollups.count_unique_tables(db, start_datetime, end_datetime)
         
         # Get recent activity (last 24 hours)
         yesterday = datetime.now() - timedelta(days=1)
-        recent_activity = query.filter(models.AuditTrail.timestamp >= yesterday).count()
-        
-        # Get error count
-        error_count = query.filter(models.AuditTrail.error_message.isnot(None)).count()
+        if start_datetime is None or start_datetime < yesterday:
+            recent_activity, _ = audit_rollups.count_records(db, yesterday, end_datetime)
+        else:
+            recent_activity = total_records
         
         return {
             "total_records": total_records,
@@ -228,8 +361,9 @@ def get_audit_stats(
             "unique_tables": unique_tables,
             "recent_activity_24h": recent_activity,
             "error_count": error_count,
-            "action_breakdown": [{"action": stat.action, "count": stat.count} for stat in action_stats],
-            "table_breakdown": [{"table": stat.table_name, "count": stat.count} for stat in table_stats]
+            # Breakdowns cover the whole log, as before
+            "action_breakdown": audit_rollups.action_breakdown(db),
+            "table_breakdown": audit_rollups.table_breakdown(db)
         }
         
     except Exception as e:
@@ -249,26 +383,15 @@ def get_activity_timeline(
         start_date = end_date - timedelta(days=days)
         
         # Get daily activity counts
-        daily_activity = db.query(
-            func.date(models.AuditTrail.timestamp).label('date'),
-            func.count(models.AuditTrail.id).label('count')
-        ).filter(
-            models.AuditTrail.timestamp >= start_date,
-            models.AuditTrail.timestamp <= end_date
-        ).group_by(func.date(models.AuditTrail.timestamp)).all()
+        daily_activity = audit_rollups.daily_activity(db, start_date, end_date)
         
         # Get hourly activity for today
         today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        hourly_activity = db.query(
-            func.extract('hour', models.AuditTrail.timestamp).label('hour'),
-            func.count(models.AuditTrail.id).label('count')
-        ).filter(
-            models.AuditTrail.timestamp >= today_start
-        ).group_by(func.extract('hour', models.AuditTrail.timestamp)).all()
+        hourly_activity = audit_rollups.hourly_activity(db, today_start)
         
         return {
-            "daily_activity": [{"date": str(day.date), "count": day.count} for day in daily_activity],
-            "hourly_activity": [{"hour": int(hour.hour), "count": hour.count} for hour in hourly_activity]
+            "daily_activity": daily_activity,
+            "hourly_activity": hourly_activity
         }
         
     except Exception as e:
@@ -285,6 +408,7 @@ def create_audit_record(
     
     try:
         audit_record = models.AuditTrail(**audit_data.dict())
+        # The rollups pick the row up at flush (audit_rollups._rollup_flushed)
         db.add(audit_record)
         db.commit()
         db.refresh(audit_record)
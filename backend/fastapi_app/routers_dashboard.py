@@ -1,104 +1,40 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, desc, asc
-from datetime import datetime, timedelta
+from sqlalchemy import func, or_, desc, asc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import hashlib
+import json
+import os
 from fastapi_app import deps, models
 from fastapi_app.auth import get_current_user
+from fastapi_app.database import SessionLocal
+from fastapi_app.dashboard_snapshot import dashboard_snapshot, EMPTY_STATS
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
+# Sections of /dashboard/bundle run concurrently, each on its own session from this pool
+DASHBOARD_BUNDLE_WORKERS = int(os.getenv('DASHBOARD_BUNDLE_WORKERS', '4'))
+_bundle_executor = ThreadPoolExecutor(max_workers=DASHBOARD_BUNDLE_WORKERS, thread_name_prefix="dashboard-bundle")
+
 @router.get("/stats")
 def get_stats(db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
-    """Get real dashboard statistics from database"""
+    """
+    Get real dashboard statistics from database
+
+    Served from the dashboard snapshot: all KPIs are computed in one query and
+    cached until the TTL expires or a relevant table is written. computed_at and
+    age_ms tell how fresh the numbers are.
+    """
+    return build_stats(db)
+
+def build_stats(db: Session):
     try:
-        print("🔍 Getting dashboard stats for user:", current_user.username)
-        # Total assets
-        total_assets = db.query(func.count(models.Asset.id)).scalar() or 0
-        print(f"📊 Total assets: {total_assets}")
-        
-        # Total value (sum of purchase_cost)
-        total_value_result = db.query(func.sum(models.Asset.purchase_cost)).scalar()
-        total_value = float(total_value_result) if total_value_result else 0
-        print(f"💰 Total value: {total_value}")
-        
-        # Active assets (status = 'active')
-        active_assets = db.query(func.count(models.Asset.id)).filter(
-            models.Asset.status == 'active'
-        ).scalar() or 0
-        print(f"✅ Active assets: {active_assets}")
-        
-        # Maintenance due (maintenance records with status = 'scheduled' and due date <= 7 days)
-        try:
-            maintenance_due = db.query(func.count(models.Maintenance.id)).filter(
-                and_(
-                    models.Maintenance.status == 'scheduled',
-                    models.Maintenance.maintenance_date <= datetime.now().date() + timedelta(days=7)
-                )
-            ).scalar() or 0
-        except:
-            maintenance_due = 0
-        
-        # Critical issues (maintenance with priority = 'critical')
-        try:
-            critical_issues = db.query(func.count(models.Maintenance.id)).filter(
-                models.Maintenance.priority == 'critical'
-            ).scalar() or 0
-        except:
-            critical_issues = 0
-        
-        # Pending transfers
-        try:
-            pending_transfers = db.query(func.count(models.Transfer.id)).filter(
-                models.Transfer.status == 'pending'
-            ).scalar() or 0
-        except:
-            pending_transfers = 0
-        
-        # Active auctions
-        try:
-            active_auctions = db.query(func.count(models.Auction.id)).filter(
-                models.Auction.status == 'scheduled'
-            ).scalar() or 0
-        except:
-            active_auctions = 0
-        
-        # Pending disposals
-        try:
-            pending_disposals = db.query(func.count(models.Disposal.id)).filter(
-                models.Disposal.status == 'pending'
-            ).scalar() or 0
-        except:
-            pending_disposals = 0
-        
-        # Total users
-        total_users = db.query(func.count(models.User.id)).scalar() or 0
-        
-        # Unread notifications
-        try:
-            unread_notifications = db.query(func.count(models.Notification.id)).filter(
-                models.Notification.is_read == 0
-            ).scalar() or 0
-        except:
-            unread_notifications = 0
-        
-        # Calculate depreciation (simplified calculation)
-        # Assuming 10% yearly depreciation
-        yearly_depreciation = total_value * 0.10
-        monthly_depreciation = yearly_depreciation / 12
-        
+        stats, computed_at, age_ms = dashboard_snapshot.get(db)
         return {
-            "totalAssets": total_assets,
-            "totalValue": total_value,
-            "activeAssets": active_assets,
-            "maintenanceDue": maintenance_due,
-            "criticalIssues": critical_issues,
-            "pendingTransfers": pending_transfers,
-            "activeAuctions": active_auctions,
-            "pendingDisposals": pending_disposals,
-            "totalUsers": total_users,
-            "unreadNotifications": unread_notifications,
-            "monthlyDepreciation": monthly_depreciation,
-            "yearlyDepreciation": yearly_depreciation
+            **stats,
+            "computed_at": computed_at.isoformat(),
+            "age_ms": round(age_ms, 1)
         }
     except Exception as e:
         # Log the error and return default values
@@ -106,23 +42,17 @@ def get_stats(db: Session = Depends(deps.get_db), current_user: models.User = De
         import traceback
         traceback.print_exc()
         return {
-            "totalAssets": 0,
-            "totalValue": 0,
-            "activeAssets": 0,
-            "maintenanceDue": 0,
-            "criticalIssues": 0,
-            "pendingTransfers": 0,
-            "activeAuctions": 0,
-            "pendingDisposals": 0,
-            "totalUsers": 0,
-            "unreadNotifications": 0,
-            "monthlyDepreciation": 0,
-            "yearlyDepreciation": 0
+            **EMPTY_STATS,
+            "computed_at": datetime.now().isoformat(),
+            "age_ms": 0
         }
 
 @router.get("/asset-categories")
 def get_asset_categories(db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
     """Get real asset categories data from database"""
+    return build_asset_categories(db)
+
+def build_asset_categories(db: Session):
     try:
         # Get category breakdown with counts and values
         category_stats = db.query(
@@ -160,6 +90,9 @@ def get_asset_categories(db: Session = Depends(deps.get_db), current_user: model
 @router.get("/recent-activities")
 def get_recent_activities(db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
     """Get real recent activities from audit trail"""
+    return build_recent_activities(db)
+
+def build_recent_activities(db: Session):
     try:
         # Get recent audit trail entries (last 20 entries)
         recent_audits = db.query(models.AuditTrail).order_by(
@@ -215,6 +148,9 @@ def get_recent_activities(db: Session = Depends(deps.get_db), current_user: mode
 @router.get("/maintenance-schedule")
 def get_maintenance_schedule(db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
     """Get real maintenance schedule from database"""
+    return build_maintenance_schedule(db)
+
+def build_maintenance_schedule(db: Session):
     try:
         # Get maintenance records with asset information
         maintenance_records = db.query(
@@ -250,4 +186,55 @@ def get_maintenance_schedule(db: Session = Depends(deps.get_db), current_user: m
         return result
     except Exception as e:
         # Return empty list if there's an error
-        return [] 
\ No newline at end of file
+        return [] 
+
+# Bundle sections: name -> builder
+BUNDLE_SECTIONS = {
+    "stats": build_stats,
+    "asset_categories": build_asset_categories,
+    "recent_activities": build_recent_activities,
+    "maintenance_schedule": build_maintenance_schedule
+}
+
+# Freshness fields change on every call without the data changing
+_ETAG_EXCLUDED_FIELDS = ("computed_at", "age_ms")
+
+def section_etag(name: str, data) -> str:
+    if isinstance(data, dict):
+        data = {key: value for key, value in data.items() if key not in _ETAG_EXCLUDED_FIELDS}
+    digest = hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f'"{name}-{digest}"'
+
+def parse_if_none_match(header: str):
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+def _build_section(builder):
+    db = SessionLocal()
+    try:
+        return builder(db)
+    finally:
+        db.close()
+
+@router.get("/bundle")
+def get_dashboard_bundle(request: Request, current_user: models.User = Depends(get_current_user)):
+    """
+    Everything the dashboard page shows in one request
+
+    The sections (stats, asset_categories, recent_activities, maintenance_schedule)
+    are computed concurrently and each carries an ETag. Send the ETags from the
+    previous response back in If-None-Match (comma separated); sections that are
+    unchanged come back as {"status": "not_modified", "etag": ...} without data.
+    """
+    known_etags = parse_if_none_match(request.headers.get("if-none-match", ""))
+    futures = {name: _bundle_executor.submit(_build_section, builder) for name, builder in BUNDLE_SECTIONS.items()}
+    
+    sections = {}
+    for name, future in futures.items():
+        data = future.result()
+        etag = section_etag(name, data)
+        if etag in known_etags:
+            sections[name] = {"status": "not_modified", "etag": etag}
+        else:
+            sections[name] = {"status": "ok", "etag": etag, "data": data}
+    
+    return {"sections": sections}
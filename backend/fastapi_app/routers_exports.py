@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from fastapi_app import models
+from fastapi_app.auth import get_current_user
+from fastapi_app.columnar_export import export_assets, project_columns
+
+router = APIRouter(prefix="/exports", tags=["exports"])
+
+@router.get("/assets.parquet")
+def export_assets_parquet(
+    columns: Optional[str] = Query(None, description="Comma separated asset columns (default: all)"),
+    status: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Asset register as a Parquet file"""
+    return export_assets("parquet", project_columns(columns), status, category)
+
+@router.get("/assets.arrow")
+def export_assets_arrow(
+    columns: Optional[str] = Query(None, description="Comma separated asset columns (default: all)"),
+    status: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Asset register as an Arrow IPC file"""
+    return export_assets("arrow", project_columns(columns), status, category)
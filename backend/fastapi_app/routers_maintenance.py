@@ -2,22 +2,25 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 from . import crud, schemas, models, deps
+from .access_policy import AccessPolicy, policy_of
 from .auth import get_current_user
 
 router = APIRouter(prefix="/maintenance", tags=["maintenance"])
 
+def _check_can_manage(policy: AccessPolicy, action: str):
+    """Raise 403 unless the user is an admin or a manager with the maintenance permission"""
+    if not policy.can_manage_maintenance:
+        raise HTTPException(
+            status_code=403, 
+            detail=f"You don't have permission to {action}"
+        )
+
 @router.get("/", response_model=List[schemas.MaintenanceRead])
 def read_maintenances(skip: int = 0, limit: int = 100, db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
-    # For admin users, return all maintenance records
-    if current_user.role == 'admin':
-        return crud.get_maintenances(db, skip=skip, limit=limit)
-    
-    # For maintenance managers, filter by their assigned locations
-    if current_user.role == 'manager' and current_user.permissions and 'maintenance' in current_user.permissions:
-        return crud.get_maintenances_by_user_locations(db, current_user, skip=skip, limit=limit)
-    
-    # For other users, check if they have maintenance permission
-    if current_user.permissions and 'maintenance' in current_user.permissions:
+    policy = policy_of(current_user)
+    # Admins see every record; users with the maintenance permission (maintenance managers
+    # included) only see records for assets in their assigned locations
+    if not policy.is_admin and policy.has_permission('maintenance'):
         return crud.get_maintenances_by_user_locations(db, current_user, skip=skip, limit=limit)
     
     # Default: return all maintenance records (fallback)
@@ -29,64 +32,38 @@ def read_maintenance(maintenance_id: int, db: Session = Depends(deps.get_db), cu
     if db_maintenance is None:
         raise HTTPException(status_code=404, detail="Maintenance record not found")
     
-    # For admin users, allow access to all maintenance records
-    if current_user.role == 'admin':
-        return db_maintenance
-    
-    # For maintenance managers, check location access
-    if current_user.role == 'manager' and current_user.permissions and 'maintenance' in current_user.permissions:
+    # Users with the maintenance permission only see records for assets in their locations
+    policy = policy_of(current_user)
+    if not policy.is_admin and policy.has_permission('maintenance'):
         if not crud.can_access_maintenance_location(db, current_user, db_maintenance):
             raise HTTPException(status_code=403, detail="Access denied to this maintenance record")
-        return db_maintenance
-    
-    # For other users with maintenance permission, check location access
-    if current_user.permissions and 'maintenance' in current_user.permissions:
-        if not crud.can_access_maintenance_location(db, current_user, db_maintenance):
-            raise HTTPException(status_code=403, detail="Access denied to this maintenance record")
-        return db_maintenance
     
     return db_maintenance
 
 @router.post("/", response_model=schemas.MaintenanceRead, status_code=status.HTTP_201_CREATED)
 def create_maintenance(maintenance: schemas.MaintenanceCreate, db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
-    # Check if user has permission to create maintenance records
-    if current_user.role != 'admin':
-        has_maintenance_permission = current_user.permissions and 'maintenance' in current_user.permissions
-        is_maintenance_manager = current_user.role == 'manager' and has_maintenance_permission
-        
-        if not is_maintenance_manager:
-            raise HTTPException(
-                status_code=403, 
-                detail="You don't have permission to create maintenance records"
-            )
+    policy = policy_of(current_user)
+    _check_can_manage(policy, "create maintenance records")
     
     # For non-admin users, check if they can create maintenance for the specified asset
-    if current_user.role != 'admin' and maintenance.asset_id:
-        if not crud.can_access_asset_location(db, current_user, maintenance.asset_id):
+    if not policy.is_admin and maintenance.asset_id:
+        if not policy.can_access_asset(db, maintenance.asset_id):
             raise HTTPException(status_code=403, detail="Access denied to create maintenance for this asset")
     
     return crud.create_maintenance(db, maintenance)
 
 @router.put("/{maintenance_id}", response_model=schemas.MaintenanceRead)
 def update_maintenance(maintenance_id: int, maintenance: schemas.MaintenanceCreate, db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
-    # Check if user has permission to update maintenance records
-    if current_user.role != 'admin':
-        has_maintenance_permission = current_user.permissions and 'maintenance' in current_user.permissions
-        is_maintenance_manager = current_user.role == 'manager' and has_maintenance_permission
-        
-        if not is_maintenance_manager:
-            raise HTTPException(
-                status_code=403, 
-                detail="You don't have permission to update maintenance records"
-            )
+    policy = policy_of(current_user)
+    _check_can_manage(policy, "update maintenance records")
     
     # Get existing maintenance record
     existing_maintenance = crud.get_maintenance(db, maintenance_id=maintenance_id)
     if existing_maintenance is None:
         raise HTTPException(status_code=404, detail="Maintenance record not found")
     
-    # For non-admin users, check location access
-    if current_user.role != 'admin':
+    # For non-admin users, check location access (the record carries its asset's location)
+    if not policy.is_admin:
         if not crud.can_access_maintenance_location(db, current_user, existing_maintenance):
             raise HTTPException(status_code=403, detail="Access denied to update this maintenance record")
     
@@ -106,25 +83,21 @@ def update_maintenance_status(
         print(f"Updating maintenance {maintenance_id} status for user: {current_user.username}")
         print(f"Update data: {status_update}")
         
-        # Get the maintenance record
-        db_maintenance = db.query(models.Maintenance).filter(models.Maintenance.id == maintenance_id).first()
-        if not db_maintenance:
+        # Get the maintenance record together with its asset's location
+        result = db.query(models.Maintenance, models.Asset.location).outerjoin(
+            models.Asset, models.Maintenance.asset_id == models.Asset.id
+        ).filter(models.Maintenance.id == maintenance_id).first()
+        if not result:
             raise HTTPException(status_code=404, detail="Maintenance record not found")
+        db_maintenance, asset_location = result
         
         # Check permissions
-        if current_user.role != 'admin':
-            has_maintenance_permission = current_user.permissions and 'maintenance' in current_user.permissions
-            is_maintenance_manager = current_user.role == 'manager' and has_maintenance_permission
-            
-            if not is_maintenance_manager:
-                raise HTTPException(
-                    status_code=403, 
-                    detail="You don't have permission to update maintenance status"
-                )
-            
-            # Check location access
-            if not crud.can_access_maintenance_location(db, current_user, db_maintenance):
-                raise HTTPException(status_code=403, detail="Access denied to update this maintenance record")
+        policy = policy_of(current_user)
+        _check_can_manage(policy, "update maintenance status")
+        
+        # Check location access
+        if not policy.is_admin and not (db_maintenance.asset_id and policy.can_access_location(asset_location)):
+            raise HTTPException(status_code=403, detail="Access denied to update this maintenance record")
         
         # Update status if provided
         if "status" in status_update:
@@ -144,24 +117,16 @@ def update_maintenance_status(
 
 @router.delete("/{maintenance_id}", response_model=schemas.MaintenanceRead)
 def delete_maintenance(maintenance_id: int, db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
-    # Check if user has permission to delete maintenance records
-    if current_user.role != 'admin':
-        has_maintenance_permission = current_user.permissions and 'maintenance' in current_user.permissions
-        is_maintenance_manager = current_user.role == 'manager' and has_maintenance_permission
-        
-        if not is_maintenance_manager:
-            raise HTTPException(
-                status_code=403, 
-                detail="You don't have permission to delete maintenance records"
-            )
+    policy = policy_of(current_user)
+    _check_can_manage(policy, "delete maintenance records")
     
     # Get existing maintenance record
     existing_maintenance = crud.get_maintenance(db, maintenance_id=maintenance_id)
     if existing_maintenance is None:
         raise HTTPException(status_code=404, detail="Maintenance record not found")
     
-    # For non-admin users, check location access
-    if current_user.role != 'admin':
+    # For non-admin users, check location access (the record carries its asset's location)
+    if not policy.is_admin:
         if not crud.can_access_maintenance_location(db, current_user, existing_maintenance):
             raise HTTPException(status_code=403, detail="Access denied to delete this maintenance record")
     
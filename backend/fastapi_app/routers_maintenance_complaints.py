@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 from typing import List
 from . import crud, schemas, models, deps
 from .auth import get_current_user
+from .notification_fanout import notify_users
 from datetime import datetime
 
 router = APIRouter(prefix="/maintenance-complaints", tags=["maintenance-complaints"])
@@ -38,18 +40,14 @@ def create_maintenance_complaint(
         db.commit()
         db.refresh(maintenance_complaint)
         
-        # Find maintenance managers and admins to notify
-        maintenance_managers = db.query(models.User).filter(
-            models.User.role.in_(['manager', 'admin']),
-            models.User.location == current_user.location
-        ).all()
-        
-        admins = db.query(models.User).filter(models.User.role == 'admin').all()
-        
-        # Combine unique users to notify
-        users_to_notify = list(set(maintenance_managers + admins))
+        # Maintenance managers and admins at the complainant's location, plus every admin
+        recipient_ids = [user_id for (user_id,) in db.query(models.User.id).filter(or_(
+            and_(models.User.role.in_(['manager', 'admin']), models.User.location == current_user.location),
+            models.User.role == 'admin'
+        ))]
         
         # Get asset details for better notification
+        asset = None
         asset_details = ""
         if complaint_data.get('asset_id'):
             asset = db.query(models.Asset).filter(models.Asset.id == complaint_data.get('asset_id')).first()
@@ -65,45 +63,42 @@ def create_maintenance_complaint(
                 asset_details += f"• Status: {asset.status or 'N/A'}\n"
                 asset_details += f"• Condition: {asset.asset_condition or 'N/A'}\n"
 
-        # Create notifications for each user
-        for user_to_notify in users_to_notify:
-            notification = models.Notification(
-                user_id=user_to_notify.id,
-                sender_id=current_user.id,
-                title=f"Maintenance Complaint: {complaint_data.get('asset_name', 'Asset')}",
-                message=f"Complaint Type: {complaint_data.get('complaint_type')}\n"
-                       f"Description: {complaint_data.get('description')}\n"
-                       f"Location: {complaint_data.get('user_location')}\n"
-                       f"Department: {complaint_data.get('user_department')}\n"
-                       f"Priority: {complaint_data.get('priority', 'medium')}"
-                       f"{asset_details}",
-                type="maintenance_complaint",
-                priority=complaint_data.get('priority', 'medium'),
-                is_read=0,
-                created_at=datetime.now(),
-                action_url=f"/assets/{complaint_data.get('asset_id')}" if complaint_data.get('asset_id') else None,
-                action_text="View Asset Details",
-                notification_metadata={
-                    "asset_id": complaint_data.get('asset_id'),
-                    "asset_name": complaint_data.get('asset_name'),
-                    "complaint_id": maintenance_complaint.id,
-                    "complaint_type": complaint_data.get('complaint_type'),
-                    "user_location": complaint_data.get('user_location'),
-                    "user_department": complaint_data.get('user_department'),
-                    "asset_details": {
-                        "id": asset.id if asset else None,
-                        "name": asset.name if asset else None,
-                        "category": asset.category if asset else None,
-                        "model": asset.model if asset else None,
-                        "manufacturer": asset.manufacturer if asset else None,
-                        "serial_number": asset.serial_number if asset else None,
-                        "location": asset.location if asset else None,
-                        "status": asset.status if asset else None,
-                        "condition": asset.asset_condition if asset else None
-                    } if asset else None
-                }
-            )
-            db.add(notification)
+        # One shared payload, a thin row per recipient (large fan-outs finish in the background)
+        fanout = notify_users(
+            db,
+            recipient_ids,
+            sender_id=current_user.id,
+            title=f"Maintenance Complaint: {complaint_data.get('asset_name', 'Asset')}",
+            message=f"Complaint Type: {complaint_data.get('complaint_type')}\n"
+                   f"Description: {complaint_data.get('description')}\n"
+                   f"Location: {complaint_data.get('user_location')}\n"
+                   f"Department: {complaint_data.get('user_department')}\n"
+                   f"Priority: {complaint_data.get('priority', 'medium')}"
+                   f"{asset_details}",
+            type="maintenance_complaint",
+            priority=complaint_data.get('priority', 'medium'),
+            action_url=f"/assets/{complaint_data.get('asset_id')}" if complaint_data.get('asset_id') else None,
+            action_text="View Asset Details",
+            notification_metadata={
+                "asset_id": complaint_data.get('asset_id'),
+                "asset_name": complaint_data.get('asset_name'),
+                "complaint_id": maintenance_complaint.id,
+                "complaint_type": complaint_data.get('complaint_type'),
+                "user_location": complaint_data.get('user_location'),
+                "user_department": complaint_data.get('user_department'),
+                "asset_details": {
+                    "id": asset.id,
+                    "name": asset.name,
+                    "category": asset.category,
+                    "model": asset.model,
+                    "manufacturer": asset.manufacturer,
+                    "serial_number": asset.serial_number,
+                    "location": asset.location,
+                    "status": asset.status,
+                    "condition": asset.asset_condition
+                } if asset else None
+            }
+        )
         
         # Create a notification for the user who submitted the complaint (for their "sent" tab)
         user_notification = models.Notification(
@@ -127,7 +122,8 @@ def create_maintenance_complaint(
         return {
             "message": "Maintenance complaint submitted successfully",
             "complaint_id": maintenance_complaint.id,
-            "notifications_sent": len(users_to_notify)
+            "notifications_sent": fanout["recipients"],
+            "notifications_deferred": fanout["deferred"]
         }
         
     except Exception as e:
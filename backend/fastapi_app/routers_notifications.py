@@ -1,73 +1,264 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Request, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from fastapi_app import models, schemas, deps
 from fastapi_app.auth import get_current_user
+from fastapi_app.database import SessionLocal
+from fastapi_app import notification_counts, notification_threads
+from fastapi_app.notification_details import notification_query, serialize_notification
+from fastapi_app.notification_hub import OVERFLOW, notification_events, notification_hub
+from fastapi_app.token_utils import create_stream_ticket, get_bearer_token, get_request_principal, resolve_principal, STREAM_TICKET_SCOPE
 from datetime import datetime
+import base64
+import json
+import os
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
+# Page size of GET /notifications/ (newest first, keyset paginated)
+NOTIFICATION_PAGE_SIZE = 50
+NOTIFICATION_PAGE_SIZE_MAX = 500
+
+# /notifications/stream: seconds between heartbeats, client reconnect delay (ms)
+# and the most notifications replayed after Last-Event-ID before asking for a resync
+NOTIFICATION_STREAM_HEARTBEAT = float(os.getenv('NOTIFICATION_STREAM_HEARTBEAT', '15'))
+NOTIFICATION_STREAM_RETRY_MS = int(os.getenv('NOTIFICATION_STREAM_RETRY_MS', '5000'))
+NOTIFICATION_STREAM_REPLAY_LIMIT = int(os.getenv('NOTIFICATION_STREAM_REPLAY_LIMIT', '500'))
+# Seconds a ticket from POST /notifications/stream/ticket can be used to open a stream
+NOTIFICATION_STREAM_TICKET_SECONDS = int(os.getenv('NOTIFICATION_STREAM_TICKET_SECONDS', '60'))
+
+def encode_cursor(notification) -> str:
+    """Opaque cursor pointing just past notification in (created_at, id) descending order"""
+    created_at = notification.created_at.isoformat() if notification.created_at else None
+    payload = {"c": created_at, "id": notification.id}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(payload["c"]) if payload["c"] is not None else None
+        return created_at, int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_filter(created_at: Optional[datetime], last_id: int):
+    """Rows strictly after (created_at, last_id) in ORDER BY created_at DESC, id DESC (NULLs last)"""
+    column = models.Notification.created_at
+    id_column = models.Notification.id
+    if created_at is None:
+        return and_(column.is_(None), id_column < last_id)
+    return or_(column < created_at, and_(column == created_at, id_column < last_id), column.is_(None))
+
 @router.get("/", response_model=List[schemas.NotificationRead])
 def get_notifications(
+    response: Response,
     user_id: Optional[int] = Query(None),
     parent_id: Optional[int] = Query(None),
     direction: Optional[str] = Query(None),
+    limit: int = Query(NOTIFICATION_PAGE_SIZE, ge=1, le=NOTIFICATION_PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    query = db.query(models.Notification)
+    """
+    Notifications newest first, one page at a time.
+
+    When there are more rows the X-Next-Cursor response header holds the
+    cursor to pass back as cursor for the following page.
+    """
+    query = notification_query(db)
     if user_id is not None:
         query = query.filter(models.Notification.user_id == user_id)
     if parent_id is not None:
         query = query.filter(models.Notification.parent_id == parent_id)
     if direction is not None:
         query = query.filter(models.Notification.direction == direction)
+    if cursor:
+        query = query.filter(keyset_filter(*decode_cursor(cursor)))
+    
+    rows = query.order_by(
+        models.Notification.created_at.desc(), models.Notification.id.desc()
+    ).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].Notification)
+    
+    return [serialize_notification(row) for row in rows]
+
+def _counter_user(user_id: Optional[int], current_user) -> int:
+    if user_id is None or user_id == current_user.id:
+        return current_user.id
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized to view this user's notifications")
+    return user_id
+
+@router.get("/unread-count", response_model=schemas.NotificationUnreadCount)
+def get_unread_count(
+    user_id: Optional[int] = Query(None, description="Admins only; defaults to the current user"),
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Unread notifications of the current user, read from the per-user counter"""
+    return notification_counts.get_counter(db, _counter_user(user_id, current_user))
+
+@router.post("/read-all", response_model=schemas.NotificationUnreadCount)
+def mark_all_notifications_read(
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Mark every notification of the current user read (a single counter update)"""
+    counter = notification_counts.mark_all_read(db, current_user.id)
+    db.commit()
+    return counter
+
+@router.get("/threads/{root_id}", response_model=schemas.NotificationThread)
+def get_notification_thread(
+    root_id: int,
+    response: Response,
+    limit: int = Query(NOTIFICATION_PAGE_SIZE, ge=1, le=NOTIFICATION_PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    A whole reply chain oldest first, one page at a time, with a summary per sender.
+
+    root_id may be any notification of the thread; root_id in the response is
+    the thread's first notification. Pages follow X-Next-Cursor like
+    GET /notifications/.
+    """
+    thread_root = notification_threads.find_root(db, root_id)
+    if thread_root is None:
+        raise HTTPException(status_code=404, detail="Notification not found")
+    if current_user.role != "admin" and not notification_threads.is_participant(db, thread_root, current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized to view this thread")
+    
+    query = notification_query(db).filter(notification_threads.in_thread(thread_root))
+    if cursor:
+        query = query.filter(notification_threads.after(*decode_cursor(cursor)))
+    rows = query.order_by(
+        models.Notification.created_at, models.Notification.id
+    ).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].Notification)
     
-    notifications = query.order_by(models.Notification.created_at.desc()).all()
+    return {
+        "root_id": thread_root,
+        "notifications": [serialize_notification(row) for row in rows],
+        "senders": notification_threads.sender_summaries(db, thread_root),
+    }
+
+def sse_event(payload: dict) -> str:
+    return f"id: {payload['id']}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+
+def replay_events(user_id: int, after_id: int) -> List[dict]:
+    """Notifications of user_id created after after_id, oldest first (REPLAY_LIMIT + 1 at most)"""
+    db = SessionLocal()
+    try:
+        ids = [notification_id for (notification_id,) in db.query(models.Notification.id).filter(
+            models.Notification.user_id == user_id,
+            models.Notification.id > after_id
+        ).order_by(models.Notification.id).limit(NOTIFICATION_STREAM_REPLAY_LIMIT + 1)]
+        return notification_events(db, ids) if ids else []
+    finally:
+        db.close()
+
+@router.post("/stream/ticket")
+def create_notification_stream_ticket(current_user: models.User = Depends(get_current_user)):
+    """
+    A short-lived ticket for opening /notifications/stream as ?ticket=.
+
+    EventSource can't send an Authorization header, and a bearer token in the
+    URL would end up in access logs. The ticket is only accepted by the
+    stream and expires after NOTIFICATION_STREAM_TICKET_SECONDS; fetch a new
+    one before reconnecting after an error.
+    """
+    return {
+        "ticket": create_stream_ticket(current_user.username, NOTIFICATION_STREAM_TICKET_SECONDS),
+        "expires_in": NOTIFICATION_STREAM_TICKET_SECONDS,
+    }
+
+def stream_principal(request: Request, ticket: Optional[str]):
+    token = get_bearer_token(request)
+    if token is not None:
+        return get_request_principal(request, token)
+    if ticket is not None:
+        return resolve_principal(ticket, scope=STREAM_TICKET_SCOPE)
+    return None
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    ticket: Optional[str] = Query(None, description="From POST /notifications/stream/ticket, for EventSource clients"),
+):
+    """
+    Server-Sent Events stream of the current user's new notifications.
+
+    Authenticate with the Authorization header or, from EventSource, with
+    ?ticket= from POST /notifications/stream/ticket. Each event is
+    "notification" with the NotificationRead payload as data and the
+    notification id as event id. On reconnect the browser sends
+    Last-Event-ID and the notifications created since are replayed first. A
+    "resync" event means the client fell behind (or too much was missed):
+    re-fetch /notifications/ and reconnect. Comment lines are heartbeats.
+    """
+    # No get_db dependency: the stream must not hold a session while it is open
+    principal = await run_in_threadpool(stream_principal, request, ticket)
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    try:
+        after_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
     
-    # Enhance notifications with user details
-    enhanced_notifications = []
-    for notification in notifications:
-        # Get recipient (user) details
-        recipient = db.query(models.User).filter(models.User.id == notification.user_id).first()
-        
-        # Get sender details if sender_id exists
-        sender = None
-        if notification.sender_id:
-            sender = db.query(models.User).filter(models.User.id == notification.sender_id).first()
-        
-        # Create enhanced notification data
-
-        
-        enhanced_notification = {
-            "id": notification.id,
-            "user_id": notification.user_id,
-            "sender_id": notification.sender_id,
-            "title": notification.title,
-            "message": notification.message,
-            "type": notification.type,
-            "priority": notification.priority,
-            "action_url": notification.action_url,
-            "action_text": notification.action_text,
-            "notification_metadata": notification.notification_metadata if notification.notification_metadata else {},
-            "direction": notification.direction,
-            "is_read": notification.is_read,
-            "parent_id": notification.parent_id,
-            "created_at": notification.created_at,
-            # Add recipient details
-            "recipient_id": notification.user_id,
-            "recipient_name": f"{recipient.first_name} {recipient.last_name}" if recipient else "Unknown",
-            "recipient_email": recipient.email if recipient else "Unknown",
-            # Add sender details
-            "sender_name": f"{sender.first_name} {sender.last_name}" if sender else None,
-            "sender_first_name": sender.first_name if sender else None,
-            "sender_last_name": sender.last_name if sender else None,
-            "sender_username": sender.username if sender else None,
-            "sender_email": sender.email if sender else None,
-        }
-        enhanced_notifications.append(enhanced_notification)
+    async def events():
+        # Subscribe before replaying so nothing created in between is missed
+        subscription = notification_hub.subscribe(principal.id)
+        # Ids already sent by the replay, which the hub may deliver again. Commits
+        # finish out of id order, so this can't be a high-water mark; each id is
+        # published once, so it is dropped from the set when its duplicate arrives
+        replayed_ids = set()
+        try:
+            yield f"retry: {NOTIFICATION_STREAM_RETRY_MS}\n\n"
+            if after_id is not None:
+                replayed = await run_in_threadpool(replay_events, principal.id, after_id)
+                for payload in replayed[:NOTIFICATION_STREAM_REPLAY_LIMIT]:
+                    replayed_ids.add(payload["id"])
+                    yield sse_event(payload)
+                if len(replayed) > NOTIFICATION_STREAM_REPLAY_LIMIT:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+            while True:
+                payload = await subscription.next_event(NOTIFICATION_STREAM_HEARTBEAT)
+                if payload is None:
+                    if await request.is_disconnected():
+                        return
+                    yield ": heartbeat\n\n"
+                elif payload is OVERFLOW:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                elif payload["id"] in replayed_ids:
+                    replayed_ids.discard(payload["id"])
+                else:
+                    yield sse_event(payload)
+        finally:
+            subscription.close()
     
-    return enhanced_notifications
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/{notification_id}", response_model=schemas.NotificationRead)
 def get_notification(
@@ -77,54 +268,33 @@ def get_notification(
 ):
     """Get a specific notification by ID"""
     # Join with users table to get sender and recipient details
-    notification = db.query(models.Notification).filter(models.Notification.id == notification_id).first()
-    if not notification:
+    row = notification_query(db).filter(models.Notification.id == notification_id).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Notification not found")
     
     # Check if user has permission to view this notification
     # Admin can view all notifications, users can only view their own
-    if current_user.role != "admin" and notification.user_id != current_user.id:
+    if current_user.role != "admin" and row.Notification.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view this notification")
     
-    # Get recipient (user) details
-    recipient = db.query(models.User).filter(models.User.id == notification.user_id).first()
-    
-    # Get sender details if sender_id exists
-    sender = None
-    if notification.sender_id:
-        sender = db.query(models.User).filter(models.User.id == notification.sender_id).first()
-    
-    # Create a response with additional user details
+    return serialize_notification(row)
 
+@router.put("/{notification_id}/read", response_model=schemas.NotificationRead)
+def mark_notification_read(
+    notification_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Mark one notification read; the recipient's unread counter follows at flush time"""
+    notification = db.query(models.Notification).filter(models.Notification.id == notification_id).first()
+    if not notification:
+        raise HTTPException(status_code=404, detail="Notification not found")
+    if current_user.role != "admin" and notification.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to update this notification")
     
-    response_data = {
-        "id": notification.id,
-        "user_id": notification.user_id,
-        "sender_id": notification.sender_id,
-        "title": notification.title,
-        "message": notification.message,
-        "type": notification.type,
-        "priority": notification.priority,
-        "action_url": notification.action_url,
-        "action_text": notification.action_text,
-        "notification_metadata": notification.notification_metadata if notification.notification_metadata else {},
-        "direction": notification.direction,
-        "is_read": notification.is_read,
-        "parent_id": notification.parent_id,
-        "created_at": notification.created_at,
-        # Add recipient details
-        "recipient_id": notification.user_id,
-        "recipient_name": f"{recipient.first_name} {recipient.last_name}" if recipient else "Unknown",
-        "recipient_email": recipient.email if recipient else "Unknown",
-        # Add sender details
-        "sender_name": f"{sender.first_name} {sender.last_name}" if sender else None,
-        "sender_first_name": sender.first_name if sender else None,
-        "sender_last_name": sender.last_name if sender else None,
-        "sender_username": sender.username if sender else None,
-        "sender_email": sender.email if sender else None,
-    }
-    
-    return response_data
+    notification.is_read = 1
+    db.commit()
+    return serialize_notification(notification_query(db).filter(models.Notification.id == notification_id).one())
 
 @router.post("/", response_model=schemas.NotificationRead, status_code=status.HTTP_201_CREATED)
 def create_notification(
@@ -146,7 +316,10 @@ def create_notification(
         if not recipient_id:
             raise HTTPException(status_code=400, detail="Cannot determine recipient for reply")
         notif_data['user_id'] = recipient_id
-        notif_data['title'] = notif_data.get('title') or f"Reply: {parent.title}"
+        notif_data['thread_root_id'] = notification_threads.root_of(parent)
+        # Fanned-out parents keep their title in the shared payload
+        parent_title = db.get(models.NotificationPayload, parent.payload_id).title if parent.payload_id else parent.title
+        notif_data['title'] = notif_data.get('title') or f"Reply: {parent_title}"
     
     db_notification = models.Notification(
         **notif_data,
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, extract
+from sqlalchemy import func, extract, select, literal
 from typing import List, Optional
-from datetime import datetime, timedelta
-from fastapi_app import models, schemas, deps
+from datetime import date, datetime
+from fastapi_app import models, schemas, deps, report_export, depreciation, depreciation_snapshots
 from fastapi_app.auth import get_current_user
+from fastapi_app.financial_ledger import financial_ledger
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
@@ -51,11 +52,21 @@ def get_financial_report(
         calculated_vat = total_value * 0.075
         total_vat = total_vat_amount if total_vat_amount > 0 else calculated_vat
         
-        # Calculate depreciation (assuming 10% annual depreciation)
-        depreciation = total_value * 0.10
+        # Accumulated depreciation of the period's assets as at the end of the period
+        # (closed months come from the depreciation snapshots, the open month is rolled forward)
+        period_end = datetime.now().date()
+        purchase_year = None
+        if year and year != "all":
+            try:
+                purchase_year = int(year)
+                if purchase_year < period_end.year:
+                    period_end = date(purchase_year, 12, 31)
+            except ValueError:
+                pass
+        accumulated_depreciation = depreciation_snapshots.accumulated_depreciation(db, period_end, purchase_year)
         
         # Net value after VAT and depreciation
-        net_value = total_value - total_vat - depreciation
+        net_value = total_value - total_vat - accumulated_depreciation
         
         # Get category breakdown with enhanced data
         category_breakdown = db.query(
@@ -94,74 +105,42 @@ def get_financial_report(
                 "percentage": round(percentage, 1)
             })
         
-        # Get monthly data for the year with enhanced calculations
+        # Get monthly data for the year from the cached ledger (one GROUP BY per source)
         monthly_data = []
         
         # For "all" years, use current year for monthly breakdown but show all-time totals
         display_year = datetime.now().year if year == "all" else int(year)
+        ledger = financial_ledger.get_year(db, display_year)
         
         for month in range(1, 13):
-            month_start = datetime(display_year, month, 1)
-            if month == 12:
-                month_end = datetime(display_year, 12, 31)
-            else:
-                month_end = datetime(display_year, month + 1, 1) - timedelta(days=1)
-            
-            # Get purchases for this month
-            monthly_purchases = db.query(
-                func.sum(models.Asset.purchase_cost).label('purchases')
-            ).filter(
-                and_(
-                    models.Asset.purchase_date >= month_start,
-                    models.Asset.purchase_date <= month_end
-                )
-            ).scalar() or 0
-            
-            # Get sales/disposals for this month
-            monthly_sales = db.query(
-                func.sum(models.Disposal.proceeds).label('sales')
-            ).filter(
-                and_(
-                    models.Disposal.disposal_date >= month_start,
-                    models.Disposal.disposal_date <= month_end
-                )
-            ).scalar() or 0
-            
-            # Get auction proceeds for this month
-            monthly_auctions = db.query(
-                func.sum(models.Auction.final_bid).label('auction_proceeds')
-            ).filter(
-                and_(
-                    models.Auction.auction_date >= month_start,
-                    models.Auction.auction_date <= month_end,
-                    models.Auction.status == 'completed'
-                )
-            ).scalar() or 0
+            monthly_purchases = ledger["purchases"][month - 1]
             
             # Calculate total sales including disposals and auctions
-            total_monthly_sales = float(monthly_sales) + float(monthly_auctions)
-            monthly_vat = float(monthly_purchases) * 0.075
-            net_profit = total_monthly_sales - float(monthly_purchases)
+            total_monthly_sales = ledger["disposals"][month - 1] + ledger["auctions"][month - 1]
+            monthly_vat = monthly_purchases * 0.075
+            net_profit = total_monthly_sales - monthly_purchases
             
             monthly_data.append({
-                "month": month_start.strftime("%b"),
-                "purchases": float(monthly_purchases),
+                "month": datetime(display_year, month, 1).strftime("%b"),
+                "purchases": monthly_purchases,
                 "sales": total_monthly_sales,
                 "vat": monthly_vat,
                 "netProfit": net_profit
             })
         
-        # Get additional financial metrics
-        # Total disposals value
-        total_disposals = db.query(func.sum(models.Disposal.proceeds)).scalar() or 0
-        
-        # Total auction proceeds
-        total_auction_proceeds = db.query(
-            func.sum(models.Auction.final_bid)
-        ).filter(models.Auction.status == 'completed').scalar() or 0
-        
-        # Total maintenance costs
-        total_maintenance_cost = db.query(func.sum(models.Maintenance.cost)).scalar() or 0
+        # Get additional financial metrics in one query:
+        # total disposals value, total auction proceeds, total maintenance costs
+        disposals_total = db.query(func.sum(models.Disposal.proceeds)).scalar_subquery()
+        auctions_total = db.query(func.sum(models.Auction.winning_bid)).filter(
+            models.Auction.status == 'completed'
+        ).scalar_subquery()
+        maintenance_total = db.query(func.sum(models.Maintenance.cost)).scalar_subquery()
+        total_disposals, total_auction_proceeds, total_maintenance_cost = db.query(
+            disposals_total, auctions_total, maintenance_total
+        ).one()
+        total_disposals = total_disposals or 0
+        total_auction_proceeds = total_auction_proceeds or 0
+        total_maintenance_cost = total_maintenance_cost or 0
         
         return {
             "period": "All Years" if year == "all" else str(year),
@@ -170,7 +149,7 @@ def get_financial_report(
             "totalVAT": total_vat,
             "totalTax": total_vat,  # Same as VAT for now
             "netValue": net_value,
-            "depreciation": depreciation,
+            "depreciation": accumulated_depreciation,
             "categoryBreakdown": category_data,
             "monthlyData": monthly_data,
             "additionalMetrics": {
@@ -186,216 +165,241 @@ def get_financial_report(
         print(f"Error in financial report: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating financial report: {str(e)}")
 
+@router.get("/depreciation")
+def get_depreciation_report(
+    as_of: Optional[date] = Query(None, description="Values as at the end of this month (default: current month)"),
+    category: Optional[str] = Query(None),
+    months: int = Query(12, ge=1, le=120, description="Length of the depreciation schedule"),
+    include_assets: bool = Query(False),
+    limit: int = Query(100, ge=1, le=10000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Book values, accumulated depreciation and a monthly schedule from the per-category policies"""
+    
+    as_of = as_of or datetime.now().date()
+    filters = []
+    if category:
+        filters.append(models.Asset.category == category)
+    
+    columns = depreciation.load_columns(db, *filters)
+    figures = depreciation.compute(columns, as_of)
+    charges = depreciation.schedule(columns, as_of, months)
+    
+    schedule_data = []
+    for offset_months, charge in enumerate(charges):
+        index = depreciation.month_index(as_of) + offset_months
+        schedule_data.append({
+            "month": date(index // 12, index % 12 + 1, 1).strftime("%b %Y"),
+            "depreciation": float(charge)
+        })
+    
+    result = {
+        "asOf": as_of.isoformat(),
+        "totals": depreciation.totals(columns, figures),
+        "categoryBreakdown": depreciation.by_category(columns, figures),
+        "schedule": schedule_data
+    }
+    
+    if include_assets:
+        page = slice(offset, offset + limit)
+        result["assets"] = [
+            {
+                "id": int(asset_id),
+                "category": columns.category_names[code],
+                "cost": float(cost),
+                "accumulatedDepreciation": float(accumulated),
+                "bookValue": float(book_value),
+                "monthlyDepreciation": float(monthly),
+                "yearlyDepreciation": float(yearly)
+            }
+            for asset_id, code, cost, accumulated, book_value, monthly, yearly in zip(
+                columns.ids[page], columns.category[page], columns.cost[page],
+                figures["accumulated"][page], figures["book_value"][page],
+                figures["monthly"][page], figures["yearly"][page]
+            )
+        ]
+    
+    return result
+
 @router.get("/assets")
 def get_assets_report(
     status: Optional[str] = Query(None),
     category: Optional[str] = Query(None),
+    export_format: Optional[str] = Query(None, alias="format"),
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Get assets report data"""
+    """Get assets report data (?format=csv|ndjson streams the rows instead)"""
     
-    query = db.query(models.Asset)
+    export_format = report_export.check_format(export_format)
     
+    filters = []
     if status:
-        query = query.filter(models.Asset.status == status)
+        filters.append(models.Asset.status == status)
     if category:
-        query = query.filter(models.Asset.category == category)
+        filters.append(models.Asset.category == category)
     
-    assets = query.all()
+    assets = select(
+        models.Asset.id,
+        models.Asset.name,
+        models.Asset.category,
+        models.Asset.status,
+        models.Asset.purchase_cost,
+        models.Asset.purchase_date,
+        models.Asset.location
+    ).where(*filters).order_by(models.Asset.id)
     
-    # Calculate statistics
-    total_assets = len(assets)
-    total_value = sum(asset.purchase_cost or 0 for asset in assets)
-    avg_value = total_value / total_assets if total_assets > 0 else 0
+    if export_format:
+        return report_export.stream_export(assets, export_format, "assets")
     
-    # Status breakdown
-    status_breakdown = {}
-    for asset in assets:
-        status = asset.status or 'unknown'
-        status_breakdown[status] = status_breakdown.get(status, 0) + 1
-    
-    # Category breakdown
-    category_breakdown = {}
-    for asset in assets:
-        category = asset.category or 'Uncategorized'
-        category_breakdown[category] = category_breakdown.get(category, 0) + 1
+    # Calculate statistics in SQL
+    stats = report_export.totals(db, models.Asset.purchase_cost, *filters)
     
     return {
-        "totalAssets": total_assets,
-        "totalValue": total_value,
-        "averageValue": avg_value,
-        "statusBreakdown": status_breakdown,
-        "categoryBreakdown": category_breakdown,
-        "assets": [
-            {
-                "id": asset.id,
-                "name": asset.name,
-                "category": asset.category,
-                "status": asset.status,
-                "purchase_cost": asset.purchase_cost,
-                "purchase_date": asset.purchase_date.isoformat() if asset.purchase_date else None,
-                "location": asset.location
-            }
-            for asset in assets
-        ]
+        "totalAssets": stats["count"],
+        "totalValue": stats["total"],
+        "averageValue": stats["average"],
+        "statusBreakdown": report_export.breakdown(db, models.Asset.status, *filters),
+        "categoryBreakdown": report_export.breakdown(db, models.Asset.category, *filters, missing="Uncategorized"),
+        "assets": report_export.rows(db, assets)
     }
 
 @router.get("/maintenance")
 def get_maintenance_report(
     status: Optional[str] = Query(None),
+    export_format: Optional[str] = Query(None, alias="format"),
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Get maintenance report data"""
+    """Get maintenance report data (?format=csv|ndjson streams the rows instead)"""
     
-    query = db.query(models.Maintenance)
+    export_format = report_export.check_format(export_format)
     
+    filters = []
     if status:
-        query = query.filter(models.Maintenance.status == status)
+        filters.append(models.Maintenance.status == status)
     
-    maintenance_records = query.all()
+    # maintenance has no asset_name / maintenance_type columns; name comes from the asset
+    records = select(
+        models.Maintenance.id,
+        models.Maintenance.asset_id,
+        models.Asset.name.label("asset_name"),
+        literal('preventive').label("maintenance_type"),  # Default value, not stored
+        models.Maintenance.status,
+        models.Maintenance.cost,
+        models.Maintenance.maintenance_date,
+        models.Maintenance.description
+    ).outerjoin(models.Asset, models.Asset.id == models.Maintenance.asset_id).where(*filters).order_by(models.Maintenance.id)
     
-    # Calculate statistics
-    total_records = len(maintenance_records)
-    total_cost = sum(record.cost or 0 for record in maintenance_records)
-    avg_cost = total_cost / total_records if total_records > 0 else 0
+    if export_format:
+        return report_export.stream_export(records, export_format, "maintenance")
     
-    # Status breakdown
-    status_breakdown = {}
-    for record in maintenance_records:
-        status = record.status or 'unknown'
-        status_breakdown[status] = status_breakdown.get(status, 0) + 1
+    # Calculate statistics in SQL
+    stats = report_export.totals(db, models.Maintenance.cost, *filters)
     
     # Overdue maintenance
-    overdue_count = len([
-        record for record in maintenance_records
-        if record.status == 'scheduled' and record.maintenance_date and record.maintenance_date < datetime.now().date()
-    ])
+    overdue_count = report_export.count(
+        db, models.Maintenance.id, *filters,
+        models.Maintenance.status == 'scheduled',
+        models.Maintenance.maintenance_date < datetime.now().date()
+    )
     
     return {
-        "totalRecords": total_records,
-        "totalCost": total_cost,
-        "averageCost": avg_cost,
+        "totalRecords": stats["count"],
+        "totalCost": stats["total"],
+        "averageCost": stats["average"],
         "overdueCount": overdue_count,
-        "statusBreakdown": status_breakdown,
-        "records": [
-            {
-                "id": record.id,
-                "asset_id": record.asset_id,
-                "asset_name": record.asset_name,
-                "maintenance_type": record.maintenance_type,
-                "status": record.status,
-                "cost": record.cost,
-                "maintenance_date": record.maintenance_date.isoformat() if record.maintenance_date else None,
-                "description": record.description
-            }
-            for record in maintenance_records
-        ]
+        "statusBreakdown": report_export.breakdown(db, models.Maintenance.status, *filters),
+        "records": report_export.rows(db, records)
     }
 
 @router.get("/auctions")
 def get_auctions_report(
     status: Optional[str] = Query(None),
+    export_format: Optional[str] = Query(None, alias="format"),
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Get auctions report data"""
+    """Get auctions report data (?format=csv|ndjson streams the rows instead)"""
     
-    query = db.query(models.Auction)
+    export_format = report_export.check_format(export_format)
     
+    filters = []
     if status:
-        query = query.filter(models.Auction.status == status)
+        filters.append(models.Auction.status == status)
     
-    auctions = query.all()
+    auctions = select(
+        models.Auction.id,
+        models.Auction.asset_id,
+        models.Auction.status,
+        models.Auction.starting_bid,
+        models.Auction.winning_bid,
+        models.Auction.auction_date,
+        models.Auction.winner_name
+    ).where(*filters).order_by(models.Auction.id)
     
-    # Calculate statistics
-    total_auctions = len(auctions)
-    total_starting_bid = sum(auction.starting_bid or 0 for auction in auctions)
-    total_winning_bid = sum(auction.winning_bid or 0 for auction in auctions)
-    avg_starting_bid = total_starting_bid / total_auctions if total_auctions > 0 else 0
+    if export_format:
+        return report_export.stream_export(auctions, export_format, "auctions")
     
-    # Status breakdown
-    status_breakdown = {}
-    for auction in auctions:
-        status = auction.status or 'unknown'
-        status_breakdown[status] = status_breakdown.get(status, 0) + 1
+    # Calculate statistics in SQL
+    starting = report_export.totals(db, models.Auction.starting_bid, *filters)
+    winning = report_export.totals(db, models.Auction.winning_bid, *filters)
     
     # Active auctions (scheduled auctions that haven't been completed or cancelled)
-    active_count = len([
-        auction for auction in auctions
-        if auction.status == 'scheduled' and auction.auction_date and auction.auction_date >= datetime.now().date()
-    ])
+    active_count = report_export.count(
+        db, models.Auction.id, *filters,
+        models.Auction.status == 'scheduled',
+        models.Auction.auction_date >= datetime.now().date()
+    )
     
     return {
-        "totalAuctions": total_auctions,
-        "totalStartingBid": total_starting_bid,
-        "totalWinningBid": total_winning_bid,
-        "averageStartingBid": avg_starting_bid,
+        "totalAuctions": starting["count"],
+        "totalStartingBid": starting["total"],
+        "totalWinningBid": winning["total"],
+        "averageStartingBid": starting["average"],
         "activeCount": active_count,
-        "statusBreakdown": status_breakdown,
-        "auctions": [
-            {
-                "id": auction.id,
-                "asset_id": auction.asset_id,
-                "status": auction.status,
-                "starting_bid": auction.starting_bid,
-                "winning_bid": auction.winning_bid,
-                "auction_date": auction.auction_date.isoformat() if auction.auction_date else None,
-                "winner_name": auction.winner_name
-            }
-            for auction in auctions
-        ]
+        "statusBreakdown": report_export.breakdown(db, models.Auction.status, *filters),
+        "auctions": report_export.rows(db, auctions)
     }
 
 @router.get("/disposals")
 def get_disposals_report(
     status: Optional[str] = Query(None),
+    export_format: Optional[str] = Query(None, alias="format"),
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Get disposals report data"""
+    """Get disposals report data (?format=csv|ndjson streams the rows instead)"""
     
-    query = db.query(models.Disposal)
+    export_format = report_export.check_format(export_format)
     
+    filters = []
     if status:
-        query = query.filter(models.Disposal.status == status)
+        filters.append(models.Disposal.status == status)
     
-    disposals = query.all()
+    disposals = select(
+        models.Disposal.id,
+        models.Disposal.asset_id,
+        models.Disposal.status,
+        models.Disposal.method,
+        models.Disposal.proceeds,
+        models.Disposal.disposal_date,
+        models.Disposal.reason
+    ).where(*filters).order_by(models.Disposal.id)
     
-    # Calculate statistics
-    total_disposals = len(disposals)
-    total_proceeds = sum(disposal.proceeds or 0 for disposal in disposals)
-    avg_proceeds = total_proceeds / total_disposals if total_disposals > 0 else 0
+    if export_format:
+        return report_export.stream_export(disposals, export_format, "disposals")
     
-    # Status breakdown
-    status_breakdown = {}
-    for disposal in disposals:
-        status = disposal.status or 'unknown'
-        status_breakdown[status] = status_breakdown.get(status, 0) + 1
-    
-    # Method breakdown
-    method_breakdown = {}
-    for disposal in disposals:
-        method = disposal.method or 'unknown'
-        method_breakdown[method] = method_breakdown.get(method, 0) + 1
+    # Calculate statistics in SQL
+    stats = report_export.totals(db, models.Disposal.proceeds, *filters)
     
     return {
-        "totalDisposals": total_disposals,
-        "totalProceeds": total_proceeds,
-        "averageProceeds": avg_proceeds,
-        "statusBreakdown": status_breakdown,
-        "methodBreakdown": method_breakdown,
-        "disposals": [
-            {
-                "id": disposal.id,
-                "asset_id": disposal.asset_id,
-                "status": disposal.status,
-                "method": disposal.method,
-                "proceeds": disposal.proceeds,
-                "disposal_date": disposal.disposal_date.isoformat() if disposal.disposal_date else None,
-                "reason": disposal.reason
-            }
-            for disposal in disposals
-        ]
-    } 
\ No newline at end of file
+        "totalDisposals": stats["count"],
+        "totalProceeds": stats["total"],
+        "averageProceeds": stats["average"],
+        "statusBreakdown": report_export.breakdown(db, models.Disposal.status, *filters),
+        "methodBreakdown": report_export.breakdown(db, models.Disposal.method, *filters),
+        "disposals": report_export.rows(db, disposals)
+    }
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from fastapi_app import models, schemas, deps, crud
 from fastapi_app.auth import get_current_user
 from datetime import datetime
@@ -8,9 +8,18 @@ from datetime import datetime
 router = APIRouter(prefix="/transfer_requests", tags=["transfer_requests"])
 
 @router.get("/", response_model=List[dict])
-def get_transfer_requests(db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
+def get_transfer_requests(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[models.TransferRequestStatus] = Query(None),
+    location: Optional[str] = Query(None, description="Matches the from or to location"),
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
     is_admin = current_user.role in ["admin", "transfer_manager"]
-    return crud.get_transfer_requests(db, user_id=current_user.id, is_admin=is_admin)
+    return crud.get_transfer_requests(
+        db, user_id=current_user.id, is_admin=is_admin, skip=skip, limit=limit, status=status, location=location
+    )
 
 @router.get("/{transfer_request_id}", response_model=dict)
 def get_transfer_request(transfer_request_id: int, db: Session = Depends(deps.get_db), current_user: models.User = Depends(get_current_user)):
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from . import crud, schemas, models, deps
 from .auth import get_current_user
+from .principal_cache import principal_cache
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -111,6 +112,7 @@ def update_user(
     db_user = crud.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    old_username = db_user.username
     
     # Update user fields
     update_data = user_update.dict(exclude_unset=True)
@@ -120,6 +122,7 @@ def update_user(
     
     db.commit()
     db.refresh(db_user)
+    principal_cache.invalidate(user_id=db_user.id, username=old_username)
     return db_user
 
 @router.delete("/{user_id}")
@@ -141,8 +144,10 @@ def delete_user(
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
     
     # Delete the user
+    deleted_id, deleted_username = db_user.id, db_user.username
     db.delete(db_user)
     db.commit()
+    principal_cache.invalidate(user_id=deleted_id, username=deleted_username)
     
     return {"message": "User deleted successfully"}
 
@@ -148,6 +148,27 @@ class AssetRead(AssetBase):
     class Config:
         from_attributes = True 
 
+class AssetImportError(BaseModel):
+    row: int
+    field: Optional[str] = None
+    message: str
+
+class AssetImportJobRead(BaseModel):
+    id: str
+    status: str
+    filename: Optional[str] = None
+    format: Optional[str] = None
+    batch_size: Optional[int] = None
+    rows_read: int = 0
+    rows_inserted: int = 0
+    rows_failed: int = 0
+    errors: List[AssetImportError] = []
+    errors_truncated: bool = False
+    error_message: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
 class MaintenanceBase(BaseModel):
     asset_id: Optional[int] = None
     asset_name: Optional[str] = None
@@ -327,6 +348,7 @@ class NotificationCreate(NotificationBase):
 class NotificationRead(NotificationBase):
     id: int
     created_at: Optional[datetime]
+    thread_root_id: Optional[int] = None
     # Additional fields for frontend compatibility
     recipient_id: Optional[int] = None
     recipient_name: Optional[str] = None
@@ -339,6 +361,26 @@ class NotificationRead(NotificationBase):
     class Config:
         from_attributes = True
 
+class NotificationThreadSender(BaseModel):
+    sender_id: Optional[int] = None
+    sender_name: Optional[str] = None
+    sender_username: Optional[str] = None
+    sender_email: Optional[str] = None
+    messages: int
+    last_sent_at: Optional[datetime] = None
+
+class NotificationThread(BaseModel):
+    root_id: int
+    notifications: List[NotificationRead]
+    senders: List[NotificationThreadSender]
+
+class NotificationUnreadCount(BaseModel):
+    user_id: int
+    unread: int
+    read_through_id: int = 0
+    class Config:
+        from_attributes = True
+
 class DepartmentBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -1,32 +1,89 @@
-import jwt
+from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import HTTPException, status
+from jose import JWTError, jwt
+from fastapi import Request
 from fastapi_app.database import SessionLocal
 from fastapi_app.models import User
+from fastapi_app.principal_cache import principal_cache, UserSnapshot
 
-# Use the same secret key as in auth.py
-SECRET_KEY = "your_super_secret_key_change_this"  # This should match the one in auth.py
+# Single source of truth for token signing; auth.py re-exports these
+SECRET_KEY = "your_super_secret_key_change_this"
 ALGORITHM = "HS256"
 
-def get_current_user_from_token(token: str) -> Optional[User]:
+# Scope claim of the tickets accepted by /notifications/stream only; tokens
+# carrying any scope are rejected as bearer tokens
+STREAM_TICKET_SCOPE = "notifications_stream"
+
+def decode_token(token: str) -> Optional[dict]:
+    """Decode and verify a JWT, returning its payload or None if invalid"""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+def create_stream_ticket(username: str, expires_in: int) -> str:
+    """A JWT for username that only /notifications/stream accepts, valid for expires_in seconds"""
+    expire = datetime.utcnow() + timedelta(seconds=expires_in)
+    return jwt.encode({"sub": username, "scope": STREAM_TICKET_SCOPE, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+def resolve_principal(token: str, db=None, scope: Optional[str] = None) -> Optional[UserSnapshot]:
     """
-    Extract user information from JWT token without creating circular imports
+    Decode a token and resolve its subject to a user snapshot.
+
+    Uses the principal cache first; on a miss the user is loaded with the
+    given session, or with a short-lived session if none is supplied. The
+    token's scope claim must equal scope (None for ordinary access tokens).
     """
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        
-        # Get user from database
-        db = SessionLocal()
+    payload = decode_token(token)
+    if payload is None or payload.get("scope") != scope:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+
+    def load(name: str):
+        if db is not None:
+            return db.query(User).filter(User.username == name).first()
+        session = SessionLocal()
         try:
-            user = db.query(User).filter(User.username == username).first()
-            return user
+            return session.query(User).filter(User.username == name).first()
         finally:
-            db.close()
-            
-    except jwt.PyJWTError:
+            session.close()
+
+    return principal_cache.get_or_load(username, load)
+
+def get_bearer_token(request: Request) -> Optional[str]:
+    auth_header = request.headers.get("authorization")
+    if auth_header and auth_header.startswith("Bearer "):
+        return auth_header.split(" ")[1]
+    return None
+
+def get_request_principal(request: Request, token: Optional[str] = None, db=None) -> Optional[UserSnapshot]:
+    """
+    Request-scoped identity stage.
+
+    The first caller (normally AuditMiddleware) decodes the token and resolves
+    the user; the result is stashed on request.state so later callers such as
+    the get_current_user dependency reuse it instead of decoding again.
+    """
+    if token is None:
+        token = get_bearer_token(request)
+    if token is None:
         return None
+
+    resolved = getattr(request.state, "identity", None)
+    if resolved is not None and resolved[0] == token:
+        return resolved[1]
+
+    principal = resolve_principal(token, db=db)
+    request.state.identity = (token, principal)
+    return principal
+
+def get_current_user_from_token(token: str) -> Optional[UserSnapshot]:
+    """
+    Extract user information from JWT token without creating circular imports
+    """
+    try:
+        return resolve_principal(token)
     except Exception:
-        return None 
\ No newline at end of file
+        return None
@@ -0,0 +1,93 @@
+"""
+Normalized copies of users.asset_access and users.permissions.
+
+user_location_access (user x location) and user_permission (user x
+permission) mirror the JSON columns so that "users with permission X at
+location Y" is an indexed SQL query instead of loading users and parsing
+JSON in Python. Both tables are indexed on the user and on the value side.
+Asset visibility checks go through AccessPolicy (access_policy.py).
+
+Mapper events rewrite a user's rows in the same flush whenever the user is
+inserted, deleted or has asset_access / permissions changed through the ORM.
+rebuild_user_access resyncs every user; it runs at startup to pick up rows
+edited outside the API.
+"""
+import json
+from typing import Iterable, List
+from sqlalchemy import delete, event, exists, insert, inspect, select
+from sqlalchemy.orm import Session
+from fastapi_app.models import User, UserLocationAccess, UserPermission
+
+def parse_list(value) -> List[str]:
+    """asset_access / permissions as a list: JSON columns may hold a list, a JSON string or a bare string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return [value]
+        if isinstance(value, str):
+            return [value] if value else []
+    if isinstance(value, list):
+        return [str(item) for item in value if item not in (None, "")]
+    return []
+
+def _unique(values: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(value.strip() for value in values if value and value.strip()))
+
+def sync_user(connection, user_id: int, asset_access, permissions):
+    """Replace the normalized rows of one user"""
+    connection.execute(delete(UserLocationAccess).where(UserLocationAccess.user_id == user_id))
+    connection.execute(delete(UserPermission).where(UserPermission.user_id == user_id))
+    locations = _unique(parse_list(asset_access))
+    if locations:
+        connection.execute(insert(UserLocationAccess), [{"user_id": user_id, "location": location} for location in locations])
+    granted = _unique(parse_list(permissions))
+    if granted:
+        connection.execute(insert(UserPermission), [{"user_id": user_id, "permission": permission} for permission in granted])
+
+@event.listens_for(User, "after_insert")
+def _user_inserted(mapper, connection, target):
+    sync_user(connection, target.id, target.asset_access, target.permissions)
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.asset_access.history.has_changes() or state.attrs.permissions.history.has_changes():
+        sync_user(connection, target.id, target.asset_access, target.permissions)
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    # The foreign keys cascade on MySQL; SQLite doesn't enforce them by default
+    sync_user(connection, target.id, None, None)
+
+def rebuild_user_access(db: Session) -> int:
+    """Resync the normalized tables from every users row; returns the number of users"""
+    users = db.query(User.id, User.asset_access, User.permissions).all()
+    connection = db.connection()
+    for user_id, asset_access, permissions in users:
+        sync_user(connection, user_id, asset_access, permissions)
+    db.commit()
+    return len(users)
+
+# Query building blocks
+
+def accessible_locations(user_id: int):
+    """Subquery of the locations a user has asset access to"""
+    return select(UserLocationAccess.location).where(UserLocationAccess.user_id == user_id)
+
+def at_any_location(locations: Iterable[str]):
+    """Filter on users with access to any of locations"""
+    return exists().where(UserLocationAccess.user_id == User.id, UserLocationAccess.location.in_(list(locations)))
+
+def sharing_location_with(user_id: int):
+    """Filter on users with access to at least one of user_id's locations"""
+    return exists().where(
+        UserLocationAccess.user_id == User.id,
+        UserLocationAccess.location.in_(accessible_locations(user_id))
+    )
+
+def granted(permissions: Iterable[str]):
+    """Filter on users holding any of permissions"""
+    return exists().where(UserPermission.user_id == User.id, UserPermission.permission.in_(list(permissions)))
@@ -1,5 +1,5 @@
 "use client";
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useAuth } from '../contexts/AuthContext';
 import {
   Box,
@@ -120,6 +120,9 @@ export default function Dashboard() {
   const [error, setError] = useState<string | null>(null);
   const [refreshing, setRefreshing] = useState(false);
 
+  // ETags of the bundle sections we already hold, sent back so unchanged sections are skipped
+  const sectionEtags = useRef<Record<string, string>>({});
+
   // Fetch dashboard data function
   const fetchDashboardData = async (isRefresh = false) => {
     if (isRefresh) {
@@ -139,22 +142,20 @@ export default function Dashboard() {
       }
       
       const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8000";
-      const headers = { 
+      const headers: Record<string, string> = { 
         'Content-Type': 'application/json',
         'Authorization': `Bearer ${token}` 
       };
+      const knownEtags = Object.values(sectionEtags.current);
+      if (knownEtags.length > 0) {
+        headers['If-None-Match'] = knownEtags.join(', ');
+      }
       
-      // Fetch all dashboard data in parallel
-      const [statsRes, categoriesRes, activitiesRes, maintenanceRes] = await Promise.all([
-        fetch(`${API_BASE_URL}/dashboard/stats`, { headers }),
-        fetch(`${API_BASE_URL}/dashboard/asset-categories`, { headers }),
-        fetch(`${API_BASE_URL}/dashboard/recent-activities`, { headers }),
-        fetch(`${API_BASE_URL}/dashboard/maintenance-schedule`, { headers })
-      ]);
+      // Fetch all dashboard sections in one request
+      const bundleRes = await fetch(`${API_BASE_URL}/dashboard/bundle`, { headers });
 
       // Check for authentication errors
-      if (statsRes.status === 401 || categoriesRes.status === 401 || 
-          activitiesRes.status === 401 || maintenanceRes.status === 401) {
+      if (bundleRes.status === 401) {
         setError('Authentication failed. Please log in again.');
         setLoading(false);
         setRefreshing(false);
@@ -162,22 +163,21 @@ export default function Dashboard() {
       }
 
       // Check for other errors
-      if (!statsRes.ok || !categoriesRes.ok || !activitiesRes.ok || !maintenanceRes.ok) {
-        const errorText = await statsRes.text();
-        throw new Error(`Failed to fetch dashboard data: ${statsRes.status} ${errorText}`);
+      if (!bundleRes.ok) {
+        const errorText = await bundleRes.text();
+        throw new Error(`Failed to fetch dashboard data: ${bundleRes.status} ${errorText}`);
       }
 
-      const [statsData, categoriesData, activitiesData, maintenanceData] = await Promise.all([
-        statsRes.json(),
-        categoriesRes.json(),
-        activitiesRes.json(),
-        maintenanceRes.json()
-      ]);
+      const { sections } = await bundleRes.json();
+      Object.entries(sections as Record<string, { etag: string }>).forEach(([name, section]) => {
+        sectionEtags.current[name] = section.etag;
+      });
 
-      setStats(statsData);
-      setAssetCategories(categoriesData || []);
-      setRecentActivities(activitiesData || []);
-      setMaintenanceSchedule(maintenanceData || []);
+      // Sections marked not_modified keep the data we already have
+      if (sections.stats?.status === 'ok') setStats(sections.stats.data);
+      if (sections.asset_categories?.status === 'ok') setAssetCategories(sections.asset_categories.data || []);
+      if (sections.recent_activities?.status === 'ok') setRecentActivities(sections.recent_activities.data || []);
+      if (sections.maintenance_schedule?.status === 'ok') setMaintenanceSchedule(sections.maintenance_schedule.data || []);
       setLoading(false);
       setRefreshing(false);
     } catch (err: any) {
@@ -206,16 +206,14 @@ export default function MainNav() {
     try {
       const token = typeof window !== 'undefined' ? localStorage.getItem('token') : null;
       const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8000";
-      const response = await fetch(`${API_BASE_URL}/notifications?user_id=${userId}`, {
+      const response = await fetch(`${API_BASE_URL}/notifications/unread-count?user_id=${userId}`, {
         headers: {
           ...(token ? { 'Authorization': `Bearer ${token}` } : {})
         }
       });
       if (response.ok) {
         const data = await response.json();
-        // Count unread notifications
-        const unreadCount = data.filter((notification: any) => !notification.is_read).length;
-        setUnreadCount(unreadCount);
+        setUnreadCount(data.unread);
       }
     } catch (error) {
       console.error('Error fetching unread notifications count:', error);
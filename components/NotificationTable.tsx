@@ -107,6 +107,9 @@ export default function NotificationTable() {
   const [conversationThread, setConversationThread] = useState<NotificationRecord[]>([]);
   const [conversationParent, setConversationParent] = useState<NotificationRecord | null>(null);
   const [conversationReply, setConversationReply] = useState('');
+  // X-Next-Cursor of the last page loaded: GET /notifications/ returns 50 rows at a time
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // All useEffect hooks at the top
   useEffect(() => {
@@ -146,15 +149,6 @@ export default function NotificationTable() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [mounted, user, tab]);
 
-  useEffect(() => {
-    if (notifications.length > 0) {
-      notifications.forEach(n => {
-        if (n.id) fetchReplies(n.id);
-      });
-    }
-    // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [notifications]);
-
   // Helper to get user info by ID (fix type mismatch)
   const getUserInfo = (id: number | string) => users.find(u => u.id == id);
 
@@ -189,9 +183,14 @@ export default function NotificationTable() {
     return 'Unknown User';
   };
 
-  const fetchNotifications = async () => {
-    setLoading(true);
-    setError(null);
+  // First page, or the page after cursor appended to the rows already loaded
+  const fetchNotifications = async (cursor: string | null = null) => {
+    if (cursor) {
+      setLoadingMore(true);
+    } else {
+      setLoading(true);
+      setError(null);
+    }
     try {
       const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8000";
       const token = typeof window !== 'undefined' ? localStorage.getItem('token') : null;
@@ -203,6 +202,7 @@ export default function NotificationTable() {
       } else {
         url += `&direction=received`;
       }
+      if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
       const res = await fetch(url, {
         headers: {
           ...(token ? { 'Authorization': `Bearer ${token}` } : {})
@@ -211,42 +211,63 @@ export default function NotificationTable() {
       if (!res.ok) throw new Error('Failed to fetch notifications');
       const data = await res.json();
       if (Array.isArray(data)) {
-        setNotifications(data);
+        if (cursor) {
+          setNotifications(prev => [...prev, ...data]);
+        } else {
+          setReplies({});
+          setNotifications(data);
+        }
+        setNextCursor(res.headers.get('X-Next-Cursor'));
       } else if (data.error) {
         setError(data.error);
-      } else {
+      } else if (!cursor) {
         setNotifications([]);
+        setNextCursor(null);
       }
     } catch (err) {
-      setError((err && typeof err === 'object' && 'message' in err) ? (err as Error).message : 'Error fetching notifications');
+      if (cursor) {
+        // Keep the rows already shown; the button stays to retry
+        console.error('Error fetching older notifications:', err);
+      } else {
+        setError((err && typeof err === 'object' && 'message' in err) ? (err as Error).message : 'Error fetching notifications');
+      }
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
-  // Fetch replies for a given notification
+  // Fetch replies for a given notification, following X-Next-Cursor through every page
   const fetchReplies = async (parentId: number) => {
     const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8000";
     const token = typeof window !== 'undefined' ? localStorage.getItem('token') : null;
-    let url = `${API_BASE_URL}/notifications?parent_id=${parentId}`;
+    let url = `${API_BASE_URL}/notifications?parent_id=${parentId}&limit=500`;
     if (tab === 'sent') url += `&direction=sent`;
     else url += `&direction=received`;
-    const res = await fetch(url, {
-      headers: {
-        ...(token ? { 'Authorization': `Bearer ${token}` } : {})
-      }
-    });
-    if (!res.ok) return [];
-    const data = await res.json();
-    setReplies(prev => ({ ...prev, [parentId]: data }));
-    return data;
+    const all: NotificationRecord[] = [];
+    let cursor: string | null = null;
+    do {
+      const res: Response = await fetch(cursor ? `${url}&cursor=${encodeURIComponent(cursor)}` : url, {
+        headers: {
+          ...(token ? { 'Authorization': `Bearer ${token}` } : {})
+        }
+      });
+      if (!res.ok) return [];
+      const data = await res.json();
+      if (!Array.isArray(data)) break;
+      all.push(...data);
+      cursor = res.headers.get('X-Next-Cursor');
+    } while (cursor);
+    setReplies(prev => ({ ...prev, [parentId]: all }));
+    return all;
   };
 
-  // Fetch replies for all top-level notifications after fetching notifications
+  // Fetch replies for top-level notifications after fetching notifications
+  // (only the newly loaded ones when older pages are appended)
   useEffect(() => {
     if (notifications.length > 0) {
       notifications.forEach(n => {
-        if (n.id) fetchReplies(n.id);
+        if (n.id && !(n.id in replies)) fetchReplies(n.id);
       });
     }
     // eslint-disable-next-line react-hooks/exhaustive-deps
@@ -568,43 +589,33 @@ export default function NotificationTable() {
       const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8000";
       const token = typeof window !== 'undefined' ? localStorage.getItem('token') : null;
       
-      // Fetch parent
-      const parentRes = await fetch(`${API_BASE_URL}/notifications?id=${parentId}`, {
-        headers: { ...(token ? { 'Authorization': `Bearer ${token}` } : {}) }
-      });
-      
-      if (!parentRes.ok) {
-        throw new Error(`Failed to fetch parent notification: ${parentRes.status}`);
-      }
-      
-      const parentData = await parentRes.json();
-      const parent = Array.isArray(parentData) ? parentData[0] : parentData;
+      // The whole conversation (root and every reply level), 500 messages per page
+      const thread: NotificationRecord[] = [];
+      let rootId: number | null = null;
+      let cursor: string | null = null;
+      do {
+        const threadRes: Response = await fetch(
+          `${API_BASE_URL}/notifications/threads/${parentId}?limit=500${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`,
+          { headers: { ...(token ? { 'Authorization': `Bearer ${token}` } : {}) } }
+        );
+        
+        if (!threadRes.ok) {
+          throw new Error(`Failed to fetch thread: ${threadRes.status}`);
+        }
+        
+        const threadData = await threadRes.json();
+        rootId = threadData.root_id;
+        if (Array.isArray(threadData.notifications)) thread.push(...threadData.notifications);
+        cursor = threadRes.headers.get('X-Next-Cursor');
+      } while (cursor);
+      const parent = thread.find((n: any) => n.id === rootId);
       
       if (!parent) {
         throw new Error('Parent notification not found');
       }
       
-      // Fetch replies - filter by direction to avoid duplicates
-      let repliesUrl = `${API_BASE_URL}/notifications?parent_id=${parentId}`;
-      if (tab === 'sent') {
-        repliesUrl += `&direction=sent`;
-      } else {
-        repliesUrl += `&direction=received`;
-      }
-      
-      const repliesRes = await fetch(repliesUrl, {
-        headers: { ...(token ? { 'Authorization': `Bearer ${token}` } : {}) }
-      });
-      
-      if (!repliesRes.ok) {
-        throw new Error(`Failed to fetch replies: ${repliesRes.status}`);
-      }
-      
-      const repliesData = await repliesRes.json();
-      const replies = Array.isArray(repliesData) ? repliesData : [];
-      
       setConversationParent(parent);
-      setConversationThread([parent, ...replies]);
+      setConversationThread(thread);
     } catch (error) {
       console.error('Error fetching thread:', error);
       setConversationParent(null);
@@ -737,7 +748,7 @@ export default function NotificationTable() {
           Notifications
         </Typography>
         <Box sx={{ display: 'flex', gap: 2 }}>
-          <IconButton onClick={fetchNotifications} color="primary" title="Refresh Notifications">
+          <IconButton onClick={() => fetchNotifications()} color="primary" title="Refresh Notifications">
             <Refresh />
           </IconButton>
           <Button
@@ -874,7 +885,7 @@ export default function NotificationTable() {
         </Stack>
         
         <Typography variant="body2" color="text.secondary">
-          Showing {topLevelNotifications.length} of {notifications.length} notifications
+          Showing {topLevelNotifications.length} of {notifications.length} notifications{nextCursor ? ' loaded so far' : ''}
         </Typography>
       </Box>
 
@@ -909,6 +920,13 @@ export default function NotificationTable() {
           disableRowSelectionOnClick
         />
       </Box>
+      {nextCursor && (
+        <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+          <Button variant="outlined" onClick={() => fetchNotifications(nextCursor)} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : 'Load older notifications'}
+          </Button>
+        </Box>
+      )}
 
       {/* Conversation Modal */}
       <Dialog open={conversationOpen} onClose={() => setConversationOpen(false)} maxWidth="sm" fullWidth>